@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark du gestionnaire de base de données cy8
+
+Compare le coût par appel:
+- avant: requête SQL écrite dans la méthode sur une connexion sqlite3 par défaut, résultat en tuple
+- après: requête du registre SQL_STATEMENTS, résultat en enregistrement typé (cy8_records)
+
+Le gain de la mémoïsation de derive_model_from_workflow dans get_all_prompts est mesuré à part,
+sur des prompts sans modèle partageant le même workflow.
+
+Usage: python benchmarks/bench_db_statements.py [--prompts N] [--calls N]
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from cy8_database_manager import cy8_database_manager  # noqa: E402
+
+
+WORKFLOW = '{"4": {"inputs": {"ckpt_name": "model.safetensors"}, "class_type": "CheckpointLoaderSimple"}}'
+
+
+def populate(db_manager, count):
+    """Remplir la base avec des prompts de test (modèle vide: dérivé du workflow à la lecture)"""
+    for index in range(count):
+        db_manager.create_prompt(f"prompt_{index}", "{}", WORKFLOW, "", "", "new", "")
+
+
+def measure(func, calls):
+    """Durée moyenne d'un appel en microsecondes"""
+    start = time.perf_counter()
+    for index in range(calls):
+        func(index)
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark cy8_database_manager")
+    parser.add_argument("--prompts", type=int, default=1000, help="Nombre de prompts en base")
+    parser.add_argument("--calls", type=int, default=20000, help="Nombre d'appels par mesure")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, "bench.db")
+        db_manager = cy8_database_manager(db_path)
+        db_manager.init_database("init")
+        populate(db_manager, args.prompts)
+
+        # "Avant": connexion sqlite3 par défaut (cache de statements inclus), tuples bruts
+        legacy_conn = sqlite3.connect(db_path, check_same_thread=False)
+        legacy_cursor = legacy_conn.cursor()
+
+        def legacy_get_prompt(index):
+            legacy_cursor.execute(
+                "SELECT name, prompt_values, workflow, url, model, comment, status FROM prompts WHERE id=?",
+                (index % args.prompts + 1,),
+            )
+            return legacy_cursor.fetchone()
+
+        def legacy_name_exists(index):
+            legacy_cursor.execute("SELECT 1 FROM prompts WHERE name=? LIMIT 1", (f"prompt_{index % args.prompts}",))
+            return legacy_cursor.fetchone() is not None
+
+        def legacy_all_prompts(_, memoize=True):
+            legacy_cursor.execute("SELECT id, name, parent, model, workflow, status, comment FROM prompts")
+            results = []
+            derived_models = {}
+            for row in legacy_cursor.fetchall():
+                prompt_id, name, parent, model, workflow, status, comment = row
+                if not model and workflow:
+                    if not memoize:
+                        model = db_manager.derive_model_from_workflow(workflow)
+                    else:
+                        if workflow not in derived_models:
+                            derived_models[workflow] = db_manager.derive_model_from_workflow(workflow)
+                        model = derived_models[workflow]
+                results.append((prompt_id, name, parent, model, workflow, status, comment))
+            return results
+
+        scenarios = [
+            (
+                "get_prompt_by_id",
+                legacy_get_prompt,
+                lambda index: db_manager.get_prompt_by_id(index % args.prompts + 1),
+                args.calls,
+            ),
+            (
+                "prompt_name_exists",
+                legacy_name_exists,
+                lambda index: db_manager.prompt_name_exists(f"prompt_{index % args.prompts}"),
+                args.calls,
+            ),
+            ("get_all_prompts", legacy_all_prompts, lambda _: db_manager.get_all_prompts(), max(1, args.calls // 1000)),
+        ]
+        # Mémoïsation seule: même requête et mêmes tuples, avec et sans cache des modèles dérivés
+        memoization = (
+            "derive_model (mémo)",
+            lambda index: legacy_all_prompts(index, memoize=False),
+            legacy_all_prompts,
+            max(1, args.calls // 1000),
+        )
+
+        def report(name, before, after, calls):
+            before_us = measure(before, calls)
+            after_us = measure(after, calls)
+            gain = (before_us - after_us) / before_us * 100 if before_us else 0.0
+            print(f"{name:<22}{before_us:>14.2f}{after_us:>14.2f}{gain:>9.1f}%")
+
+        print(f"Base: {args.prompts} prompts")
+        print(f"{'Méthode':<22}{'avant (µs)':>14}{'après (µs)':>14}{'gain':>10}")
+        for scenario in scenarios:
+            report(*scenario)
+        print()
+        print(f"{'Mémoïsation':<22}{'sans (µs)':>14}{'avec (µs)':>14}{'gain':>10}")
+        report(*memoization)
+
+        legacy_conn.close()
+        db_manager.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Benchmark de bout en bout de la chaîne d'exécution cy8
+
+Reproduit le chemin de l'application sans interface: file persistante (cy8_job_queue),
+répartiteur borné par la capacité des backends (cy6_backend_pool), soumission par le client
+ComfyUI réel (comfyui_task), fin signalée par les événements WebSocket, téléchargement des images
+et clôture en base, contre des serveurs ComfyUI factices (tests/fake_comfyui_server.py).
+
+Mesures par travail (p50/p95/p99 et moyenne, en ms):
+- queue_wait: mise en file -> prise par le répartiteur
+- dispatch: prise -> début de soumission (place sur un backend, enregistrement en base)
+- submit: patch du workflow, validation /object_info et POST /prompt
+- execution: soumission -> fin chez ComfyUI (file du serveur et latence simulée des nodes)
+- notification: fin chez ComfyUI -> fin reçue par le client (WebSocket)
+- finalize: fin reçue -> exécution clôturée en base (images et historique)
+- end_to_end: mise en file -> exécution clôturée
+et le débit (travaux/s) de chaque scénario.
+
+Usage: python benchmarks/bench_execution_pipeline.py [--jobs N] [--scenario NOM ...]
+       [--output resultats.json] [--baseline reference.json]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "tests"))
+
+import cy6_object_info  # noqa: E402
+from cy6_object_info import comfyui_object_info_cache  # noqa: E402
+from cy6_backend_pool import comfyui_backend_pool  # noqa: E402
+from cy6_event_hub import close_event_hubs  # noqa: E402
+from cy6_http_client import close_clients  # noqa: E402
+from cy6_task_comfyui import comfyui_task  # noqa: E402
+from cy8_database_manager import cy8_database_manager  # noqa: E402
+from cy8_job_queue import cy8_job_queue  # noqa: E402
+from fake_comfyui_server import fake_comfyui_server, basic_workflow, basic_values  # noqa: E402
+
+STAGES = ("queue_wait", "dispatch", "submit", "execution", "notification", "finalize", "end_to_end")
+
+# Scénarios: options des serveurs factices et de la chaîne
+SCENARIOS = {
+    # Latence nulle: coût propre du client, de la base et des événements
+    "overhead": {"backends": 1, "node_latency": 0.0, "sampler_latency": 0.0},
+    # Sampler de 20 ms: la file ComfyUI domine, la notification doit rester négligeable
+    "sampler": {"backends": 1, "node_latency": 0.001, "sampler_latency": 0.02},
+    # Deux backends: le débit doit doubler à latence égale
+    "two_backends": {"backends": 2, "node_latency": 0.001, "sampler_latency": 0.02},
+    # 10 % d'erreurs d'exécution: les échecs ne doivent pas ralentir les autres travaux
+    "failures": {"backends": 1, "node_latency": 0.001, "sampler_latency": 0.02, "fail_rate": 0.1},
+}
+
+
+def percentile(values, fraction):
+    """Percentile au rang le plus proche (values triées)"""
+    if not values:
+        return None
+    index = max(0, min(len(values) - 1, int(round(fraction * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+def summarize(samples):
+    """p50/p95/p99 et moyenne en ms"""
+    values = sorted(samples)
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "mean": None}
+    return {
+        "p50": percentile(values, 0.50) * 1000,
+        "p95": percentile(values, 0.95) * 1000,
+        "p99": percentile(values, 0.99) * 1000,
+        "mean": sum(values) / len(values) * 1000,
+    }
+
+
+class pipeline_run:
+    """Chaîne d'exécution de l'application (répartiteur + exécuteur borné) sur des backends factices"""
+
+    def __init__(self, db_manager, addresses, servers, max_concurrency=None):
+        self.db_manager = db_manager
+        self.job_queue = cy8_job_queue(db_manager)
+        self.backend_pool = comfyui_backend_pool(addresses, max_concurrency=max_concurrency)
+        self.servers = {server.address: server for server in servers}
+        self.executor = ThreadPoolExecutor(self.backend_pool.capacity(), thread_name_prefix="bench-exec")
+        self.timings = {}  # execution_id -> {étape: time.monotonic()}
+        self.outcomes = {}
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._wakeup = threading.Event()
+
+    def mark(self, execution_id, stage, moment=None):
+        with self._lock:
+            self.timings.setdefault(execution_id, {})[stage] = moment or time.monotonic()
+
+    def enqueue(self, prompt_id, execution_id, checkpoint):
+        self.mark(execution_id, "enqueued")
+        self.job_queue.enqueue(prompt_id, execution_id, checkpoint)
+        self._wakeup.set()
+
+    def dispatch(self, total):
+        """Répartiteur (voir _job_worker) jusqu'à ce que total travaux soient clôturés"""
+        while True:
+            with self._lock:
+                if len(self.outcomes) >= total:
+                    return
+                full = self._in_flight >= self.backend_pool.capacity()
+            job = None
+            if not full:
+                self.backend_pool.refresh()
+                target = self.backend_pool.select()
+                job = self.job_queue.claim_next(target.loaded_checkpoint if target else None)
+            if job is None:
+                self._wakeup.wait(0.05)
+                self._wakeup.clear()
+                continue
+            self.mark(job["execution_id"], "claimed")
+            with self._lock:
+                self._in_flight += 1
+            self.executor.submit(self.run_job, job)
+
+    def run_job(self, job):
+        """Exécution d'un travail (voir _run_job / _execute_workflow_task, sans mise à jour de l'interface)"""
+        execution_id = job["execution_id"]
+        outcome = "error"
+        try:
+            prompt = self.db_manager.get_prompt_by_id(job["prompt_id"])
+            self.db_manager.start_execution_record(job["prompt_id"], execution_id)
+            backend = self.backend_pool.acquire(self.db_manager.prompt_checkpoint(prompt), priority=job["priority"])
+            try:
+                task = comfyui_task()
+                task.server_address = backend.address
+                self.mark(execution_id, "submit_start")
+                comfyui_prompt_id = task.addToQueue(json.loads(prompt.workflow), json.loads(prompt.prompt_values))
+                self.mark(execution_id, "submitted")
+                task.tracker.add_done_callback(lambda *_: self.mark(execution_id, "notified"))
+                self.db_manager.mark_execution_queued(execution_id, comfyui_prompt_id, backend.address)
+                self.job_queue.mark_submitted(execution_id, comfyui_prompt_id, backend.address)
+
+                outcome, message = task.wait_for_completion(60)
+                completed = self.servers[backend.address].completed_at.get(comfyui_prompt_id)
+                if completed is not None:
+                    self.mark(execution_id, "completed", completed)
+                output_images = task.GetImages(comfyui_prompt_id) if outcome == "success" else []
+                status = "ok" if outcome == "success" else outcome
+                self.db_manager.finish_execution_record(
+                    execution_id, status, message, comfyui_prompt_id, output_images
+                )
+                self.job_queue.sync_with_executions()
+                self.mark(execution_id, "finished")
+            finally:
+                self.backend_pool.release(backend)
+        except Exception as e:
+            print(f"DEBUG: Travail {execution_id} en erreur: {e}")
+        finally:
+            with self._lock:
+                self.outcomes[execution_id] = outcome
+                self._in_flight -= 1
+            self._wakeup.set()
+
+    def report(self):
+        stage_bounds = {
+            "queue_wait": ("enqueued", "claimed"),
+            "dispatch": ("claimed", "submit_start"),
+            "submit": ("submit_start", "submitted"),
+            "execution": ("submitted", "completed"),
+            "notification": ("completed", "notified"),
+            "finalize": ("notified", "finished"),
+            "end_to_end": ("enqueued", "finished"),
+        }
+        samples = {stage: [] for stage in STAGES}
+        for marks in self.timings.values():
+            for stage, (start, end) in stage_bounds.items():
+                if start in marks and end in marks:
+                    samples[stage].append(max(0.0, marks[end] - marks[start]))
+        starts = [marks["enqueued"] for marks in self.timings.values() if "enqueued" in marks]
+        ends = [marks["finished"] for marks in self.timings.values() if "finished" in marks]
+        duration = max(ends) - min(starts) if starts and ends else 0.0
+        outcomes = list(self.outcomes.values())
+        return {
+            "jobs": len(outcomes),
+            "ok": outcomes.count("success"),
+            "errors": len(outcomes) - outcomes.count("success"),
+            "duration_s": duration,
+            "jobs_per_s": len(ends) / duration if duration else 0.0,
+            "stages": {stage: summarize(values) for stage, values in samples.items()},
+        }
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+
+def run_scenario(name, options, jobs, checkpoints, rate, concurrency, work_dir):
+    """Exécuter un scénario: retourne son rapport (configuration incluse)"""
+    servers = [
+        fake_comfyui_server(
+            node_latency=options.get("node_latency", 0.0),
+            latencies={"KSampler": options.get("sampler_latency", 0.0)},
+            fail_rate=options.get("fail_rate", 0.0),
+            seed=0,
+        ).start()
+        for _ in range(options.get("backends", 1))
+    ]
+    db_manager = cy8_database_manager(os.path.join(work_dir, f"{name}.db"))
+    db_manager.init_database("init", backup=False)
+    try:
+        prompt_ids = []
+        for index in range(checkpoints):
+            checkpoint = f"model_{index}.safetensors"
+            workflow = json.dumps(basic_workflow(checkpoint))
+            values = json.dumps(basic_values(positive=f"bench {index}"))
+            # Colonne model vide comme pour un prompt importé: le checkpoint vient du workflow
+            prompt_id = db_manager.create_prompt(f"bench_{index}", values, workflow, "", "", "new", "")
+            prompt_ids.append((prompt_id, db_manager.prompt_checkpoint(db_manager.get_prompt_by_id(prompt_id))))
+
+        run = pipeline_run(db_manager, [server.address for server in servers], servers, concurrency)
+        dispatcher = threading.Thread(target=run.dispatch, args=(jobs,), daemon=True)
+        dispatcher.start()
+        for index in range(jobs):
+            prompt_id, checkpoint = prompt_ids[index % len(prompt_ids)]
+            run.enqueue(prompt_id, f"bench_{name}_{index}", checkpoint)
+            if rate:
+                time.sleep(1.0 / rate)
+        dispatcher.join()
+        run.close()
+        report = run.report()
+    finally:
+        close_event_hubs()
+        close_clients()
+        for server in servers:
+            server.stop()
+        db_manager.close()
+    report["config"] = dict(options, jobs=jobs, checkpoints=checkpoints, rate=rate, concurrency=concurrency)
+    return report
+
+
+def print_report(name, report, baseline=None):
+    print(
+        f"\n== {name}: {report['jobs']} travaux ({report['errors']} en erreur) en {report['duration_s']:.2f}s "
+        f"-> {report['jobs_per_s']:.1f} travaux/s"
+    )
+    if baseline:
+        reference = baseline.get("jobs_per_s") or 0.0
+        if reference:
+            print(f"   référence: {reference:.1f} travaux/s ({(report['jobs_per_s'] - reference) / reference * 100:+.1f}%)")
+    print(f"   {'étape':<14}{'p50 (ms)':>10}{'p95 (ms)':>10}{'p99 (ms)':>10}{'moy. (ms)':>11}{'p95 réf.':>10}")
+    for stage in STAGES:
+        stats = report["stages"][stage]
+        if stats["p50"] is None:
+            continue
+        reference = ((baseline or {}).get("stages", {}).get(stage) or {}).get("p95")
+        reference_text = f"{reference:>10.2f}" if reference is not None else f"{'-':>10}"
+        print(
+            f"   {stage:<14}{stats['p50']:>10.2f}{stats['p95']:>10.2f}{stats['p99']:>10.2f}"
+            f"{stats['mean']:>11.2f}{reference_text}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la chaîne d'exécution cy8")
+    parser.add_argument("--jobs", type=int, default=50, help="Travaux par scénario")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="Scénario (défaut: tous)")
+    parser.add_argument("--checkpoints", type=int, default=2, help="Checkpoints distincts parmi les prompts")
+    parser.add_argument("--rate", type=float, default=0.0, help="Arrivées par seconde (0: tous d'un coup)")
+    parser.add_argument("--concurrency", type=int, default=None, help="Exécutions simultanées par backend")
+    parser.add_argument("--latency", type=float, default=None, help="Remplace la latence par node (s)")
+    parser.add_argument("--sampler-latency", type=float, default=None, help="Remplace la latence du KSampler (s)")
+    parser.add_argument("--output", help="Enregistrer les résultats en JSON (référence pour --baseline)")
+    parser.add_argument("--baseline", help="Résultats JSON de référence à comparer")
+    parser.add_argument("--verbose", action="store_true", help="Afficher les traces DEBUG de l'application")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f).get("scenarios", {})
+
+    results = {
+        "benchmark": "execution_pipeline",
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scenarios": {},
+    }
+    with tempfile.TemporaryDirectory() as work_dir:
+        # Images et schémas /object_info dans le dossier temporaire
+        os.environ["IMAGES_COLLECTE"] = os.path.join(work_dir, "images")
+        cy6_object_info._cache = comfyui_object_info_cache(cache_dir=os.path.join(work_dir, "object_info"))
+        for name in args.scenario or SCENARIOS:
+            options = dict(SCENARIOS[name])
+            if args.latency is not None:
+                options["node_latency"] = args.latency
+            if args.sampler_latency is not None:
+                options["sampler_latency"] = args.sampler_latency
+            quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+            with quiet:
+                report = run_scenario(
+                    name, options, args.jobs, args.checkpoints, args.rate, args.concurrency, work_dir
+                )
+            results["scenarios"][name] = report
+            print_report(name, report, baseline.get(name))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"\nRésultats enregistrés dans {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""
+Registre de backends ComfyUI et répartition des exécutions
+Chaque backend est sondé (/system_stats, /queue) ; une exécution part vers le backend
+qui a déjà son checkpoint chargé, sinon vers celui dont la file est la plus courte.
+Le nombre d'exécutions simultanées par backend est borné (max_concurrency) ; quand tous
+sont pleins, les places libérées vont d'abord aux demandes de plus haute priorité.
+Un backend dont le disjoncteur est ouvert (cy6_resilience) ne reçoit plus rien jusqu'au réarmement
+"""
+
+import os
+import time
+import threading
+from cy6_http_client import comfyui_http_client
+from cy6_resilience import is_connection_error, get_circuit_breaker
+
+# Priorités des demandes de backend (la plus haute est servie en premier)
+PRIORITY_LOW = 0  # Balayages et lots
+PRIORITY_NORMAL = 1
+PRIORITY_URGENT = 2
+
+
+class comfyui_backend:
+    """État connu d'un backend ComfyUI"""
+
+    def __init__(self, address):
+        self.address = address
+        self.healthy = True
+        self.queue_depth = 0
+        self.last_checked = None
+        self.last_error = None
+        # Dernier checkpoint envoyé à ce backend (ComfyUI le garde chargé entre deux exécutions)
+        self.loaded_checkpoint = None
+        # Exécutions attribuées par ce pool et pas encore rendues
+        self.in_flight = 0
+
+    def load(self):
+        """Charge estimée: file ComfyUI + exécutions en cours d'envoi"""
+        return self.queue_depth + self.in_flight
+
+    def __repr__(self):
+        state = "ok" if self.healthy else "hs"
+        return f"<comfyui_backend {self.address} {state} file={self.queue_depth} en_cours={self.in_flight}>"
+
+
+def probe_backend(address, timeout=2):
+    """Sonde par défaut: retourne la profondeur de file (/queue), lève une exception si injoignable"""
+    client = comfyui_http_client(address, timeout=timeout, pool_size=1)
+    try:
+        client.get_json("/system_stats")
+        queue = client.get_json("/queue")
+        return len(queue.get("queue_running", [])) + len(queue.get("queue_pending", []))
+    finally:
+        client.close()
+
+
+def max_concurrency_from_env():
+    """Exécutions simultanées par backend: COMFYUI_MAX_CONCURRENCY (défaut 2)"""
+    try:
+        return max(1, int(os.getenv("COMFYUI_MAX_CONCURRENCY", "")))
+    except ValueError:
+        return comfyui_backend_pool.MAX_CONCURRENCY
+
+
+def addresses_from_env():
+    """Backends déclarés: COMFYUI_SERVERS (séparés par des virgules), sinon COMFYUI_SERVER"""
+    servers = os.getenv("COMFYUI_SERVERS", "")
+    addresses = [address.strip() for address in servers.split(",") if address.strip()]
+    return addresses or [os.getenv("COMFYUI_SERVER", "127.0.0.1:8188")]
+
+
+class comfyui_backend_pool:
+    """Registre de backends avec contrôle de santé et choix du backend par exécution"""
+
+    # Délai entre deux sondages d'un même backend
+    HEALTH_INTERVAL_S = 5
+    # Un backend avec le bon checkpoint est préféré tant que sa charge ne dépasse pas
+    # celle du backend le moins chargé de plus de AFFINITY_SLACK exécutions
+    AFFINITY_SLACK = 2
+    # Exécutions simultanées par backend: une en cours chez ComfyUI, une prête derrière
+    MAX_CONCURRENCY = 2
+
+    def __init__(
+        self,
+        addresses,
+        probe=None,
+        health_interval=None,
+        clock=time.monotonic,
+        max_concurrency=None,
+        circuit_breaker=None,
+    ):
+        """
+        addresses: liste de "host:port" (doublons ignorés)
+        probe(address) -> profondeur de file ; une exception marque le backend hors service
+        max_concurrency: exécutions attribuées simultanément à un même backend
+        circuit_breaker(address) -> disjoncteur du backend (par défaut celui partagé avec les appels HTTP)
+        """
+        self.backends = []
+        for address in addresses:
+            if address not in (backend.address for backend in self.backends):
+                self.backends.append(comfyui_backend(address))
+        if not self.backends:
+            raise ValueError("Aucun backend ComfyUI déclaré")
+        self.probe = probe or probe_backend
+        self.health_interval = self.HEALTH_INTERVAL_S if health_interval is None else health_interval
+        self.clock = clock
+        self.max_concurrency = max_concurrency or self.MAX_CONCURRENCY
+        circuit_breaker = circuit_breaker or get_circuit_breaker
+        self.breakers = {backend.address: circuit_breaker(backend.address) for backend in self.backends}
+        self._lock = threading.Lock()
+        # Signalé quand une place se libère (release) ou qu'un sondage change l'état des backends
+        self._capacity = threading.Condition(self._lock)
+        # Demandes en attente d'une place, par priorité
+        self._waiting = {}
+
+    @classmethod
+    def from_env(cls, **kwargs):
+        kwargs.setdefault("max_concurrency", max_concurrency_from_env())
+        return cls(addresses_from_env(), **kwargs)
+
+    # === Santé ===
+
+    def refresh(self, force=False):
+        """
+        Sonder les backends dont le dernier contrôle est plus ancien que health_interval.
+        Un disjoncteur ouvert suspend les sondages ; au réarmement, le sondage sert d'essai
+        """
+        now = self.clock()
+        for backend in self.backends:
+            if not force and backend.last_checked is not None and now - backend.last_checked < self.health_interval:
+                continue
+            breaker = self.breakers[backend.address]
+            if breaker.is_open():
+                continue
+            try:
+                depth = self.probe(backend.address)
+                healthy, error = True, None
+                breaker.record_success()
+            except Exception as e:
+                depth, healthy, error = 0, False, str(e)
+                if is_connection_error(e):
+                    breaker.record_failure()
+                if backend.healthy:
+                    print(f"DEBUG: Backend ComfyUI {backend.address} hors service: {e}")
+            with self._lock:
+                backend.queue_depth = depth
+                backend.healthy = healthy
+                backend.last_error = error
+                backend.last_checked = now
+                self._capacity.notify_all()
+
+    def _usable(self, backend):
+        """Backend sain dont le disjoncteur n'est pas ouvert"""
+        return backend.healthy and not self.breakers[backend.address].is_open()
+
+    def healthy_backends(self):
+        with self._lock:
+            return [backend for backend in self.backends if self._usable(backend)]
+
+    def capacity(self):
+        """Nombre total d'exécutions simultanées autorisées sur les backends sains (0: répartition suspendue)"""
+        with self._lock:
+            return self.max_concurrency * sum(1 for backend in self.backends if self._usable(backend))
+
+    def has_capacity(self):
+        """Au moins un backend sain peut recevoir une exécution de plus"""
+        with self._lock:
+            return any(self._usable(backend) and backend.in_flight < self.max_concurrency for backend in self.backends)
+
+    # === Répartition ===
+
+    def select(self, checkpoint=None):
+        """Backend sain le plus adapté (sans réservation) ; None si aucun n'est disponible ou tous sont pleins"""
+        self.refresh()
+        with self._lock:
+            return self._select(checkpoint)
+
+    def _select(self, checkpoint):
+        candidates = [
+            backend for backend in self.backends if self._usable(backend) and backend.in_flight < self.max_concurrency
+        ]
+        if not candidates:
+            return None
+        least_loaded = min(candidates, key=comfyui_backend.load)
+        if checkpoint:
+            warm = [backend for backend in candidates if backend.loaded_checkpoint == checkpoint]
+            if warm:
+                best_warm = min(warm, key=comfyui_backend.load)
+                if best_warm.load() <= least_loaded.load() + self.AFFINITY_SLACK:
+                    return best_warm
+        return least_loaded
+
+    def acquire(self, checkpoint=None, timeout=None, priority=PRIORITY_NORMAL):
+        """
+        Réserver un backend pour une exécution, en attendant une place si tous sont pleins.
+        timeout: attente maximale en secondes (None = sans limite, 0 = aucune attente).
+        priority: une place libérée ne va pas à une demande tant qu'une demande plus prioritaire attend.
+        RuntimeError si aucun backend n'est joignable ou si l'attente expire
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        waiting = False
+        try:
+            while True:
+                self.refresh()
+                with self._lock:
+                    if not any(self._usable(backend) for backend in self.backends):
+                        raise RuntimeError("Aucun backend ComfyUI disponible")
+                    outranked = any(level > priority and count for level, count in self._waiting.items())
+                    backend = None if outranked else self._select(checkpoint)
+                    if backend is not None:
+                        backend.in_flight += 1
+                        if checkpoint:
+                            backend.loaded_checkpoint = checkpoint
+                        return backend
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise RuntimeError("Tous les backends ComfyUI sont occupés")
+                    if not waiting:
+                        self._waiting[priority] = self._waiting.get(priority, 0) + 1
+                        waiting = True
+                    # Réveil périodique: un backend revenu en service n'émet pas de release
+                    wait = self.health_interval or 1
+                    self._capacity.wait(wait if remaining is None else min(wait, remaining))
+        finally:
+            if waiting:
+                with self._lock:
+                    self._waiting[priority] -= 1
+                    self._capacity.notify_all()
+
+    def release(self, backend, failed=False):
+        """Rendre un backend ; failed=True le marque hors service jusqu'au prochain sondage"""
+        if failed:
+            self.breakers[backend.address].record_failure()
+        with self._lock:
+            backend.in_flight = max(0, backend.in_flight - 1)
+            if failed:
+                backend.healthy = False
+                backend.last_checked = None
+            self._capacity.notify_all()
+
+    def lease(self, checkpoint=None, priority=PRIORITY_NORMAL):
+        """Réservation utilisable avec `with`: le backend est rendu en sortie"""
+        return comfyui_backend_lease(self, checkpoint, priority)
+
+    def describe(self):
+        """Résumé lisible de l'état des backends"""
+        with self._lock:
+            return ", ".join(
+                f"{backend.address} ({self._state_label(backend)}, file {backend.load()}, "
+                f"{backend.in_flight}/{self.max_concurrency} en cours)"
+                for backend in self.backends
+            )
+
+    def _state_label(self, backend):
+        if self.breakers[backend.address].is_open():
+            return "suspendu"
+        return "ok" if backend.healthy else "hors service"
+
+
+class comfyui_backend_lease:
+    """Contexte de réservation d'un backend (marqué hors service si une erreur de connexion survient)"""
+
+    def __init__(self, pool, checkpoint=None, priority=PRIORITY_NORMAL):
+        self.pool = pool
+        self.checkpoint = checkpoint
+        self.priority = priority
+        self.backend = None
+
+    def __enter__(self):
+        self.backend = self.pool.acquire(self.checkpoint, priority=self.priority)
+        return self.backend
+
+    def __exit__(self, exc_type, exc, tb):
+        self.pool.release(self.backend, failed=exc is not None and is_connection_error(exc))
+        return False
@@ -0,0 +1,372 @@
+"""
+Hub d'événements WebSocket ComfyUI
+Une seule connexion WebSocket par backend, un thread lecteur qui route les messages
+vers les abonnés de chaque prompt_id. Une connexion perdue est rouverte (attente exponentielle)
+et les prompts suivis sont resynchronisés depuis /history.
+Les messages sont horodatés à la réception pour mesurer la durée de chaque node (cy6_node_timings)
+"""
+
+import json
+import time
+import queue
+import threading
+import collections
+import concurrent.futures
+import websocket  # NOTE: websocket-client (https://github.com/websocket-client/websocket-client)
+from cy6_http_client import get_client
+from cy6_resilience import backoff_delays
+from cy6_node_timings import comfyui_node_timings
+
+
+class comfyui_event_hub:
+    """Connexion WebSocket partagée et routage des événements par prompt_id"""
+
+    # Messages reçus avant l'abonnement (le prompt_id n'est connu qu'après /prompt) et durées des nodes:
+    # prompts gardés au plus, les moins récemment actifs sans abonné étant écartés d'abord
+    BUFFER_PROMPTS = 512
+    BUFFER_EVENTS = 256
+    # Tentatives de reconnexion avant de déclarer la connexion perdue
+    RECONNECT_ATTEMPTS = 6
+    # Messages de fin d'exécution rejoués depuis le statut /history après une reconnexion
+    TERMINAL_MESSAGES = ("execution_success", "execution_error", "execution_interrupted")
+
+    def __init__(
+        self, server_address, client_id, connect=None, fetch_history=None, sleep=time.sleep, clock=time.monotonic
+    ):
+        """
+        connect() -> WebSocket connectée ; fetch_history(prompt_id) -> entrée /history ou None
+        clock: horloge des horodatages de réception (durées des nodes)
+        """
+        self.server_address = server_address
+        self.client_id = client_id
+        self.connect = connect or self._connect
+        self.fetch_history = fetch_history or self._fetch_history
+        self.sleep = sleep
+        self.clock = clock
+        self._ws = None
+        self._thread = None
+        self._running = False
+        # Protège abonnés, tampons et durées ; les callbacks sont appelés hors verrou (sauf rejeu à l'abonnement)
+        self._lock = threading.RLock()
+        self._subscribers = {}
+        self._listeners = []
+        self._buffers = collections.OrderedDict()
+        # Durées des nodes par prompt_id, relevées dès le premier message (même sans abonné)
+        self._timings = collections.OrderedDict()
+
+    # === Connexion ===
+
+    def start(self):
+        """Ouvrir la connexion et démarrer le lecteur (sans effet s'il tourne déjà)"""
+        with self._lock:
+            if self.is_running():
+                return
+            ws = self.connect()
+            self._ws = ws
+            self._running = True
+            self._thread = threading.Thread(
+                target=self._reader, args=(ws,), daemon=True, name=f"comfyui-hub-{self.server_address}"
+            )
+            self._thread.start()
+
+    def _connect(self):
+        ws = websocket.WebSocket()
+        ws.connect(f"ws://{self.server_address}/ws?clientId={self.client_id}")
+        return ws
+
+    def _fetch_history(self, prompt_id):
+        return get_client(self.server_address).get_history(prompt_id).get(prompt_id)
+
+    def is_running(self):
+        return self._running and self._thread is not None and self._thread.is_alive()
+
+    def close(self):
+        """Arrêter le lecteur et fermer la connexion"""
+        self._running = False
+        ws, self._ws = self._ws, None
+        if ws:
+            try:
+                ws.close()
+            except Exception:
+                pass
+
+    def _reader(self, ws):
+        while self._running:
+            try:
+                out = ws.recv()
+            except websocket.WebSocketTimeoutException:
+                continue
+            except Exception as e:
+                if not self._running:
+                    break
+                print(f"DEBUG: Connexion WebSocket {self.server_address} perdue: {e}")
+                ws = self._reconnect()
+                if ws is None:
+                    break
+                continue
+            if not isinstance(out, str):
+                continue  # Les aperçus sont des données binaires
+            try:
+                message = json.loads(out)
+            except ValueError:
+                continue
+            self.dispatch(message)
+        lost = self._running
+        self._running = False
+        if lost:
+            self._notify_connection_lost()
+
+    def _reconnect(self):
+        """Rouvrir la connexion (même client_id: ComfyUI reprend l'envoi des événements) puis resynchroniser"""
+        for delay in backoff_delays(self.RECONNECT_ATTEMPTS + 1):
+            self.sleep(delay)
+            if not self._running:
+                return None
+            try:
+                ws = self.connect()
+            except Exception as e:
+                print(f"DEBUG: Reconnexion WebSocket {self.server_address} impossible: {e}")
+                continue
+            with self._lock:
+                self._ws = ws
+            print(f"DEBUG: Connexion WebSocket {self.server_address} rétablie")
+            self._resync()
+            return ws
+        return None
+
+    def _resync(self):
+        """Rejouer la fin des prompts suivis terminés pendant la coupure (lue dans /history)"""
+        with self._lock:
+            prompt_ids = list(self._subscribers)
+        for prompt_id in prompt_ids:
+            try:
+                history = self.fetch_history(prompt_id)
+            except Exception as e:
+                print(f"DEBUG: Resynchronisation de {prompt_id} impossible: {e}")
+                continue
+            if not history:
+                continue  # Encore en file ou en cours: les événements reprennent sur la nouvelle connexion
+            messages = [
+                (message_type, data)
+                for message_type, data in (history.get("status") or {}).get("messages") or []
+                if message_type in self.TERMINAL_MESSAGES
+            ]
+            if not messages:
+                messages = [("execution_success", {})]  # Serveur ancien: présent dans /history = terminé
+            for message_type, data in messages:
+                self.dispatch({"type": message_type, "data": dict(data or {}, prompt_id=prompt_id)})
+
+    def _notify_connection_lost(self):
+        """Signaler la perte de connexion à chaque prompt suivi"""
+        with self._lock:
+            prompt_ids = list(self._subscribers)
+        for prompt_id in prompt_ids:
+            self.dispatch({"type": "connection_lost", "data": {"prompt_id": prompt_id}})
+
+    # === Abonnements ===
+
+    def subscribe(self, prompt_id, callback):
+        """
+        Recevoir les messages d'un prompt: callback(message).
+        Les messages arrivés avant l'abonnement sont rejoués d'abord, dans l'ordre
+        (sous verrou: aucun message plus récent ne peut les devancer).
+        """
+        with self._lock:
+            self._subscribers.setdefault(prompt_id, []).append(callback)
+            for message in self._buffers.pop(prompt_id, ()):
+                callback(message)
+
+    def unsubscribe(self, prompt_id, callback=None):
+        with self._lock:
+            callbacks = self._subscribers.get(prompt_id, [])
+            if callback is not None and callback in callbacks:
+                callbacks.remove(callback)
+            if callback is None or not callbacks:
+                self._subscribers.pop(prompt_id, None)
+
+    def add_listener(self, callback):
+        """Recevoir tous les messages (y compris 'status' sans prompt_id)"""
+        with self._lock:
+            self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        with self._lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def dispatch(self, message):
+        """Router un message décodé vers les écouteurs et les abonnés de son prompt_id"""
+        data = message.get("data")
+        prompt_id = data.get("prompt_id") if isinstance(data, dict) else None
+        # Copie des destinataires sous verrou, appels après sa libération: un callback lent ne bloque
+        # ni les abonnements des autres threads ni le routage (un seul lecteur: l'ordre est conservé)
+        with self._lock:
+            callbacks = list(self._listeners)
+            if prompt_id is not None:
+                self._node_timings(prompt_id).on_event(message, self.clock())
+                subscribers = self._subscribers.get(prompt_id)
+                if subscribers:
+                    callbacks.extend(subscribers)
+                else:
+                    buffer = self._buffers.get(prompt_id)
+                    if buffer is None:
+                        buffer = self._buffers[prompt_id] = collections.deque(maxlen=self.BUFFER_EVENTS)
+                        self._evict(self._buffers)
+                    else:
+                        self._buffers.move_to_end(prompt_id)
+                    buffer.append(message)
+        for callback in callbacks:
+            self._safe_call(callback, message)
+
+    def _node_timings(self, prompt_id):
+        timings = self._timings.get(prompt_id)
+        if timings is None:
+            timings = self._timings[prompt_id] = comfyui_node_timings(self.clock)
+            self._evict(self._timings)
+        else:
+            self._timings.move_to_end(prompt_id)
+        return timings
+
+    def _evict(self, entries):
+        """Écarter les prompts les moins récemment actifs au-delà de BUFFER_PROMPTS, jamais un prompt suivi"""
+        excess = len(entries) - self.BUFFER_PROMPTS
+        if excess <= 0:
+            return
+        stale = [prompt_id for prompt_id in entries if prompt_id not in self._subscribers][:excess]
+        for prompt_id in stale:
+            del entries[prompt_id]
+
+    def node_timings(self, prompt_id):
+        """Durées des nodes d'un prompt (comfyui_node_timings, complétée au fil des messages)"""
+        with self._lock:
+            return self._node_timings(prompt_id)
+
+    @staticmethod
+    def _safe_call(callback, message):
+        try:
+            callback(message)
+        except Exception as e:
+            print(f"DEBUG: Erreur dans un abonné WebSocket: {e}")
+
+    def channel(self, prompt_id):
+        """Vue WebSocket (recv/settimeout) limitée aux messages d'un prompt"""
+        return comfyui_prompt_channel(self, prompt_id)
+
+    def track(self, prompt_id, on_event=None):
+        """Suivre la fin d'exécution d'un prompt (voir comfyui_prompt_tracker)"""
+        return comfyui_prompt_tracker(self, prompt_id, on_event)
+
+
+class comfyui_prompt_tracker:
+    """
+    Fin d'exécution d'un prompt signalée par les événements ComfyUI, sans polling.
+    Issues: success (executing node=None / execution_success), error (execution_error),
+    interrupted (execution_interrupted), disconnected (connexion perdue: le prompt peut
+    encore s'exécuter, issue à relire dans /history) ou timeout (dans wait).
+    """
+
+    SUCCESS = "success"
+    ERROR = "error"
+    INTERRUPTED = "interrupted"
+    DISCONNECTED = "disconnected"
+    TIMEOUT = "timeout"
+
+    def __init__(self, hub, prompt_id, on_event=None):
+        self.hub = hub
+        self.prompt_id = prompt_id
+        self.on_event = on_event
+        self.future = concurrent.futures.Future()
+        # Durées des nodes relevées par le hub (y compris pour les messages reçus avant l'abonnement)
+        self.timings = hub.node_timings(prompt_id)
+        hub.subscribe(prompt_id, self._on_message)
+
+    def _on_message(self, message):
+        message_type = message.get("type")
+        data = message.get("data") or {}
+        if message_type == "executing" and data.get("node") is None:
+            self._finish(self.SUCCESS, "Terminé")
+        elif message_type == "execution_success":
+            self._finish(self.SUCCESS, "Terminé")
+        elif message_type == "execution_error":
+            node = data.get("node_type") or data.get("node_id") or "?"
+            self._finish(self.ERROR, f"{node}: {data.get('exception_message', 'erreur inconnue')}".strip())
+        elif message_type == "execution_interrupted":
+            self._finish(self.INTERRUPTED, "Interrompu")
+        elif message_type == "connection_lost":
+            self._finish(self.DISCONNECTED, "Connexion WebSocket perdue")
+        if self.on_event:
+            self.on_event(message)
+
+    def _finish(self, outcome, message):
+        if not self.future.done():
+            self.future.set_result((outcome, message))
+
+    def done(self):
+        return self.future.done()
+
+    def add_done_callback(self, callback):
+        """callback(issue, message) appelé dès la fin (depuis le thread lecteur du hub)"""
+        self.future.add_done_callback(lambda future: callback(*future.result()))
+
+    def wait(self, timeout=None):
+        """Attendre la fin: retourne (issue, message), ('timeout', ...) si le délai expire"""
+        try:
+            return self.future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            return self.TIMEOUT, f"Aucune fin signalée après {timeout}s"
+
+    def close(self):
+        self.hub.unsubscribe(self.prompt_id, self._on_message)
+
+
+class comfyui_prompt_channel:
+    """
+    Remplaçant d'un websocket.WebSocket pour un seul prompt: compatible avec
+    socket_get_images et workflow_is_running (recv, settimeout, close)
+    """
+
+    def __init__(self, hub, prompt_id):
+        self.hub = hub
+        self.prompt_id = prompt_id
+        self._queue = queue.Queue()
+        self._timeout = None
+        hub.subscribe(prompt_id, self._queue.put)
+
+    def settimeout(self, timeout):
+        self._timeout = timeout
+
+    def recv(self):
+        try:
+            return json.dumps(self._queue.get(timeout=self._timeout))
+        except queue.Empty:
+            raise websocket.WebSocketTimeoutException(f"Aucun message pour {self.prompt_id}")
+
+    def close(self):
+        self.hub.unsubscribe(self.prompt_id, self._queue.put)
+
+
+_hubs = {}
+_hubs_lock = threading.Lock()
+
+
+def get_event_hub(server_address, client_id):
+    """Hub partagé d'un backend, démarré au besoin"""
+    with _hubs_lock:
+        hub = _hubs.get(server_address)
+        if hub is None or hub.client_id != client_id:
+            hub = _hubs[server_address] = comfyui_event_hub(server_address, client_id)
+    hub.start()
+    return hub
+
+
+def close_event_hubs():
+    """Fermer toutes les connexions WebSocket partagées"""
+    with _hubs_lock:
+        hubs = list(_hubs.values())
+        _hubs.clear()
+    for hub in hubs:
+        hub.close()
@@ -0,0 +1,127 @@
+"""
+Progression réelle d'une exécution ComfyUI
+Calculée à partir des événements WebSocket: nodes terminés / nodes du workflow
+(hors nodes en cache) plus les pas du sampler (événements 'progress')
+"""
+
+import time
+import threading
+
+
+class comfyui_execution_progress:
+    """Convertit les événements d'un prompt en pourcentage et message, à débit limité"""
+
+    # Intervalle minimal entre deux rapports
+    MIN_INTERVAL_S = 0.5
+    # Sans événement depuis ce délai, le rapport signale une exécution bloquée
+    STALL_AFTER_S = 30
+
+    def __init__(self, workflow, report, start=75, end=95, min_interval=None, clock=time.monotonic):
+        """
+        workflow: workflow au format API ({node_id: {"class_type": ...}})
+        report(pourcentage, message): appelé au plus toutes les min_interval secondes
+        start/end: plage de pourcentage couverte par la génération
+        """
+        self.node_types = {
+            str(node_id): node["class_type"]
+            for node_id, node in workflow.items()
+            if isinstance(node, dict) and "class_type" in node
+        }
+        self.report = report
+        self.start = start
+        self.end = end
+        self.min_interval = self.MIN_INTERVAL_S if min_interval is None else min_interval
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.started = False
+        self.cached = set()
+        self.completed = set()
+        self.current_node = None
+        self.step = 0
+        self.steps = 0
+        self.last_event_at = clock()
+        self._last_report_at = None
+        self._last_report = None
+
+    # === Calcul ===
+
+    def fraction(self):
+        """Part du travail effectuée (0.0 à 1.0)"""
+        total = len(set(self.node_types) - self.cached)
+        if total <= 0:
+            return 1.0 if self.started else 0.0
+        done = len(self.completed - self.cached)
+        if self.current_node is not None and self.steps:
+            done += self.step / self.steps
+        return min(1.0, done / total)
+
+    def percent(self):
+        return self.start + int(self.fraction() * (self.end - self.start))
+
+    def describe(self):
+        """Message lisible: node courant, pas du sampler, nodes terminés"""
+        if not self.started:
+            return "En attente dans la queue ComfyUI"
+        total = len(set(self.node_types) - self.cached)
+        done = len(self.completed - self.cached)
+        message = f"Génération: {done}/{total} nodes"
+        if self.cached:
+            message += f" ({len(self.cached)} en cache)"
+        if self.current_node is not None:
+            message += f" - {self.node_types.get(self.current_node, '?')} #{self.current_node}"
+            if self.steps:
+                message += f" {self.step}/{self.steps} pas"
+        return message
+
+    # === Événements ===
+
+    def on_event(self, message):
+        """Abonné du hub: mettre à jour l'état puis rapporter si l'intervalle est écoulé"""
+        message_type = message.get("type")
+        data = message.get("data") or {}
+        with self._lock:
+            self.last_event_at = self.clock()
+            if message_type == "execution_start":
+                self.started = True
+            elif message_type == "execution_cached":
+                self.started = True
+                self.cached.update(str(node) for node in data.get("nodes") or ())
+            elif message_type == "executing":
+                self.started = True
+                if self.current_node is not None:
+                    self.completed.add(self.current_node)
+                node = data.get("node")
+                self.current_node = str(node) if node is not None else None
+                self.step = self.steps = 0
+            elif message_type == "executed":
+                node = data.get("node")
+                if node is not None:
+                    self.completed.add(str(node))
+            elif message_type == "progress":
+                self.step = data.get("value", 0)
+                self.steps = data.get("max", 0)
+                node = data.get("node")
+                if node is not None:
+                    self.current_node = str(node)
+            else:
+                return
+        self._emit()
+
+    def tick(self):
+        """Appelé périodiquement par l'attente: signale une exécution sans événement récent"""
+        with self._lock:
+            idle = self.clock() - self.last_event_at
+        if idle >= self.STALL_AFTER_S:
+            self._emit(f" - aucun événement depuis {int(idle)}s")
+
+    def _emit(self, suffix=""):
+        with self._lock:
+            now = self.clock()
+            if self._last_report_at is not None and now - self._last_report_at < self.min_interval:
+                return
+            report = (self.percent(), self.describe() + suffix)
+            if report == self._last_report:
+                return
+            self._last_report_at = now
+            self._last_report = report
+        self.report(*report)
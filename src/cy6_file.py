@@ -1,4 +1,6 @@
 import json 
+import os
+import time
  
 def load_json(fileToOpen):
          #print(f"open file {file }")
@@ -15,4 +17,16 @@ def log_json(name,data):
    
     with open(f"G:/out/{name}.json", "w") as json_file:
             json.dump(data, json_file, indent=4)
-            
\ No newline at end of file
+            
+
+def dump_workflow(dump_dir, name, workflow, values):
+    """Sink de debug: écrire le workflow patché et ses valeurs dans dump_dir"""
+    os.makedirs(dump_dir, exist_ok=True)
+    timestamp = time.strftime("%Y%m%d_%H%M%S")
+    paths = []
+    for kind, data in (("workflow", workflow), ("values", values)):
+        path = os.path.join(dump_dir, f"{name}_{kind}_{timestamp}.json")
+        with open(path, "w", encoding="utf-8") as json_file:
+            json.dump(data, json_file, indent=4)
+        paths.append(path)
+    return paths
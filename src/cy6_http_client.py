@@ -0,0 +1,219 @@
+"""
+Client HTTP ComfyUI avec connexions keep-alive réutilisées
+Un client par backend (host:port), chaque client garde un petit pool de connexions ouvertes
+"""
+
+import io
+import os
+import json
+import select
+import threading
+import http.client
+import urllib.error
+import urllib.parse
+
+
+# Erreurs indiquant qu'une connexion keep-alive réutilisée a été fermée par le serveur
+STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.CannotSendRequest,
+    http.client.BadStatusLine,
+    BrokenPipeError,
+    ConnectionResetError,
+    ConnectionAbortedError,
+)
+
+# Méthodes rejouables sans risque si la réponse n'a pas été reçue (jamais POST /prompt: doublon de prompt)
+IDEMPOTENT_METHODS = ("GET", "HEAD")
+
+
+class comfyui_http_client:
+    """Client HTTP d'un backend ComfyUI (connexions HTTP/1.1 persistantes)"""
+
+    # Taille des blocs écrits sur disque lors d'un téléchargement
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, server_address, timeout=30, pool_size=4):
+        self.server_address = server_address
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self._idle = []
+        self._lock = threading.Lock()
+
+    # === Pool de connexions ===
+
+    def _acquire(self):
+        """Retourne (connexion, réutilisée) ; les connexions déjà fermées par le serveur sont écartées"""
+        while True:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                return http.client.HTTPConnection(self.server_address, timeout=self.timeout), False
+            if not self._is_dropped(conn):
+                return conn, True
+            conn.close()
+
+    @staticmethod
+    def _is_dropped(conn):
+        """Connexion inactive lisible = fermeture (ou données inattendues) côté serveur"""
+        if conn.sock is None:
+            return True
+        try:
+            return bool(select.select([conn.sock], [], [], 0)[0])
+        except (OSError, ValueError):
+            return True
+
+    def _release(self, conn):
+        with self._lock:
+            if len(self._idle) < self.pool_size:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def close(self):
+        """Fermer toutes les connexions inactives"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    # === Requêtes ===
+
+    def request(self, method, path, body=None, headers=None):
+        """
+        Envoyer une requête et lire toute la réponse.
+        Retourne (status, headers, corps) ; lève urllib.error.HTTPError si status >= 400
+        (même contrat que urllib.request.urlopen pour les appelants existants).
+        """
+        return self._send(method, path, body, headers, lambda response: response.read())
+
+    def _send(self, method, path, body, headers, consume):
+        """Envoyer une requête ; consume(réponse) lit le corps (retourne (status, headers, résultat))"""
+        headers = dict(headers or {})
+        while True:
+            conn, reused = self._acquire()
+            sent = False
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                sent = True
+                response = conn.getresponse()
+                if response.status >= 400:
+                    data = response.read()
+                else:
+                    data = consume(response)
+            except STALE_CONNECTION_ERRORS:
+                conn.close()
+                # Connexion fermée côté serveur pendant l'inactivité: nouvelle connexion, sauf si une requête
+                # non idempotente a pu être reçue (le serveur l'a peut-être traitée avant de couper)
+                if reused and (not sent or method in IDEMPOTENT_METHODS):
+                    continue
+                raise
+            except Exception:
+                conn.close()
+                raise
+
+            if response.will_close:
+                conn.close()
+            else:
+                self._release(conn)
+            break
+
+        if response.status >= 400:
+            url = f"http://{self.server_address}{path}"
+            raise urllib.error.HTTPError(url, response.status, response.reason, response.headers, io.BytesIO(data))
+        return response.status, response.headers, data
+
+    def content_length(self, path):
+        """Taille annoncée par une requête HEAD (None si inconnue)"""
+        length = self.request("HEAD", path)[1].get("Content-Length")
+        return int(length) if length and length.isdigit() else None
+
+    def download(self, path, destination, chunk_size=None):
+        """
+        Écrire le corps de la réponse dans `destination` par blocs (mémoire constante).
+        Écriture dans un fichier .part remplacé à la fin ; retourne le nombre d'octets écrits
+        """
+        chunk_size = chunk_size or self.CHUNK_SIZE
+        partial = destination + ".part"
+
+        def write(response):
+            written = 0
+            with open(partial, "wb") as output:
+                while True:
+                    chunk = response.read(chunk_size)
+                    if not chunk:
+                        break
+                    output.write(chunk)
+                    written += len(chunk)
+            return written
+
+        try:
+            written = self._send("GET", path, None, None, write)[2]
+        except BaseException:
+            if os.path.exists(partial):
+                os.remove(partial)
+            raise
+        os.replace(partial, destination)
+        return written
+
+    def get_json(self, path):
+        return json.loads(self.request("GET", path)[2])
+
+    def post_json(self, path, payload):
+        data = json.dumps(payload).encode("utf-8")
+        return json.loads(self.request("POST", path, body=data, headers={"Content-Type": "application/json"})[2])
+
+    def post(self, path, payload=None):
+        """POST JSON sans réponse exploitable (/queue et /interrupt répondent sans corps)"""
+        data = json.dumps(payload or {}).encode("utf-8")
+        self.request("POST", path, body=data, headers={"Content-Type": "application/json"})
+
+    # === API ComfyUI ===
+
+    def queue_prompt(self, prompt, client_id):
+        return self.post_json("/prompt", {"prompt": prompt, "client_id": client_id})
+
+    def get_history(self, prompt_id):
+        return self.get_json(f"/history/{prompt_id}")
+
+    def get_queue(self):
+        return self.get_json("/queue")
+
+    def delete_queued(self, prompt_ids):
+        """Retirer des prompts en attente de la file ComfyUI"""
+        self.post("/queue", {"delete": list(prompt_ids)})
+
+    def interrupt(self, prompt_id=None):
+        """Interrompre l'exécution en cours (limitée à prompt_id sur les serveurs récents)"""
+        self.post("/interrupt", {"prompt_id": prompt_id} if prompt_id else {})
+
+    @staticmethod
+    def view_path(filename, subfolder, folder_type):
+        query = urllib.parse.urlencode({"filename": filename, "subfolder": subfolder, "type": folder_type})
+        return f"/view?{query}"
+
+    def get_image(self, filename, subfolder, folder_type):
+        return self.request("GET", self.view_path(filename, subfolder, folder_type))[2]
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(server_address):
+    """Client partagé pour un backend (créé au premier appel)"""
+    with _clients_lock:
+        client = _clients.get(server_address)
+        if client is None:
+            client = comfyui_http_client(server_address)
+            _clients[server_address] = client
+        return client
+
+
+def close_clients():
+    """Fermer les connexions de tous les backends"""
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        client.close()
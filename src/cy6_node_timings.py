@@ -0,0 +1,165 @@
+"""
+Durées par node d'une exécution ComfyUI
+Relevées depuis les événements WebSocket horodatés par le hub: début et fin de chaque node
+(un node finit quand le suivant commence), nodes en cache et vitesse du sampler (pas/s)
+"""
+
+import time
+import threading
+
+
+class comfyui_node_timings:
+    """Chronologie des nodes d'un prompt construite événement par événement"""
+
+    TERMINAL_STATUS = {"execution_success": "ok", "execution_error": "error", "execution_interrupted": "interrupted"}
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.started_at = None
+        self.finished_at = None
+        self.cached = []
+        # node_id -> {"start", "end", "status", "steps", "first_step", "first_step_at", "last_step_at"}
+        self.nodes = {}
+        self.order = []
+        self.current = None
+
+    # === Événements ===
+
+    def on_event(self, message, at=None):
+        """Prendre en compte un message du prompt reçu à l'instant at (horloge du hub)"""
+        message_type = message.get("type")
+        data = message.get("data") or {}
+        at = self.clock() if at is None else at
+        with self._lock:
+            if message_type == "execution_start":
+                self.started_at = at
+            elif message_type == "execution_cached":
+                for node in data.get("nodes") or ():
+                    if str(node) not in self.cached:
+                        self.cached.append(str(node))
+            elif message_type == "executing":
+                self._finish_current(at)
+                node = data.get("node")
+                if node is None:
+                    self.finished_at = at
+                else:
+                    self._start(str(node), at)
+            elif message_type == "executed":
+                if data.get("node") is not None and str(data["node"]) == self.current:
+                    self._finish_current(at)
+            elif message_type == "progress":
+                node = str(data["node"]) if data.get("node") is not None else self.current
+                if node is None:
+                    return
+                entry = self.nodes.get(node) or self._start(node, at)
+                value = data.get("value", 0)
+                if entry["first_step_at"] is None:
+                    entry["first_step"], entry["first_step_at"] = value, at
+                entry["steps"], entry["last_step_at"] = value, at
+            elif message_type in self.TERMINAL_STATUS:
+                status = self.TERMINAL_STATUS[message_type]
+                node = data.get("node_id")
+                if status != "ok" and node is not None and str(node) in self.nodes:
+                    self.nodes[str(node)]["status"] = status
+                self._finish_current(at, status if status != "ok" else None)
+                if self.finished_at is None:
+                    self.finished_at = at
+
+    def _start(self, node, at):
+        self.current = node
+        if node not in self.nodes:
+            self.order.append(node)
+        entry = self.nodes[node] = {
+            "start": at,
+            "end": None,
+            "status": "ok",
+            "steps": 0,
+            "first_step": 0,
+            "first_step_at": None,
+            "last_step_at": None,
+        }
+        return entry
+
+    def _finish_current(self, at, status=None):
+        if self.current is None:
+            return
+        entry = self.nodes[self.current]
+        if entry["end"] is None:
+            entry["end"] = at
+        if status:
+            entry["status"] = status
+        self.current = None
+
+    # === Rapport ===
+
+    @staticmethod
+    def _steps_per_s(entry):
+        if not entry["steps"] or entry["last_step_at"] is None:
+            return None
+        # Vitesse entre le premier et le dernier pas (hors chargement du sampler), sinon depuis le début du node
+        if entry["last_step_at"] > entry["first_step_at"] and entry["steps"] > entry["first_step"]:
+            return (entry["steps"] - entry["first_step"]) / (entry["last_step_at"] - entry["first_step_at"])
+        if entry["last_step_at"] > entry["start"]:
+            return entry["steps"] / (entry["last_step_at"] - entry["start"])
+        return None
+
+    def report(self, workflow=None):
+        """
+        Durées sérialisables (JSON): {"total_s", "nodes": [{"node", "class_type", "status",
+        "duration_s", "steps", "steps_per_s"}]} dans l'ordre d'exécution, nodes en cache en premier.
+        workflow: workflow API soumis, pour nommer les classes des nodes
+        """
+        workflow = workflow or {}
+
+        def class_type(node):
+            return (workflow.get(node) or {}).get("class_type") or "?"
+
+        with self._lock:
+            nodes = [
+                {
+                    "node": node,
+                    "class_type": class_type(node),
+                    "status": "cached",
+                    "duration_s": None,
+                    "steps": 0,
+                    "steps_per_s": None,
+                }
+                for node in self.cached
+                if node not in self.nodes
+            ]
+            for node in self.order:
+                entry = self.nodes[node]
+                nodes.append(
+                    {
+                        "node": node,
+                        "class_type": class_type(node),
+                        "status": entry["status"] if entry["end"] is not None or entry["status"] != "ok" else "running",
+                        "duration_s": entry["end"] - entry["start"] if entry["end"] is not None else None,
+                        "steps": entry["steps"],
+                        "steps_per_s": self._steps_per_s(entry),
+                    }
+                )
+            total = None
+            if self.started_at is not None and self.finished_at is not None:
+                total = self.finished_at - self.started_at
+        return {"total_s": total, "nodes": nodes}
+
+
+def format_node_timings(report):
+    """Tableau texte des durées (plus long en premier) avec la part de chaque node dans le rendu"""
+    nodes = (report or {}).get("nodes") or []
+    if not nodes:
+        return []
+    measured = sum(node["duration_s"] or 0 for node in nodes)
+    lines = [f"{'Node':<6}{'Classe':<26}{'Durée (s)':>10}{'Part':>7}{'Pas/s':>8}  Statut"]
+    for node in sorted(nodes, key=lambda node: -(node["duration_s"] or -1)):
+        duration = node["duration_s"]
+        duration_text = f"{duration:>10.2f}" if duration is not None else f"{'-':>10}"
+        share = f"{duration / measured * 100:>6.0f}%" if duration is not None and measured else f"{'-':>7}"
+        rate = f"{node['steps_per_s']:>8.2f}" if node.get("steps_per_s") else f"{'-':>8}"
+        lines.append(f"{node['node']:<6}{node['class_type'][:25]:<26}{duration_text}{share}{rate}  {node['status']}")
+    total = (report or {}).get("total_s")
+    if total is not None:
+        lines.append(f"Total: {total:.2f}s")
+    return lines
@@ -0,0 +1,162 @@
+"""
+Validation locale des workflows avant soumission
+Le schéma des nodes (/object_info) est lu une fois par backend et mis en cache sur disque
+par version de ComfyUI ; un workflow patché est vérifié (classes de nodes, entrées requises,
+liens) sans aller-retour HTTP 400
+"""
+
+import os
+import re
+import json
+import time
+import threading
+from cy6_http_client import get_client
+
+
+class comfyui_validation_error(ValueError):
+    """Workflow refusé par la validation locale (liste des erreurs dans `errors`)"""
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        summary = "; ".join(self.errors[:3])
+        if len(self.errors) > 3:
+            summary += f" (+{len(self.errors) - 3})"
+        super().__init__(f"Workflow invalide: {summary}")
+
+
+def is_link(value):
+    """Entrée reliée à la sortie d'un autre node: [node_id, index de sortie]"""
+    return (
+        isinstance(value, list)
+        and len(value) == 2
+        and isinstance(value[0], (str, int))
+        and isinstance(value[1], int)
+        and not isinstance(value[1], bool)
+    )
+
+
+def validate_workflow(workflow, object_info):
+    """Erreurs d'un workflow au format API face au schéma /object_info (liste vide si valide)"""
+    errors = []
+    if not isinstance(workflow, dict) or not workflow:
+        return ["workflow vide ou mal formé"]
+    for node_id, node in workflow.items():
+        if not isinstance(node, dict) or "class_type" not in node:
+            errors.append(f"node {node_id}: class_type manquant")
+            continue
+        class_type = node["class_type"]
+        schema = object_info.get(class_type)
+        if schema is None:
+            errors.append(f"node {node_id}: classe {class_type} inconnue du serveur")
+            continue
+        inputs = node.get("inputs") or {}
+        for input_name in (schema.get("input") or {}).get("required", {}):
+            if input_name not in inputs:
+                errors.append(f"node {node_id} ({class_type}): entrée requise '{input_name}' absente")
+        for input_name, value in inputs.items():
+            if not is_link(value):
+                continue
+            source_id, output_index = str(value[0]), value[1]
+            source = workflow.get(source_id)
+            if not isinstance(source, dict):
+                errors.append(f"node {node_id} ({class_type}): '{input_name}' relié au node {source_id} absent")
+                continue
+            source_schema = object_info.get(source.get("class_type"))
+            if source_schema is not None and not 0 <= output_index < len(source_schema.get("output") or ()):
+                errors.append(
+                    f"node {node_id} ({class_type}): '{input_name}' relié à la sortie {output_index} "
+                    f"inexistante du node {source_id}"
+                )
+    return errors
+
+
+class comfyui_object_info_cache:
+    """Schémas /object_info par backend, en mémoire et sur disque (un fichier par adresse et version)"""
+
+    def __init__(self, cache_dir=None, fetch=None, version=None):
+        """
+        fetch(adresse) -> object_info ; version(adresse) -> version de ComfyUI (None si inconnue)
+        """
+        self.cache_dir = cache_dir or os.getenv("OBJECT_INFO_CACHE_DIR", "data/object_info")
+        self.fetch = fetch or (lambda address: get_client(address).get_json("/object_info"))
+        self.version = version or server_version
+        self._lock = threading.Lock()
+        # adresse -> (object_info, lu depuis le serveur pendant cette session)
+        self._schemas = {}
+
+    def _cache_path(self, address, version):
+        name = re.sub(r"[^0-9A-Za-z._-]+", "_", f"{address}_{version}")
+        return os.path.join(self.cache_dir, f"object_info_{name}.json")
+
+    def get(self, address, refresh=False):
+        """Schéma d'un backend: mémoire, puis disque (même version), puis /object_info"""
+        with self._lock:
+            if not refresh and address in self._schemas:
+                return self._schemas[address][0]
+        version = self.version(address)
+        path = self._cache_path(address, version) if version else None
+        if path and not refresh and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    object_info = json.load(f)["object_info"]
+                with self._lock:
+                    self._schemas[address] = (object_info, False)
+                return object_info
+            except (OSError, ValueError, KeyError) as e:
+                print(f"DEBUG: Cache object_info illisible ({path}): {e}")
+
+        object_info = self.fetch(address)
+        with self._lock:
+            self._schemas[address] = (object_info, True)
+        if path:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                with open(path + ".part", "w", encoding="utf-8") as f:
+                    json.dump({"version": version, "fetched_at": time.time(), "object_info": object_info}, f)
+                os.replace(path + ".part", path)
+            except OSError as e:
+                print(f"DEBUG: Cache object_info non écrit: {e}")
+        return object_info
+
+    def validate(self, workflow, address):
+        """
+        Erreurs du workflow pour ce backend. Un schéma lu sur disque qui refuse le workflow
+        est relu depuis le serveur avant de conclure (nouveaux nodes installés sans changer de version).
+        Schéma indisponible: aucune erreur, ComfyUI reste juge.
+        """
+        try:
+            object_info = self.get(address)
+            errors = validate_workflow(workflow, object_info)
+            with self._lock:
+                fresh = self._schemas.get(address, (None, True))[1]
+            if errors and not fresh:
+                errors = validate_workflow(workflow, self.get(address, refresh=True))
+            return errors
+        except Exception as e:
+            print(f"DEBUG: Validation locale ignorée ({address}): {e}")
+            return []
+
+    def check(self, workflow, address):
+        """Lever comfyui_validation_error si le workflow est refusé"""
+        errors = self.validate(workflow, address)
+        if errors:
+            raise comfyui_validation_error(errors)
+
+
+def server_version(address):
+    """Version de ComfyUI annoncée par /system_stats (None si absente)"""
+    stats = get_client(address).get_json("/system_stats")
+    return (stats.get("system") or {}).get("comfyui_version")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_object_info_cache():
+    """Cache partagé des schémas /object_info"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = comfyui_object_info_cache()
+        return _cache
@@ -0,0 +1,74 @@
+"""
+Récupération des images produites par ComfyUI
+Images dédupliquées, téléchargées par blocs depuis /view directement dans l'arborescence
+locale (IMAGES_COLLECTE...), en parallèle avec un pool borné ; les fichiers déjà présents
+avec la bonne taille ne sont pas retéléchargés
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from cy6_http_client import get_client
+
+
+def unique_images(outputs):
+    """Images des nodes de sortie d'une entrée /history, sans doublon, dans l'ordre"""
+    seen = set()
+    images = []
+    for node_output in outputs.values():
+        for image in node_output.get("images", ()):
+            key = (image.get("type"), image.get("subfolder") or "", image.get("filename"))
+            if not image.get("filename") or key in seen:
+                continue
+            seen.add(key)
+            images.append(image)
+    return images
+
+
+class comfyui_output_fetcher:
+    """Téléchargement des images d'un backend vers le disque local"""
+
+    MAX_WORKERS = 4
+
+    def __init__(self, server_address, resolve, max_workers=None, chunk_size=None):
+        """
+        resolve(image) -> chemin local de l'image (None pour l'ignorer)
+        max_workers: téléchargements simultanés
+        """
+        self.client = get_client(server_address)
+        self.resolve = resolve
+        self.max_workers = max_workers or self.MAX_WORKERS
+        self.chunk_size = chunk_size
+
+    def fetch_image(self, image):
+        """Retourne (chemin, état): downloaded, skipped (déjà présente), local (pas de dossier configuré) ou error"""
+        path = self.resolve(image)
+        if not path:
+            return None, "error"
+        if not os.path.isabs(path):
+            return path, "local"  # Aucun dossier d'images configuré: chemin laissé tel quel
+
+        view_path = self.client.view_path(image["filename"], image.get("subfolder") or "", image.get("type"))
+        try:
+            if os.path.exists(path):
+                remote_size = self.client.content_length(view_path)
+                if remote_size is not None and remote_size == os.path.getsize(path):
+                    return path, "skipped"
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self.client.download(view_path, path, self.chunk_size)
+            return path, "downloaded"
+        except Exception as e:
+            print(f"DEBUG: Erreur téléchargement {image['filename']}: {e}")
+            return path, "error"
+
+    def fetch(self, outputs):
+        """
+        Télécharger les images d'une entrée /history (champ 'outputs').
+        Retourne [(chemin, état)] dans l'ordre des images
+        """
+        images = unique_images(outputs)
+        if len(images) <= 1:
+            return [self.fetch_image(image) for image in images]
+        with ThreadPoolExecutor(
+            max_workers=min(self.max_workers, len(images)), thread_name_prefix="comfyui-fetch"
+        ) as pool:
+            return list(pool.map(self.fetch_image, images))
@@ -0,0 +1,155 @@
+"""
+Résilience des appels ComfyUI
+Nouvelles tentatives avec attente exponentielle pour les appels idempotents et
+disjoncteur par backend: après une série d'échecs de connexion, le backend est mis
+de côté le temps qu'il redémarre au lieu de faire échouer chaque exécution
+"""
+
+import time
+import random
+import threading
+import urllib.error
+
+
+def is_connection_error(error):
+    """Erreur réseau imputable au backend (une erreur HTTP vient du workflow soumis)"""
+    return isinstance(error, OSError) and not isinstance(error, urllib.error.HTTPError)
+
+
+def is_refused(error):
+    """Connexion refusée: la requête n'a pas été envoyée, la renvoyer est sans risque"""
+    return isinstance(error, ConnectionRefusedError)
+
+
+# Nouvelles tentatives: nombre total d'essais et attentes (doublées à chaque échec, avec gigue)
+RETRY_ATTEMPTS = 4
+RETRY_BASE_DELAY_S = 0.5
+RETRY_MAX_DELAY_S = 8
+
+
+def backoff_delays(attempts=None, base_delay=None, max_delay=None):
+    """Attentes avant chaque nouvelle tentative (attempts - 1 valeurs)"""
+    attempts = attempts or RETRY_ATTEMPTS
+    base_delay = RETRY_BASE_DELAY_S if base_delay is None else base_delay
+    max_delay = RETRY_MAX_DELAY_S if max_delay is None else max_delay
+    for attempt in range(attempts - 1):
+        delay = min(max_delay, base_delay * 2**attempt)
+        yield delay * random.uniform(0.5, 1.0)
+
+
+def retry_call(function, *args, retry_on=is_connection_error, attempts=None, sleep=time.sleep, **kwargs):
+    """
+    Appeler function(*args, **kwargs) en renouvelant l'appel après une erreur retry_on(erreur).
+    À réserver aux appels idempotents (GET) ; la dernière erreur est relevée
+    """
+    delays = backoff_delays(attempts)
+    while True:
+        try:
+            return function(*args, **kwargs)
+        except Exception as e:
+            if not retry_on(e):
+                raise
+            delay = next(delays, None)
+            if delay is None:
+                raise
+            print(f"DEBUG: Nouvel essai dans {delay:.1f}s après: {e}")
+            sleep(delay)
+
+
+class comfyui_circuit_open(ConnectionError):
+    """Appel refusé sans contacter le backend: disjoncteur ouvert"""
+
+
+class comfyui_circuit_breaker:
+    """
+    Disjoncteur d'un backend: closed (appels normaux), open (appels refusés pendant reset_timeout),
+    half_open (appels d'essai autorisés: un succès referme, un échec rouvre)
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    # Échecs de connexion consécutifs avant ouverture, et durée d'ouverture
+    FAILURE_THRESHOLD = 3
+    RESET_TIMEOUT_S = 30
+
+    def __init__(self, address, failure_threshold=None, reset_timeout=None, clock=time.monotonic):
+        self.address = address
+        self.failure_threshold = failure_threshold or self.FAILURE_THRESHOLD
+        self.reset_timeout = self.RESET_TIMEOUT_S if reset_timeout is None else reset_timeout
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == self.OPEN and self.clock() - self.opened_at >= self.reset_timeout:
+                self._state = self.HALF_OPEN
+            return self._state
+
+    def is_open(self):
+        """Backend à écarter (ouvert et délai de réarmement non écoulé)"""
+        return self.state == self.OPEN
+
+    def allow(self):
+        return self.state != self.OPEN
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                print(f"DEBUG: Disjoncteur {self.address} refermé")
+            self._state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            reopen = self._state == self.HALF_OPEN
+            if reopen or (self._state == self.CLOSED and self.failures >= self.failure_threshold):
+                print(f"DEBUG: Disjoncteur {self.address} ouvert après {self.failures} échec(s)")
+                self._state = self.OPEN
+                self.opened_at = self.clock()
+
+    def call(self, function, *args, **kwargs):
+        """
+        Appeler function via le disjoncteur ; comfyui_circuit_open si le backend est mis de côté.
+        Seules les erreurs de connexion comptent comme échecs (une erreur HTTP prouve que le backend répond)
+        """
+        if not self.allow():
+            raise comfyui_circuit_open(f"Backend ComfyUI {self.address} suspendu (disjoncteur ouvert)")
+        try:
+            result = function(*args, **kwargs)
+        except Exception as e:
+            if is_connection_error(e):
+                self.record_failure()
+            else:
+                self.record_success()
+            raise
+        self.record_success()
+        return result
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(address):
+    """Disjoncteur partagé d'un backend"""
+    with _breakers_lock:
+        breaker = _breakers.get(address)
+        if breaker is None:
+            breaker = _breakers[address] = comfyui_circuit_breaker(address)
+        return breaker
+
+
+def resilient_call(address, function, *args, idempotent=True, **kwargs):
+    """
+    Appel d'un backend protégé par son disjoncteur. Les appels idempotents sont renouvelés
+    après une erreur de connexion ; les autres seulement si la connexion a été refusée
+    """
+    retry_on = is_connection_error if idempotent else is_refused
+    return get_circuit_breaker(address).call(retry_call, function, *args, retry_on=retry_on, **kwargs)
@@ -2,12 +2,14 @@ import sys
 import json
 import os
 #sys.path.append('G:/G_WCS/Comfyui_api')
-from cy6_file import log_json
-from  cy6_websocket_api_client import update_workflow,socket_queue_prompt,server_connect,workflow_is_running,socket_get_images
+from cy6_file import log_json, dump_workflow
+from  cy6_websocket_api_client import update_workflow,socket_queue_prompt,server_event_hub,fetch_output_images,validate_prompt
 
 #seed aleatoire
 class comfyui_task:
     name="Default"
+    # Backend ComfyUI ciblé (None = backend par défaut du client)
+    server_address=None
 
     def update_values(self, values):
         self.values = values
@@ -17,30 +19,74 @@ class comfyui_task:
     def log_values(self):
         log_json('02_value_to_update',self.values)
 
-    def addToQueue(self, fileworkflow, filevalues):
+    def addToQueue(self, fileworkflow, filevalues, on_event=None, dump_name=None):
         """
         Ajoute un workflow à la queue ComfyUI et retourne immédiatement l'ID
-        Ne bloque pas en attendant la fin d'exécution
+        Ne bloque pas en attendant la fin d'exécution (voir wait_for_completion).
+        fileworkflow / filevalues: dicts en mémoire ou chemins de fichiers JSON.
+        on_event(message) reçoit chaque événement WebSocket du prompt.
+        Si WORKFLOW_DUMP_DIR est défini, le workflow patché y est écrit (debug).
+        Lève comfyui_validation_error si le workflow ne correspond pas au schéma du backend.
         """
         json, updated_values = update_workflow(filevalues, fileworkflow)
         self.update_values(updated_values)
         self.last_workflow = json
 
-        # Soumettre le prompt à ComfyUI
-        response = socket_queue_prompt(json)
-        prompt_id = response['prompt_id']
+        dump_dir = os.getenv("WORKFLOW_DUMP_DIR")
+        if dump_dir:
+            dump_workflow(dump_dir, dump_name or self.name, json, updated_values)
+
+        # Workflow refusé localement: rien n'est envoyé à ComfyUI
+        validate_prompt(json, self.server_address)
 
-        # Établir la connexion WebSocket pour le suivi
+        # WebSocket partagée du backend, ouverte avant la soumission pour ne manquer aucun événement
         try:
-            self.ws = server_connect()
-            print(f"DEBUG: Workflow {prompt_id} ajouté à la queue ComfyUI")
+            hub = server_event_hub(self.server_address)
         except Exception as e:
             print(f"DEBUG: Erreur connexion WebSocket: {e}")
-            self.ws = None
+            hub = None
+
+        # Soumettre le prompt à ComfyUI
+        response = socket_queue_prompt(json, self.server_address)
+        prompt_id = response['prompt_id']
+
+        # Suivi de la fin d'exécution par les événements de ce prompt
+        self.tracker = hub.track(prompt_id, on_event) if hub else None
+        self.timings = self.tracker.timings if self.tracker else None
+        print(f"DEBUG: Workflow {prompt_id} ajouté à la queue ComfyUI")
 
         return prompt_id
 
+    def wait_for_completion(self, timeout=None):
+        """
+        Attendre la fin signalée par ComfyUI.
+        Retourne (issue, message): success, error, interrupted ou timeout
+        """
+        if getattr(self, 'tracker', None) is None:
+            return "error", "Pas de connexion WebSocket active"
+        return self.tracker.wait(timeout)
+
+    def node_timings(self):
+        """Durées par node du dernier prompt soumis (voir cy6_node_timings.report), None sans suivi"""
+        timings = getattr(self, 'timings', None)
+        return timings.report(getattr(self, 'last_workflow', None)) if timings else None
+
+    def close(self):
+        """Se désabonner du hub WebSocket"""
+        if getattr(self, 'tracker', None):
+            self.tracker.close()
+            self.tracker = None
+
     def GetImages(self, key):
-        output_images = socket_get_images(self.ws, key)
+        """Images du prompt (téléchargées au besoin), après sa fin si le suivi est encore actif"""
+        if getattr(self, 'tracker', None) is not None:
+            outcome, message = self.wait_for_completion()
+            if outcome != "success":
+                print(f"DEBUG: Pas d'images pour {key}: {message}")
+                self.close()
+                self.output_images = []
+                return []
+        output_images = fetch_output_images(key, self.server_address)
         self.output_images = output_images
+        self.close()
         return output_images
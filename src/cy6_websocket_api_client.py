@@ -4,26 +4,29 @@
 import websocket #NOTE: websocket-client (https://github.com/websocket-client/websocket-client)
 import uuid
 import json
+import os
 import urllib.request
 import urllib.parse
 from cy6_file import load_json,log_json
-import os
+from cy6_http_client import get_client
+from cy6_resilience import resilient_call, retry_call
+from cy6_event_hub import get_event_hub
+from cy6_output_fetcher import comfyui_output_fetcher, unique_images
+from cy6_object_info import get_object_info_cache
+from cy6_workflow_patcher import compile_patch_plan, apply_patch_plan
 from urllib import request
 import random
 
-server_address = "127.0.0.1:8188"
+# Backend par défaut (COMFYUI_SERVER) ; les tâches peuvent cibler un autre backend (cy6_backend_pool)
+server_address = os.getenv("COMFYUI_SERVER", "127.0.0.1:8188")
 client_id = str(uuid.uuid4())
 
-def socket_queue_prompt(prompt):
-    p = {"prompt": prompt, "client_id": client_id}
-    data = json.dumps(p).encode('utf-8')
-    req =  urllib.request.Request("http://{}/prompt".format(server_address), data=data)
-    req.add_header('Content-Type', 'application/json')
-
+def socket_queue_prompt(prompt, address=None):
+    address = address or server_address
     try:
-        print(f"DEBUG: Envoi de la requête à ComfyUI ({len(data)} bytes)")
-        response = urllib.request.urlopen(req)
-        return json.loads(response.read())
+        print(f"DEBUG: Envoi de la requête à ComfyUI ({address})")
+        # Non idempotent: renvoyé seulement si la connexion a été refusée
+        return resilient_call(address, get_client(address).queue_prompt, prompt, client_id, idempotent=False)
     except urllib.error.HTTPError as e:
         print(f"DEBUG: Erreur HTTP {e.code}: {e.reason}")
         if e.code == 400:
@@ -34,48 +37,126 @@ def socket_queue_prompt(prompt):
                 pass
         raise e
 
-def get_image(filename, subfolder, folder_type):
-    data = {"filename": filename, "subfolder": subfolder, "type": folder_type}
-    url_values = urllib.parse.urlencode(data)
-    with urllib.request.urlopen("http://{}/view?{}".format(server_address, url_values)) as response:
-        return response.read()
-
-def get_history(prompt_id):
-    with urllib.request.urlopen("http://{}/history/{}".format(server_address, prompt_id)) as response:
-        return json.loads(response.read())
-
+def validate_prompt(prompt, address=None):
+    """Validation locale avant soumission (schéma /object_info en cache) ; lève comfyui_validation_error"""
+    get_object_info_cache().check(prompt, address or server_address)
+
+def get_image(filename, subfolder, folder_type, address=None):
+    address = address or server_address
+    return resilient_call(address, get_client(address).get_image, filename, subfolder, folder_type)
+
+def get_history(prompt_id, address=None):
+    address = address or server_address
+    return resilient_call(address, get_client(address).get_history, prompt_id)
+
+
+def resolve_output_path(image_info):
+    """Chemin local d'une image de sortie ComfyUI selon son type de dossier"""
+    base_dir_map = {
+        "output": os.getenv("IMAGES_COLLECTE"),
+        "temp": os.getenv("IMAGES_TRASH"),
+        "input": os.getenv("IMAGES_CENTRAL"),
+        "central": os.getenv("IMAGES_CENTRAL"),
+    }
+    filename = image_info.get('filename')
+    if not filename:
+        return None
+    folder_type = image_info.get('type')
+    base_dir = base_dir_map.get(folder_type) or os.getenv("IMAGES_COLLECTE")
+    subfolder = image_info.get('subfolder') or ''
+    parts = []
+    if base_dir:
+        parts.append(base_dir)
+    if subfolder:
+        normalized_subfolder = subfolder.replace('/', os.sep).strip()
+        if normalized_subfolder:
+            parts.append(normalized_subfolder)
+    parts.append(filename)
+    try:
+        return os.path.normpath(os.path.join(*parts))
+    except TypeError:
+        return None
+
+def get_output_paths(prompt_id, address=None):
+    """Chemins des images d'un prompt terminé (lus dans /history, sans doublon)"""
+    history = get_history(prompt_id, address)[prompt_id]
+    output_paths = []
+    for image in unique_images(history['outputs']):
+        resolved_path = resolve_output_path(image)
+        if resolved_path:
+            output_paths.append(resolved_path)
+    return output_paths
+
+def fetch_output_images(prompt_id, address=None):
+    """
+    Images d'un prompt terminé, téléchargées au besoin dans les dossiers locaux
+    (backend distant). Retourne les chemins des images présentes sur le disque
+    """
+    return fetch_history_outputs(prompt_id, get_history(prompt_id, address)[prompt_id], address)
+
+def fetch_history_outputs(prompt_id, history, address=None):
+    """Images d'une entrée /history déjà lue (voir fetch_output_images)"""
+    fetcher = comfyui_output_fetcher(address or server_address, resolve_output_path)
+    results = fetcher.fetch(history['outputs'])
+    states = {}
+    for _, state in results:
+        states[state] = states.get(state, 0) + 1
+    print(f"DEBUG: Images de {prompt_id}: {states}")
+    return [path for path, state in results if state != "error"]
+
+def get_history_listing(max_items, address=None):
+    """Entrées /history les plus récentes en une requête: {prompt_id: entrée}"""
+    address = address or server_address
+    return resilient_call(address, get_client(address).get_json, f"/history?max_items={int(max_items)}")
+
+def get_queue(address=None):
+    address = address or server_address
+    return resilient_call(address, get_client(address).get_queue)
+
+def queue_state(queue, prompt_id):
+    """Place d'un prompt dans une réponse /queue: running, pending ou None (absent)"""
+    for state, key in (("running", "queue_running"), ("pending", "queue_pending")):
+        # Entrées [numéro, prompt_id, prompt, extra_data, sorties]
+        if any(len(entry) > 1 and entry[1] == prompt_id for entry in queue.get(key) or []):
+            return state
+    return None
+
+def cancel_prompt(prompt_id, address=None):
+    """
+    Annuler un prompt chez ComfyUI: retiré de la file s'il attend, interrompu s'il s'exécute.
+    Retourne "deleted", "interrupted" ou None (déjà terminé)
+    """
+    address = address or server_address
+    client = get_client(address)
+    state = queue_state(resilient_call(address, client.get_queue), prompt_id)
+    if state == "pending":
+        resilient_call(address, client.delete_queued, [prompt_id])
+        return "deleted"
+    if state == "running":
+        resilient_call(address, client.interrupt, prompt_id)
+        return "interrupted"
+    return None
+
+def history_outcome(history):
+    """
+    Issue d'une entrée /history (ComfyUI n'y inscrit que les prompts terminés):
+    (issue, message) avec success, error ou interrupted
+    """
+    status = history.get('status')
+    if not status:
+        return "success", "Terminé"  # Serveur ancien: pas de statut détaillé
+    for message_type, data in status.get('messages') or []:
+        if message_type == 'execution_error':
+            node = data.get('node_type') or data.get('node_id') or '?'
+            return "error", f"{node}: {data.get('exception_message', 'erreur inconnue')}".strip()
+        if message_type == 'execution_interrupted':
+            return "interrupted", "Interrompu"
+    if status.get('completed') or status.get('status_str') == 'success':
+        return "success", "Terminé"
+    return "error", "Erreur signalée par ComfyUI"
 
 def socket_get_images(ws,prompt_id):
     try:
-        output_paths = []
-        base_dir_map = {
-            "output": os.getenv("IMAGES_COLLECTE"),
-            "temp": os.getenv("IMAGES_TRASH"),
-            "input": os.getenv("IMAGES_CENTRAL"),
-            "central": os.getenv("IMAGES_CENTRAL"),
-        }
-        default_base = os.getenv("IMAGES_COLLECTE")
-
-        def resolve_path(image_info):
-            filename = image_info.get('filename')
-            if not filename:
-                return None
-            folder_type = image_info.get('type')
-            base_dir = base_dir_map.get(folder_type) or default_base
-            subfolder = image_info.get('subfolder') or ''
-            parts = []
-            if base_dir:
-                parts.append(base_dir)
-            if subfolder:
-                normalized_subfolder = subfolder.replace('/', os.sep).strip()
-                if normalized_subfolder:
-                    parts.append(normalized_subfolder)
-            parts.append(filename)
-            try:
-                return os.path.normpath(os.path.join(*parts))
-            except TypeError:
-                return None
-
         while True:
             out = ws.recv()
             if isinstance(out, str):
@@ -87,142 +168,47 @@ def socket_get_images(ws,prompt_id):
             else:
                 continue #previews are binary data
 
-        history = get_history(prompt_id)[prompt_id]
-
-        for node_id in history['outputs']:
-            node_output = history['outputs'][node_id]
-
-            if 'images' in node_output:
-                for image in node_output['images']:
-                    resolved_path = resolve_path(image)
-                    if resolved_path:
-                        output_paths.append(resolved_path)
-        return output_paths
+        return get_output_paths(prompt_id)
 
     except Exception as exc:
         print(f"Get image Error: {exc}")
         return []
 
 
-def update_workflow(filevalues,fileworkflow):
-    print(f"dbg-4514 => open file workflow -- {fileworkflow }")
-    #il faut ouvrir filevalues
-    if  not os.path.exists(filevalues):
-        raise ValueError(f"Invalid values file : {filevalues}")
-    if  not os.path.exists(fileworkflow):
-        raise ValueError(f"Invalid workflow file : {fileworkflow}")
-
-    with open(filevalues, "r",encoding="utf-8") as f:
-        values_json_data=f.read()
+def load_spec(source, label):
+    """Workflow ou valeurs: dict en mémoire (jamais modifié) ou chemin d'un fichier JSON"""
+    if isinstance(source, dict):
+        return source
+    if not os.path.exists(source):
+        raise ValueError(f"Invalid {label} file : {source}")
+    print(f"dbg-4514 => open file {label} -- {source}")
+    return load_json(source)
 
-    print(f"dbg-4514 =>values ={values_json_data}")
-
-    values=json.loads( values_json_data)
-
-    data_updated={}
+def update_workflow(filevalues,fileworkflow):
+    """
+    Patcher le workflow avec les valeurs du prompt.
+    filevalues / fileworkflow: dicts en mémoire ou chemins de fichiers JSON.
+    Le plan de patch est compilé une fois par schéma de valeurs (cy6_workflow_patcher) ;
+    ValueError si un type de valeur est inconnu ou si un node manque.
+    Retourne (workflow patché, valeurs mises à jour)
+    """
+    values = load_spec(filevalues, "values")
+    workflow = load_spec(fileworkflow, "workflow")
 
-    try:
-        # with open(file, "r",encoding="utf-8") as f:
-        #     worflow_json_data=f.read()
-        jsonf = load_json(fileworkflow)
-
-        for val in values:
-
-            typ = values[val]['type']
-            node =values[val]['id']
-
-            print (f"dbg-4514 = node {node} : type {typ}:")
-            #print(f"............set value to node={node} - typ={typ}")
-            #print(f"................value ={values[val]}")
-
-            #data_updated.update(f"{#node}:{'type':{typ}}") # type: ignore
-            #data_updated.update(f"{node}:{'value':{values[val]}}")
-
-            match typ:
-
-                case "image":
-                    jsonf[node]['inputs']['image'] =  values[val]['value']
-                case "CLIPTextEncode":
-                    # Nettoyer le prompt des sauts de ligne et espaces multiples
-                    prompt_text = values[val]['value']
-                    if isinstance(prompt_text, str):
-                        # Remplacer les sauts de ligne par des espaces et nettoyer
-                        prompt_text = prompt_text.replace('\n', ' ').replace('\r', ' ')
-                        # Réduire les espaces multiples à un seul
-                        prompt_text = ' '.join(prompt_text.split())
-
-                    jsonf[node]['inputs']['text'] = prompt_text
-                    print (f"dbg-4515-1 = ok (cleaned CLIP text: {len(prompt_text)} chars)")
-
-                case "prompt":
-                    # Nettoyer le prompt des sauts de ligne et espaces multiples
-                    prompt_text = values[val]['value']
-                    if isinstance(prompt_text, str):
-                        # Remplacer les sauts de ligne par des espaces et nettoyer
-                        prompt_text = prompt_text.replace('\n', ' ').replace('\r', ' ')
-                        # Réduire les espaces multiples à un seul
-                        prompt_text = ' '.join(prompt_text.split())
-
-                    jsonf[node]['inputs']['text'] = prompt_text
-                    print (f"dbg-4515-2 = ok (cleaned prompt: {len(prompt_text)} chars)")
-                case "seed" :
-                    #seednum=124578
-                    seednum = random.randint(0, 9999999)
-                    jsonf[node]['inputs']['seed'] = seednum
-                    values[val]['value'] = seednum
-                    print (f"dbg-4515-3 = {str(seednum)} ")
-
-                case "PortraitMasterStylePose.pose" :
-                    jsonf[node]['inputs']['model_pose'] = values[val]['model_pose']
-                case "BilboXPhotoPrompt.style" :
-
-                    #print(f"{jsonf[node]}")
-                    '''
-                    jsonf[node]['inputs']['style'] = values[val]['style']
-                    jsonf[node]['inputs']['framing'] = values[val]['framing']
-                    jsonf[node]['inputs']['lighting'] = values[val]['lighting']
-                    jsonf[node]['inputs']['camera_angle'] = values[val]['camera_angle']
-                    jsonf[node]['inputs']['lenses'] = values[val]['lenses']
-                    jsonf[node]['inputs']['filters_effects'] = values[val]['overexposed']
-                    jsonf[node]['inputs']['photographers'] = values[val]['photographers']
-                    '''
-                case "SDXLPromptStylerbyMood" :
-                    jsonf[node]['inputs']['style'] = values[val]['style']
-                case "GoogleTranslateTextNode":
-                    jsonf[node]['inputs']['text'] =  values[val]['text']
-                case "LoraLoaderTagsQuery":
-                    jsonf[node]['inputs']['lora_name'] =  values[val]['lora_name']
-                case "SaveImage":
-                    jsonf[node]['inputs']['filename_prefix'] =  values[val]['value']
-                    print (f"dbg-4515-4 = {values[val]['value']} ")
-
-                case "LoraInfo":
-                     jsonf[node]['inputs']['lora_name'] =  values[val]['lora_name']
-                case _:
-                    print(f"Invalid type {typ}")
-                    return
-    except Exception as e:
-        print("---Error---------------------------------------")
-        print(f"update worflow Error: {e}")
-        #log_json('current_workflow_data_updated',data_updated)
-        # print ("\n")
-        # print (file)
-        # exit(None)
-
-    #print (f"........END update node ----------------")
-    #log_json('current_workflow_data_updated',data_updated)
+    plan = compile_patch_plan(values)
+    jsonf, values = apply_patch_plan(plan, workflow, values)
+    print(f"dbg-4514 => workflow patché ({len(plan)} opérations)")
     return jsonf, values
 
-    #set the text prompt for our positive CLIPTextEncode
-
 #Run workflow and get images
 def server_run_now(jsonf):
+    # Connexion renouvelée avec attente exponentielle ; l'échec final remonte à l'appelant
+    # (ne plus terminer le processus)
     try:
-         ws = websocket.WebSocket()
-         ws.connect("ws://{}/ws?clientId={}".format(server_address, client_id))
-    except Exception:
-         print(f"Error: {Exception}")
-         exit(None)
+        ws = retry_call(server_connect)
+    except Exception as e:
+        print(f"Error: connexion WebSocket impossible ({server_address}): {e}")
+        raise
 
     result = get_images(ws, jsonf)
     return result
@@ -283,6 +269,10 @@ def server_connect():
 
     return ws
 
+def server_event_hub(address=None):
+    """WebSocket partagée d'un backend (un lecteur pour toutes ses exécutions)"""
+    return get_event_hub(address or server_address, client_id)
+
 
 def workflow_is_running(ws, prompt_id):
     """
@@ -336,17 +326,15 @@ def workflow_is_running(ws, prompt_id):
 
 
 def get_history_images(prompt_id):
+    """Contenu des images par node de sortie (chaque image n'est téléchargée qu'une fois)"""
     output_images = {}
     history = get_history(prompt_id)[prompt_id]
-    for o in history['outputs']:
-        for node_id in history['outputs']:
-            node_output = history['outputs'][node_id]
-            if 'images' in node_output:
-                images_output = []
-                for image in node_output['images']:
-                    image_data = get_image(image['filename'], image['subfolder'], image['type'])
-                    images_output.append(image_data)
-                output_images[node_id] = images_output
+    for node_id, node_output in history['outputs'].items():
+        if 'images' in node_output:
+            output_images[node_id] = [
+                get_image(image['filename'], image['subfolder'], image['type'])
+                for image in unique_images({node_id: node_output})
+            ]
 
     return output_images
 
@@ -0,0 +1,104 @@
+"""
+Plans de patch compilés pour update_workflow
+Un spec prompt_values est compilé une fois en opérations (clé, node, input, transformation),
+mis en cache par schéma, puis appliqué sur une copie à la demande du workflow
+"""
+
+import random
+import functools
+
+
+# Gestionnaires par type de valeur: liste de (nom de l'input du node, transformation(entrée) -> valeur)
+PATCH_HANDLERS = {}
+
+
+def register_patch_handler(value_type, operations):
+    """
+    Déclarer comment une valeur de type `value_type` patche son node.
+    operations: liste de (input_name, transform) ; transform(entrée de prompt_values) -> valeur
+    """
+    PATCH_HANDLERS[value_type] = tuple(operations)
+    _compile_schema.cache_clear()
+
+
+def entry_field(field_name):
+    """Transformation: copier un champ de l'entrée de prompt_values"""
+
+    def transform(entry):
+        return entry[field_name]
+
+    return transform
+
+
+def clean_prompt_text(entry):
+    """Transformation: prompt sans sauts de ligne ni espaces multiples"""
+    prompt_text = entry["value"]
+    if isinstance(prompt_text, str):
+        prompt_text = " ".join(prompt_text.replace("\n", " ").replace("\r", " ").split())
+    return prompt_text
+
+
+def random_seed(entry):
+    """Transformation: nouvelle graine aléatoire reportée dans l'entrée, sauf graine figée ("fixed": true)"""
+    if not entry.get("fixed"):
+        entry["value"] = random.randint(0, 9999999)
+    return entry["value"]
+
+
+def values_schema(values):
+    """Schéma d'un spec prompt_values: ((clé, node, type), ...) ; les valeurs elles-mêmes sont ignorées"""
+    return tuple((key, str(entry["id"]), entry["type"]) for key, entry in values.items())
+
+
+@functools.lru_cache(maxsize=256)
+def _compile_schema(schema):
+    operations = []
+    for key, node, value_type in schema:
+        handler = PATCH_HANDLERS.get(value_type)
+        if handler is None:
+            raise ValueError(f"Invalid type {value_type} (valeur '{key}', node {node})")
+        for input_name, transform in handler:
+            operations.append((key, node, input_name, transform))
+    return tuple(operations)
+
+
+def compile_patch_plan(values):
+    """Plan de patch d'un spec prompt_values (compilé une fois par schéma). ValueError si type inconnu"""
+    return _compile_schema(values_schema(values))
+
+
+def apply_patch_plan(plan, workflow, values):
+    """
+    Appliquer un plan. Copie à l'écriture: seuls les nodes patchés sont copiés,
+    les autres restent partagés avec `workflow` (qui n'est jamais modifié).
+    Retourne (workflow patché, copie des valeurs avec les graines tirées)
+    """
+    values = {key: dict(entry) for key, entry in values.items()}
+    patched = dict(workflow)
+    copied_nodes = set()
+    for key, node, input_name, transform in plan:
+        if node not in copied_nodes:
+            if node not in workflow:
+                raise ValueError(f"Node {node} absent du workflow (valeur '{key}')")
+            source = workflow[node]
+            patched[node] = {**source, "inputs": dict(source.get("inputs", {}))}
+            copied_nodes.add(node)
+        patched[node]["inputs"][input_name] = transform(values[key])
+    return patched, values
+
+
+# Gestionnaires des types existants de prompt_values
+register_patch_handler("image", [("image", entry_field("value"))])
+register_patch_handler("CLIPTextEncode", [("text", clean_prompt_text)])
+register_patch_handler("prompt", [("text", clean_prompt_text)])
+register_patch_handler("seed", [("seed", random_seed)])
+register_patch_handler("PortraitMasterStylePose.pose", [("model_pose", entry_field("model_pose"))])
+register_patch_handler("BilboXPhotoPrompt.style", [])
+register_patch_handler("SDXLPromptStylerbyMood", [("style", entry_field("style"))])
+register_patch_handler("GoogleTranslateTextNode", [("text", entry_field("text"))])
+register_patch_handler("LoraLoaderTagsQuery", [("lora_name", entry_field("lora_name"))])
+register_patch_handler("SaveImage", [("filename_prefix", entry_field("value"))])
+register_patch_handler("LoraInfo", [("lora_name", entry_field("lora_name"))])
+register_patch_handler("CheckpointLoaderSimple", [("ckpt_name", entry_field("ckpt_name"))])
+register_patch_handler("KSampler.cfg", [("cfg", entry_field("value"))])
+register_patch_handler("KSampler.steps", [("steps", entry_field("value"))])
@@ -0,0 +1,310 @@
+"""
+Module d'archivage des prompts - Version cy8
+Déplace les prompts anciens ou en échec vers une base d'archive voisine
+"""
+
+import os
+import time
+import sqlite3
+
+
+# Colonnes copiées entre la base principale et l'archive
+PROMPT_COLUMNS = (
+    "id",
+    "name",
+    "prompt_values",
+    "workflow",
+    "url",
+    "parent",
+    "model",
+    "comment",
+    "status",
+    "created_at",
+    "updated_at",
+)
+EXECUTION_COLUMNS = (
+    "id",
+    "prompt_id",
+    "execution_id",
+    "comfyui_prompt_id",
+    "status",
+    "message",
+    "started_at",
+    "finished_at",
+    "parameters",
+    "workflow_hash",
+    "backend",
+    "node_timings",
+)
+OUTPUT_COLUMNS = ("id", "prompt_id", "execution_id", "path", "created_at")
+
+
+class cy8_archive_manager:
+    """Gestionnaire de l'archive des prompts (base SQLite voisine attachée à la demande)"""
+
+    ARCHIVE_SCHEMA = "archive"
+    DEFAULT_STATUSES = ("nok", "test")
+
+    def __init__(self, db_manager, archive_path=None):
+        self.db_manager = db_manager
+        if archive_path is None:
+            root, ext = os.path.splitext(db_manager.db_path)
+            archive_path = f"{root}_archive{ext or '.db'}"
+        self.archive_path = archive_path
+
+    # === Connexion à l'archive ===
+
+    def _attach(self):
+        """Attacher la base d'archive à la connexion principale et créer ses tables"""
+        conn = self.db_manager.conn
+        conn.commit()  # ATTACH est interdit dans une transaction ouverte
+        conn.execute(f"ATTACH DATABASE ? AS {self.ARCHIVE_SCHEMA}", (self.archive_path,))
+        conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {self.ARCHIVE_SCHEMA}.prompts (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                prompt_values JSON,
+                workflow JSON,
+                url TEXT,
+                parent INTEGER,
+                model TEXT,
+                comment TEXT,
+                status TEXT,
+                created_at TEXT,
+                updated_at TEXT,
+                archived_at TEXT
+            )
+        """
+        )
+        conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {self.ARCHIVE_SCHEMA}.prompt_executions (
+                id INTEGER PRIMARY KEY,
+                prompt_id INTEGER NOT NULL,
+                execution_id TEXT NOT NULL,
+                comfyui_prompt_id TEXT,
+                status TEXT,
+                message TEXT,
+                started_at TEXT,
+                finished_at TEXT,
+                parameters TEXT,
+                workflow_hash TEXT,
+                backend TEXT,
+                node_timings TEXT
+            )
+        """
+        )
+        # Archives créées avant l'ajout de colonnes à l'historique
+        archived_columns = [
+            row[1] for row in conn.execute(f"PRAGMA {self.ARCHIVE_SCHEMA}.table_info(prompt_executions)").fetchall()
+        ]
+        for column in EXECUTION_COLUMNS:
+            if column not in archived_columns:
+                conn.execute(f"ALTER TABLE {self.ARCHIVE_SCHEMA}.prompt_executions ADD COLUMN {column} TEXT")
+        conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {self.ARCHIVE_SCHEMA}.prompt_outputs (
+                id INTEGER PRIMARY KEY,
+                prompt_id INTEGER NOT NULL,
+                execution_id TEXT,
+                path TEXT NOT NULL,
+                created_at TEXT
+            )
+        """
+        )
+        conn.execute(
+            f"CREATE INDEX IF NOT EXISTS {self.ARCHIVE_SCHEMA}.idx_archive_executions_prompt "
+            "ON prompt_executions(prompt_id)"
+        )
+        conn.execute(
+            f"CREATE INDEX IF NOT EXISTS {self.ARCHIVE_SCHEMA}.idx_archive_outputs_prompt ON prompt_outputs(prompt_id)"
+        )
+        conn.commit()
+
+    def _detach(self):
+        """Détacher la base d'archive"""
+        try:
+            self.db_manager.conn.commit()
+            self.db_manager.conn.execute(f"DETACH DATABASE {self.ARCHIVE_SCHEMA}")
+        except sqlite3.Error as e:
+            print(f"Erreur lors du détachement de l'archive : {e}")
+
+    def _conflicting_ids(self, prompt_ids, target):
+        """IDs de prompts déjà utilisés dans le schéma cible (ID réattribué après une reconstruction de la table)"""
+        placeholders = ", ".join("?" for _ in prompt_ids)
+        cursor = self.db_manager.conn.execute(
+            f"SELECT id, name FROM {target}.prompts WHERE id IN ({placeholders}) ORDER BY id", list(prompt_ids)
+        )
+        return cursor.fetchall()
+
+    def _move_rows(self, prompt_ids, source, target, archived_at=None):
+        """
+        Déplacer des prompts et leur historique d'un schéma à l'autre (une transaction).
+        Aucune ligne de la cible n'est remplacée: un ID de prompt déjà pris fait échouer le lot,
+        les lignes d'historique reçoivent un nouvel ID dans la cible
+        """
+        conn = self.db_manager.conn
+        placeholders = ", ".join("?" for _ in prompt_ids)
+        prompt_columns = ", ".join(PROMPT_COLUMNS)
+
+        with conn:
+            if archived_at is not None:
+                conn.execute(
+                    f"INSERT INTO {target}.prompts ({prompt_columns}, archived_at) "
+                    f"SELECT {prompt_columns}, ? FROM {source}.prompts WHERE id IN ({placeholders})",
+                    (archived_at, *prompt_ids),
+                )
+            else:
+                conn.execute(
+                    f"INSERT INTO {target}.prompts ({prompt_columns}) "
+                    f"SELECT {prompt_columns} FROM {source}.prompts WHERE id IN ({placeholders})",
+                    prompt_ids,
+                )
+            for table, columns in (("prompt_executions", EXECUTION_COLUMNS), ("prompt_outputs", OUTPUT_COLUMNS)):
+                column_list = ", ".join(column for column in columns if column != "id")
+                conn.execute(
+                    f"INSERT INTO {target}.{table} ({column_list}) "
+                    f"SELECT {column_list} FROM {source}.{table} WHERE prompt_id IN ({placeholders})",
+                    prompt_ids,
+                )
+                conn.execute(f"DELETE FROM {source}.{table} WHERE prompt_id IN ({placeholders})", prompt_ids)
+            conn.execute(f"DELETE FROM {source}.prompts WHERE id IN ({placeholders})", prompt_ids)
+
+    # === Politique d'archivage ===
+
+    def find_candidates(self, statuses=DEFAULT_STATUSES, min_age_days=180, idle_days=90):
+        """
+        Lister les prompts à archiver selon la politique:
+        - statut parmi `statuses`
+        - pas modifié depuis `min_age_days` jours (prompts sans date = anciens)
+        - aucune exécution depuis `idle_days` jours
+        """
+        if not statuses:
+            return []
+
+        now = time.time()
+        age_cutoff = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now - min_age_days * 86400))
+        idle_cutoff = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now - idle_days * 86400))
+        placeholders = ", ".join("?" for _ in statuses)
+
+        with self.db_manager._lock:
+            cursor = self.db_manager.conn.execute(
+                f"""
+                SELECT p.id FROM prompts p
+                WHERE p.status IN ({placeholders})
+                  AND COALESCE(p.updated_at, p.created_at, '') < ?
+                  AND NOT EXISTS (
+                      SELECT 1 FROM prompt_executions e
+                      WHERE e.prompt_id = p.id AND e.started_at >= ?
+                  )
+                ORDER BY p.id
+            """,
+                (*statuses, age_cutoff, idle_cutoff),
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def archive_prompts(self, prompt_ids=None, batch_size=200, progress_callback=None, **policy):
+        """
+        Archiver des prompts par lots transactionnels.
+        Sans `prompt_ids`, les candidats sont sélectionnés par find_candidates(**policy).
+        Retourne (nombre archivé, message)
+        """
+        if prompt_ids is None:
+            prompt_ids = self.find_candidates(**policy)
+        prompt_ids = list(prompt_ids)
+        if not prompt_ids:
+            return 0, "Aucun prompt à archiver"
+
+        backup_ok, backup_message = self.db_manager.snapshot_before("archive")
+        if not backup_ok:
+            return 0, backup_message
+
+        archived = 0
+        archived_at = self.db_manager.now()
+        with self.db_manager._lock:
+            try:
+                self._attach()
+                conflicts = self._conflicting_ids(prompt_ids, self.ARCHIVE_SCHEMA)
+                if conflicts:
+                    names = ", ".join(f"{pid} ('{name}')" for pid, name in conflicts)
+                    return 0, f"Archivage annulé: IDs déjà présents dans l'archive: {names}"
+                for start in range(0, len(prompt_ids), batch_size):
+                    batch = prompt_ids[start : start + batch_size]
+                    self._move_rows(batch, "main", self.ARCHIVE_SCHEMA, archived_at)
+                    archived += len(batch)
+                    if progress_callback:
+                        progress_callback(archived, len(prompt_ids))
+            except sqlite3.Error as e:
+                return archived, f"Erreur lors de l'archivage après {archived} prompts: {e}"
+            finally:
+                self._detach()
+
+        return archived, f"{archived} prompts archivés dans {os.path.basename(self.archive_path)}"
+
+    def restore_prompt(self, prompt_id):
+        """Ramener un prompt archivé (et son historique) dans la base principale"""
+        if not os.path.exists(self.archive_path):
+            return False, "Aucune archive"
+
+        with self.db_manager._lock:
+            try:
+                self._attach()
+                cursor = self.db_manager.conn.execute(
+                    f"SELECT 1 FROM {self.ARCHIVE_SCHEMA}.prompts WHERE id=?", (prompt_id,)
+                )
+                if cursor.fetchone() is None:
+                    return False, f"Prompt {prompt_id} absent de l'archive"
+                conflicts = self._conflicting_ids([prompt_id], "main")
+                if conflicts:
+                    return False, (
+                        f"Restauration impossible: l'ID {prompt_id} est déjà utilisé par le prompt "
+                        f"'{conflicts[0][1]}' dans la base principale"
+                    )
+                self._move_rows([prompt_id], self.ARCHIVE_SCHEMA, "main")
+                return True, f"Prompt {prompt_id} restauré"
+            except sqlite3.Error as e:
+                return False, f"Erreur lors de la restauration: {e}"
+            finally:
+                self._detach()
+
+    # === Consultation ===
+
+    def count_archived(self):
+        """Nombre de prompts présents dans l'archive"""
+        if not os.path.exists(self.archive_path):
+            return 0
+        conn = sqlite3.connect(self.archive_path)
+        try:
+            return conn.execute("SELECT COUNT(*) FROM prompts").fetchone()[0]
+        except sqlite3.Error:
+            return 0
+        finally:
+            conn.close()
+
+    def search(self, term, include_archived=True, limit=200):
+        """
+        Rechercher des prompts par nom ou commentaire.
+        Retourne des tuples (id, name, status, model, comment, archived) ;
+        l'archive n'est lue que si include_archived est vrai.
+        """
+        pattern = f"%{term}%"
+        query = "SELECT id, name, status, model, comment, {archived} FROM {schema}.prompts WHERE name LIKE ? OR comment LIKE ?"
+
+        with self.db_manager._lock:
+            conn = self.db_manager.conn
+            results = conn.execute(
+                query.format(archived=0, schema="main") + " ORDER BY id LIMIT ?", (pattern, pattern, limit)
+            ).fetchall()
+
+            if include_archived and os.path.exists(self.archive_path):
+                try:
+                    self._attach()
+                    results += conn.execute(
+                        query.format(archived=1, schema=self.ARCHIVE_SCHEMA) + " ORDER BY id LIMIT ?",
+                        (pattern, pattern, limit),
+                    ).fetchall()
+                finally:
+                    self._detach()
+
+        return [(pid, name, status, model, comment, bool(archived)) for pid, name, status, model, comment, archived in results]
@@ -1,7 +1,81 @@
 import os
 import sqlite3
 import json
+import time
+import threading
 from cy8_paths import normalize_path, ensure_dir, get_default_db_path
+from cy8_records import cy8_prompt_summary, cy8_prompt_record, cy8_execution_record
+from cy8_db_backup import cy8_database_backup
+
+
+# Taille des tranches de copie lors d'une reconstruction de la table prompts
+REBUILD_CHUNK_SIZE = 5000
+
+# Registre central des requêtes: chaque requête a un texte SQL unique et constant,
+# ce qui permet au cache de statements de sqlite3 de réutiliser la requête préparée.
+SQL_STATEMENTS = {
+    "create_prompts_table": """
+        CREATE TABLE IF NOT EXISTS prompts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            prompt_values JSON,
+            workflow JSON,
+            url TEXT,
+            parent INTEGER,
+            model TEXT,
+            comment TEXT,
+            status TEXT DEFAULT 'new',
+            created_at TEXT,
+            updated_at TEXT
+        )
+    """,
+    "select_all_prompts": "SELECT id, name, parent, model, workflow, status, comment FROM prompts",
+    "select_prompt_by_id": "SELECT name, prompt_values, workflow, url, model, comment, status FROM prompts WHERE id=?",
+    "select_prompt_name_exists": "SELECT 1 FROM prompts WHERE name=? LIMIT 1",
+    "insert_prompt": (
+        "INSERT INTO prompts (name, prompt_values, workflow, url, model, status, comment, parent, created_at, updated_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+    ),
+    "update_prompt": (
+        "UPDATE prompts SET name=?, prompt_values=?, workflow=?, url=?, model=?, comment=?, status=?, updated_at=? "
+        "WHERE id=?"
+    ),
+    "delete_prompt": "DELETE FROM prompts WHERE id=?",
+    "delete_prompt_executions": "DELETE FROM prompt_executions WHERE prompt_id=?",
+    "delete_prompt_outputs": "DELETE FROM prompt_outputs WHERE prompt_id=?",
+    "insert_execution": (
+        "INSERT INTO prompt_executions (prompt_id, execution_id, status, started_at, parameters, workflow_hash) "
+        "VALUES (?, ?, 'running', ?, ?, ?)"
+    ),
+    "finish_execution": (
+        "UPDATE prompt_executions SET status=?, message=?, comfyui_prompt_id=COALESCE(?, comfyui_prompt_id), "
+        "finished_at=? WHERE execution_id=? AND status='running'"
+    ),
+    "mark_execution_queued": "UPDATE prompt_executions SET comfyui_prompt_id=?, backend=? WHERE execution_id=?",
+    "select_pending_executions": (
+        "SELECT execution_id, prompt_id, comfyui_prompt_id, backend FROM prompt_executions "
+        "WHERE status='running' AND comfyui_prompt_id IS NOT NULL ORDER BY id"
+    ),
+    "select_execution_prompt_id": "SELECT prompt_id FROM prompt_executions WHERE execution_id=?",
+    "select_prompt_executions": (
+        "SELECT execution_id, comfyui_prompt_id, status, message, started_at, finished_at, parameters, workflow_hash, "
+        "node_timings FROM prompt_executions WHERE prompt_id=? ORDER BY id DESC"
+    ),
+    "insert_output": "INSERT INTO prompt_outputs (prompt_id, execution_id, path, created_at) VALUES (?, ?, ?, ?)",
+    "select_prompt_outputs": "SELECT path FROM prompt_outputs WHERE prompt_id=? ORDER BY id",
+    "select_execution_outputs": "SELECT path FROM prompt_outputs WHERE execution_id=? ORDER BY id",
+    "update_execution_hash": "UPDATE prompt_executions SET workflow_hash=? WHERE execution_id=?",
+    "update_execution_node_timings": "UPDATE prompt_executions SET node_timings=? WHERE execution_id=?",
+    "select_execution_node_timings": "SELECT node_timings FROM prompt_executions WHERE execution_id=?",
+    "select_cached_result": "SELECT execution_id FROM result_cache WHERE workflow_hash=?",
+    "upsert_cached_result": (
+        "INSERT INTO result_cache (workflow_hash, execution_id, created_at, hits) VALUES (?, ?, ?, 0) "
+        "ON CONFLICT(workflow_hash) DO UPDATE SET execution_id=excluded.execution_id, "
+        "created_at=excluded.created_at, hits=0"
+    ),
+    "hit_cached_result": "UPDATE result_cache SET hits=hits+1, last_hit_at=? WHERE workflow_hash=?",
+    "delete_cached_result": "DELETE FROM result_cache WHERE workflow_hash=?",
+}
 
 
 class cy8_database_manager:
@@ -18,41 +92,68 @@ class cy8_database_manager:
         self.conn = None
         self.cursor = None
         self.status_options = ("new", "test", "ok", "nok")
+        # Verrou partagé: la connexion est utilisée par les threads d'exécution
+        self._lock = threading.RLock()
+        # Positionné après une reconstruction de table (pages libres, statistiques obsolètes)
+        self.needs_maintenance = False
+        # Instantanés pris avant toute opération destructive
+        self.backup_manager = cy8_database_backup(self.db_path)
+
+    def _connect(self):
+        """Ouvrir la connexion avec un cache de statements dimensionné pour le registre"""
+        self.conn = sqlite3.connect(
+            self.db_path,
+            check_same_thread=False,
+            cached_statements=max(128, 2 * len(SQL_STATEMENTS)),
+        )
+        # Base neuve: compactable par étapes (cy8_db_maintenance) ; sans effet sur une base existante
+        self.conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self.cursor = self.conn.cursor()
 
-    def init_database(self, mode="init"):
+    def _execute(self, statement_name, params=()):
+        """Exécuter une requête du registre SQL_STATEMENTS (requête préparée réutilisée)"""
+        return self.cursor.execute(SQL_STATEMENTS[statement_name], params)
+
+    def snapshot_before(self, reason, progress_callback=None):
+        """
+        Prendre un instantané de la base avant une opération destructive.
+        Retourne (succès, chemin de l'instantané ou message d'erreur)
+        """
+        if self.conn:
+            with self._lock:
+                self.conn.commit()  # L'instantané ne voit que les données validées
+        try:
+            snapshot_path = self.backup_manager.create_snapshot(reason, progress_callback)
+        except (sqlite3.Error, OSError) as e:
+            return False, f"Sauvegarde impossible avant '{reason}': {e}"
+        if snapshot_path:
+            print(f"Instantané créé avant '{reason}': {snapshot_path}")
+        return True, snapshot_path
+
+    def init_database(self, mode="init", backup=True):
         """
         Initialise la base de données
         mode="init" : Recrée la base et ajoute le prompt par défaut
         mode="dev"  : Crée la base si elle n'existe pas, n'ajoute pas le prompt par défaut
+        backup=False : l'appelant a déjà sauvegardé la base existante
         """
         if mode == "init":
-            # Mode init: Supprime la base existante et recrée
+            # Mode init: Supprime la base existante (après instantané) et recrée
             if os.path.exists(self.db_path):
+                if backup:
+                    backup_ok, backup_message = self.snapshot_before("init")
+                    if not backup_ok:
+                        raise Exception(backup_message)
                 os.remove(self.db_path)
-            self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
-            self.cursor = self.conn.cursor()
-            self.cursor.execute(
-                """
-                CREATE TABLE IF NOT EXISTS prompts (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    prompt_values JSON,
-                    workflow JSON,
-                    url TEXT,
-                    parent INTEGER,
-                    model TEXT,
-                    comment TEXT,
-                    status TEXT DEFAULT 'new'
-                )
-            """
-            )
+            self._connect()
+            self._execute("create_prompts_table")
             self.conn.commit()
             self.ensure_additional_columns()
+            self.ensure_history_tables()
             self.add_default_basic_prompt()
         else:  # mode == "dev"
             # Mode dev: Crée la base si elle n'existe pas
-            self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
-            self.cursor = self.conn.cursor()
+            self._connect()
 
             # Vérifier si la table prompts existe déjà
             self.cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='prompts'")
@@ -74,46 +175,19 @@ class cy8_database_manager:
                             raise Exception(f"Impossible de corriger la structure de la base: {fix_message}")
                     else:
                         # Table manquante, la créer normalement
-                        self.cursor.execute(
-                            """
-                            CREATE TABLE prompts (
-                                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                name TEXT NOT NULL,
-                                prompt_values JSON,
-                                workflow JSON,
-                                url TEXT,
-                                parent INTEGER,
-                                model TEXT,
-                                comment TEXT,
-                                status TEXT DEFAULT 'new'
-                            )
-                        """
-                        )
+                        self._execute("create_prompts_table")
                         self.conn.commit()
                         print("Table 'prompts' créée avec succès")
                 else:
                     print(f"Structure de la base validée: {message}")
             else:
                 # La table n'existe pas, la créer
-                self.cursor.execute(
-                    """
-                    CREATE TABLE prompts (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        name TEXT NOT NULL,
-                        prompt_values JSON,
-                        workflow JSON,
-                        url TEXT,
-                        parent INTEGER,
-                        model TEXT,
-                        comment TEXT,
-                        status TEXT DEFAULT 'new'
-                    )
-                """
-                )
+                self._execute("create_prompts_table")
                 self.conn.commit()
                 print("Table 'prompts' créée avec succès")
 
             self.ensure_additional_columns()
+            self.ensure_history_tables()
 
     def ensure_additional_columns(self):
         """Assurer que toutes les colonnes additionnelles existent"""
@@ -124,7 +198,7 @@ class cy8_database_manager:
 
             # Gestion spéciale pour la colonne image (legacy)
             if "image" in columns:
-                self.remove_legacy_image_column(columns)
+                self.remove_legacy_image_column()
                 # Re-vérifier les colonnes après suppression
                 self.cursor.execute("PRAGMA table_info(prompts)")
                 columns = [row[1] for row in self.cursor.fetchall()]
@@ -142,6 +216,10 @@ class cy8_database_manager:
                 alterations.append("ALTER TABLE prompts ADD COLUMN comment TEXT")
             if status_missing:
                 alterations.append("ALTER TABLE prompts ADD COLUMN status TEXT DEFAULT 'new'")
+            if "created_at" not in columns:
+                alterations.append("ALTER TABLE prompts ADD COLUMN created_at TEXT")
+            if "updated_at" not in columns:
+                alterations.append("ALTER TABLE prompts ADD COLUMN updated_at TEXT")
 
             for statement in alterations:
                 self.cursor.execute(statement)
@@ -160,65 +238,145 @@ class cy8_database_manager:
         except sqlite3.OperationalError as e:
             print(f"Erreur lors de l'ajout des colonnes : {e}")
 
-    def remove_legacy_image_column(self, existing_columns):
-        """Supprimer la colonne image legacy et migrer les données"""
-        desired_columns = [
-            "id",
-            "name",
-            "prompt_values",
-            "workflow",
-            "url",
-            "parent",
-            "model",
-            "comment",
-            "status",
-        ]
-
+    def ensure_history_tables(self):
+        """Assurer que les tables d'historique d'exécution existent"""
         try:
-            self.cursor.execute("PRAGMA foreign_keys=off")
-            self.cursor.execute("DROP TABLE IF EXISTS prompts_old")
-            self.cursor.execute("BEGIN")
-            self.cursor.execute("ALTER TABLE prompts RENAME TO prompts_old")
-
-            # Créer la nouvelle table
             self.cursor.execute(
                 """
-                CREATE TABLE prompts (
+                CREATE TABLE IF NOT EXISTS prompt_executions (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    prompt_id INTEGER NOT NULL,
+                    execution_id TEXT NOT NULL,
+                    comfyui_prompt_id TEXT,
+                    status TEXT DEFAULT 'running',
+                    message TEXT,
+                    started_at TEXT,
+                    finished_at TEXT,
+                    parameters TEXT,
+                    workflow_hash TEXT,
+                    backend TEXT,
+                    node_timings TEXT
+                )
+            """
+            )
+            # Colonnes ajoutées après la création de la table (bases existantes)
+            self.cursor.execute("PRAGMA table_info(prompt_executions)")
+            execution_columns = [row[1] for row in self.cursor.fetchall()]
+            for column in ("parameters", "workflow_hash", "backend", "node_timings"):
+                if column not in execution_columns:
+                    self.cursor.execute(f"ALTER TABLE prompt_executions ADD COLUMN {column} TEXT")
+            self.cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS prompt_outputs (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    prompt_values JSON,
-                    workflow JSON,
-                    url TEXT,
-                    parent INTEGER,
-                    model TEXT,
-                    comment TEXT,
-                    status TEXT DEFAULT 'new'
+                    prompt_id INTEGER NOT NULL,
+                    execution_id TEXT,
+                    path TEXT NOT NULL,
+                    created_at TEXT
+                )
+            """
+            )
+            self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_prompt_executions_prompt ON prompt_executions(prompt_id)")
+            self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_prompt_outputs_prompt ON prompt_outputs(prompt_id)")
+            self.cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_prompt_executions_hash ON prompt_executions(workflow_hash)"
+            )
+            # Cache des résultats: empreinte du workflow patché -> exécution dont les images sont réutilisables
+            self.cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS result_cache (
+                    workflow_hash TEXT PRIMARY KEY,
+                    execution_id TEXT NOT NULL,
+                    created_at TEXT,
+                    last_hit_at TEXT,
+                    hits INTEGER DEFAULT 0
                 )
             """
             )
+            self.conn.commit()
+        except sqlite3.OperationalError as e:
+            print(f"Erreur lors de la création des tables d'historique : {e}")
 
-            # Migrer les données
+    def remove_legacy_image_column(self, progress_callback=None):
+        """Supprimer la colonne image legacy et migrer les données"""
+        backup_ok, backup_message = self.snapshot_before("remove_image_column")
+        if not backup_ok:
+            print(f"Migration de la colonne image reportée : {backup_message}")
+            return
+
+        try:
+            copied, skipped = self._rebuild_prompts_table(progress_callback)
+            print(f"Colonne image supprimée : {copied} prompts migrés, {skipped} ignorés")
+        except sqlite3.Error as e:
+            print(f"Impossible de supprimer la colonne image : {e}")
+
+    def _rebuild_prompts_table(self, progress_callback=None, chunk_size=REBUILD_CHUNK_SIZE):
+        """
+        Reconstruire la table prompts avec la structure attendue, sans charger les lignes en mémoire.
+        Les colonnes sont associées par nom, les données copiées par INSERT ... SELECT sur des
+        tranches de rowid, le tout dans une seule transaction.
+        progress_callback(lignes_copiees, lignes_totales) est appelé après chaque tranche.
+        Retourne (lignes copiées, lignes ignorées)
+        """
+        foreign_keys = self.cursor.execute("PRAGMA foreign_keys").fetchone()[0]
+        self.cursor.execute("PRAGMA foreign_keys=off")
+        try:
+            self.cursor.execute("DROP TABLE IF EXISTS prompts_old")
+            self.cursor.execute("BEGIN")
+            self.cursor.execute("ALTER TABLE prompts RENAME TO prompts_old")
+            self._execute("create_prompts_table")
+
+            old_columns = {row[1] for row in self.cursor.execute("PRAGMA table_info(prompts_old)").fetchall()}
+            new_columns = [row[1] for row in self.cursor.execute("PRAGMA table_info(prompts)").fetchall()]
             select_parts = []
-            for column in desired_columns:
-                if column in existing_columns:
+            for column in new_columns:
+                if column == "name" and column in old_columns:
+                    select_parts.append("COALESCE(name, 'Prompt sans nom')")
+                elif column == "status" and column in old_columns:
+                    select_parts.append("COALESCE(NULLIF(TRIM(status), ''), 'new')")
+                elif column in old_columns:
                     select_parts.append(column)
+                elif column == "name":
+                    select_parts.append("'Prompt sans nom'")
                 elif column == "status":
                     select_parts.append("'new'")
                 else:
                     select_parts.append("NULL")
 
-            insert_columns = ", ".join(desired_columns)
-            select_clause = ", ".join(select_parts)
-            self.cursor.execute(f"INSERT INTO prompts ({insert_columns}) SELECT {select_clause} FROM prompts_old")
+            copy_statement = (
+                f"INSERT OR IGNORE INTO prompts ({', '.join(new_columns)}) "
+                f"SELECT {', '.join(select_parts)} FROM prompts_old WHERE rowid > ? AND rowid <= ?"
+            )
+            total = self.cursor.execute("SELECT COUNT(*) FROM prompts_old").fetchone()[0]
+            copied = 0
+            scanned = 0
+            last_rowid = -1
+            while scanned < total:
+                # Borne haute de la tranche: seul ce rowid est lu, pas les lignes
+                row = self.cursor.execute(
+                    "SELECT rowid FROM prompts_old WHERE rowid > ? ORDER BY rowid LIMIT 1 OFFSET ?",
+                    (last_rowid, chunk_size - 1),
+                ).fetchone()
+                upper_rowid = row[0] if row else self.cursor.execute("SELECT MAX(rowid) FROM prompts_old").fetchone()[0]
+                scanned += self.cursor.execute(
+                    "SELECT COUNT(*) FROM prompts_old WHERE rowid > ? AND rowid <= ?", (last_rowid, upper_rowid)
+                ).fetchone()[0]
+                copied += self.cursor.execute(copy_statement, (last_rowid, upper_rowid)).rowcount
+                last_rowid = upper_rowid
+                if progress_callback:
+                    progress_callback(scanned, total)
+
             self.cursor.execute("DROP TABLE prompts_old")
             self.conn.commit()
-
-        except sqlite3.Error as e:
+            self.needs_maintenance = True
+            return copied, total - copied
+        except sqlite3.Error:
             self.conn.rollback()
-            print(f"Impossible de supprimer la colonne image : {e}")
+            raise
         finally:
             try:
-                self.cursor.execute("PRAGMA foreign_keys=on")
+                # Réglage de la connexion rétabli tel qu'il était avant la reconstruction
+                self.cursor.execute(f"PRAGMA foreign_keys={'on' if foreign_keys else 'off'}")
             except sqlite3.Error:
                 pass
 
@@ -284,8 +442,9 @@ class cy8_database_manager:
             },
         }
 
-        self.cursor.execute(
-            "INSERT INTO prompts (name, prompt_values, workflow, url, model, status, comment) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        now = self.now()
+        self._execute(
+            "insert_prompt",
             (
                 "basic",
                 json.dumps(default_values, ensure_ascii=False),
@@ -294,6 +453,9 @@ class cy8_database_manager:
                 "",
                 "new",
                 "",
+                None,
+                now,
+                now,
             ),
         )
         self.conn.commit()
@@ -348,52 +510,178 @@ class cy8_database_manager:
                     return model_name
         return ""
 
+    def prompt_checkpoint(self, prompt):
+        """Checkpoint d'un prompt pour l'affinité de backend: celui du workflow, à défaut la colonne model"""
+        return self.derive_model_from_workflow(prompt.workflow) or prompt.model or ""
+
     def get_all_prompts(self):
         """Récupérer tous les prompts avec toutes les colonnes"""
-        self.cursor.execute("SELECT id, name, parent, model, workflow, status, comment FROM prompts")
+        with self._lock:
+            rows = self._execute("select_all_prompts").fetchall()
         results = []
-        for row in self.cursor.fetchall():
-            prompt_id, name, parent, model, workflow, status, comment = row
+        derived_models = {}  # Les prompts hérités partagent souvent le même workflow
+        for row in rows:
+            prompt = cy8_prompt_summary(*row)
             # Dériver le modèle si vide
-            if not model and workflow:
-                model = self.derive_model_from_workflow(workflow)
-            results.append((prompt_id, name, parent, model, workflow, status, comment))
+            if not prompt.model and prompt.workflow:
+                if prompt.workflow not in derived_models:
+                    derived_models[prompt.workflow] = self.derive_model_from_workflow(prompt.workflow)
+                prompt.model = derived_models[prompt.workflow]
+            results.append(prompt)
         return results
 
     def get_prompt_by_id(self, prompt_id):
         """Récupérer un prompt par son ID"""
-        self.cursor.execute(
-            "SELECT name, prompt_values, workflow, url, model, comment, status FROM prompts WHERE id=?",
-            (prompt_id,),
-        )
-        return self.cursor.fetchone()
+        with self._lock:
+            row = self._execute("select_prompt_by_id", (prompt_id,)).fetchone()
+        return cy8_prompt_record(*row) if row else None
 
     def update_prompt(self, prompt_id, name, prompt_values, workflow, url, model, comment, status):
         """Mettre à jour un prompt complet"""
-        self.cursor.execute(
-            "UPDATE prompts SET name=?, prompt_values=?, workflow=?, url=?, model=?, comment=?, status=? WHERE id=?",
-            (name, prompt_values, workflow, url, model, comment, status, prompt_id),
-        )
-        self.conn.commit()
+        with self._lock:
+            self._execute(
+                "update_prompt",
+                (name, prompt_values, workflow, url, model, comment, status, self.now(), prompt_id),
+            )
+            self.conn.commit()
 
     def create_prompt(self, name, prompt_values, workflow, url, model, status, comment, parent=None):
         """Créer un nouveau prompt"""
-        self.cursor.execute(
-            "INSERT INTO prompts (name, prompt_values, workflow, url, model, status, comment, parent) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-            (name, prompt_values, workflow, url, model, status, comment, parent),
-        )
-        self.conn.commit()
-        return self.cursor.lastrowid
+        now = self.now()
+        with self._lock:
+            self._execute(
+                "insert_prompt",
+                (name, prompt_values, workflow, url, model, status, comment, parent, now, now),
+            )
+            self.conn.commit()
+            return self.cursor.lastrowid
 
     def delete_prompt(self, prompt_id):
-        """Supprimer un prompt"""
-        self.cursor.execute("DELETE FROM prompts WHERE id=?", (prompt_id,))
-        self.conn.commit()
+        """Supprimer un prompt (avec son historique d'exécution)"""
+        with self._lock:
+            self._execute("delete_prompt", (prompt_id,))
+            self._execute("delete_prompt_executions", (prompt_id,))
+            self._execute("delete_prompt_outputs", (prompt_id,))
+            self.conn.commit()
+
+    @staticmethod
+    def now():
+        """Horodatage au format stocké en base (tri lexicographique = tri chronologique)"""
+        return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
+
+    def start_execution_record(self, prompt_id, execution_id, parameters=None, workflow_hash=None):
+        """
+        Enregistrer le démarrage d'une exécution dans l'historique.
+        parameters: dict des paramètres de la variante (balayage), stocké en JSON
+        """
+        if parameters is not None:
+            parameters = json.dumps(parameters, ensure_ascii=False, sort_keys=True)
+        with self._lock:
+            self._execute("insert_execution", (prompt_id, execution_id, self.now(), parameters, workflow_hash))
+            self.conn.commit()
+
+    def finish_execution_record(self, execution_id, status, message="", comfyui_prompt_id=None, output_paths=None):
+        """
+        Clôturer une exécution et enregistrer les images produites.
+        Seule une exécution encore 'running' est clôturée (suivi direct et réconciliation peuvent se croiser) ;
+        retourne False si elle l'était déjà
+        """
+        now = self.now()
+        with self._lock:
+            if self._execute("finish_execution", (status, message, comfyui_prompt_id, now, execution_id)).rowcount == 0:
+                self.conn.commit()
+                return False
+            if output_paths:
+                row = self._execute("select_execution_prompt_id", (execution_id,)).fetchone()
+                if row:
+                    self.cursor.executemany(
+                        SQL_STATEMENTS["insert_output"],
+                        [(row[0], execution_id, path, now) for path in output_paths],
+                    )
+            self.conn.commit()
+        return True
+
+    def get_prompt_executions(self, prompt_id):
+        """Récupérer l'historique d'exécution d'un prompt (plus récent en premier)"""
+        with self._lock:
+            rows = self._execute("select_prompt_executions", (prompt_id,)).fetchall()
+        return [cy8_execution_record(*row) for row in rows]
+
+    def get_execution_outputs(self, execution_id):
+        """Récupérer les chemins des images produites par une exécution"""
+        with self._lock:
+            return [row[0] for row in self._execute("select_execution_outputs", (execution_id,)).fetchall()]
+
+    def mark_execution_queued(self, execution_id, comfyui_prompt_id, backend=None):
+        """Noter l'ID ComfyUI et le backend d'une exécution en file (reprise par réconciliation)"""
+        with self._lock:
+            self._execute("mark_execution_queued", (comfyui_prompt_id, backend, execution_id))
+            self.conn.commit()
+
+    def get_pending_executions(self):
+        """Exécutions en file chez ComfyUI et non clôturées: [(execution_id, prompt_id, comfyui_prompt_id, backend)]"""
+        with self._lock:
+            return [tuple(row) for row in self._execute("select_pending_executions").fetchall()]
+
+    def set_execution_node_timings(self, execution_id, node_timings):
+        """Enregistrer les durées par node d'une exécution (rapport de cy6_node_timings, stocké en JSON)"""
+        with self._lock:
+            self._execute("update_execution_node_timings", (json.dumps(node_timings), execution_id))
+            self.conn.commit()
+
+    def get_execution_node_timings(self, execution_id):
+        """Durées par node d'une exécution (dict), None si non relevées"""
+        with self._lock:
+            row = self._execute("select_execution_node_timings", (execution_id,)).fetchone()
+        if not row or not row[0]:
+            return None
+        try:
+            return json.loads(row[0])
+        except ValueError:
+            return None
+
+    def set_execution_hash(self, execution_id, workflow_hash):
+        """Renseigner l'empreinte du workflow réellement soumis pour une exécution"""
+        with self._lock:
+            self._execute("update_execution_hash", (workflow_hash, execution_id))
+            self.conn.commit()
+
+    def get_cached_result(self, workflow_hash):
+        """Exécution en cache pour une empreinte de workflow: (execution_id, chemins) ou None"""
+        with self._lock:
+            row = self._execute("select_cached_result", (workflow_hash,)).fetchone()
+            if not row:
+                return None
+            paths = [path for (path,) in self._execute("select_execution_outputs", (row[0],)).fetchall()]
+        return row[0], paths
+
+    def store_cached_result(self, workflow_hash, execution_id):
+        """Associer une empreinte de workflow à l'exécution qui a produit ses images"""
+        with self._lock:
+            self._execute("upsert_cached_result", (workflow_hash, execution_id, self.now()))
+            self.conn.commit()
+
+    def hit_cached_result(self, workflow_hash):
+        """Compter une réutilisation du résultat en cache (hits, date du dernier accès)"""
+        with self._lock:
+            self._execute("hit_cached_result", (self.now(), workflow_hash))
+            self.conn.commit()
+
+    def evict_cached_result(self, workflow_hash):
+        """Retirer du cache une empreinte dont les images ne sont plus disponibles"""
+        with self._lock:
+            self._execute("delete_cached_result", (workflow_hash,))
+            self.conn.commit()
+
+    def get_prompt_outputs(self, prompt_id):
+        """Récupérer les chemins des images produites par un prompt"""
+        with self._lock:
+            return [row[0] for row in self._execute("select_prompt_outputs", (prompt_id,)).fetchall()]
 
     def prompt_name_exists(self, name):
         """Vérifier si un nom de prompt existe"""
-        self.cursor.execute("SELECT 1 FROM prompts WHERE name=? LIMIT 1", (name,))
-        return self.cursor.fetchone() is not None
+        with self._lock:
+            return self._execute("select_prompt_name_exists", (name,)).fetchone() is not None
 
     def validate_database_structure(self):
         """Valider la structure de la base de données"""
@@ -442,93 +730,38 @@ class cy8_database_manager:
         except Exception as e:
             return False, f"Erreur lors de la validation: {e}"
 
-    def fix_database_structure(self):
-        """Tenter de corriger la structure de la base de données"""
+    def fix_database_structure(self, progress_callback=None):
+        """Tenter de corriger la structure de la base de données (reconstruction en flux)"""
         try:
             print("Tentative de correction de la structure de la base...")
 
-            # Sauvegarder les données existantes si la table existe
-            backup_data = []
-            try:
-                self.cursor.execute("SELECT * FROM prompts")
-                backup_data = self.cursor.fetchall()
-                print(f"Sauvegarde de {len(backup_data)} prompts existants")
-            except:
-                print("Aucune donnée existante à sauvegarder")
-
-            # Supprimer l'ancienne table si elle existe
-            self.cursor.execute("DROP TABLE IF EXISTS prompts")
+            backup_ok, backup_message = self.snapshot_before("fix_structure")
+            if not backup_ok:
+                return False, backup_message
 
-            # Recréer la table avec la bonne structure
-            self.cursor.execute(
-                """
-                CREATE TABLE prompts (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    prompt_values JSON,
-                    workflow JSON,
-                    url TEXT,
-                    parent INTEGER,
-                    model TEXT,
-                    comment TEXT,
-                    status TEXT DEFAULT 'new'
-                )
-            """
-            )
-
-            # Restaurer les données si possible
-            if backup_data:
-                for row in backup_data:
-                    try:
-                        # Adapter selon le nombre de colonnes dans la sauvegarde
-                        if len(row) >= 8:
-                            self.cursor.execute(
-                                """
-                                INSERT INTO prompts (id, name, prompt_values, workflow, url, parent, model, comment, status)
-                                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                            """,
-                                row[:9],
-                            )  # Prendre les 9 premières colonnes
-                        else:
-                            # Structure ancienne, adapter
-                            name = row[1] if len(row) > 1 else "Prompt sans nom"
-                            prompt_values = row[2] if len(row) > 2 else "{}"
-                            workflow = row[3] if len(row) > 3 else "{}"
-                            url = row[4] if len(row) > 4 else ""
-                            model = row[5] if len(row) > 5 else ""
-                            comment = row[6] if len(row) > 6 else ""
-                            status = row[7] if len(row) > 7 else "new"
-
-                            self.cursor.execute(
-                                """
-                                INSERT INTO prompts (name, prompt_values, workflow, url, model, comment, status)
-                                VALUES (?, ?, ?, ?, ?, ?, ?)
-                            """,
-                                (
-                                    name,
-                                    prompt_values,
-                                    workflow,
-                                    url,
-                                    model,
-                                    comment,
-                                    status,
-                                ),
-                            )
-                    except Exception as e:
-                        print(f"Erreur lors de la restauration du prompt {row}: {e}")
-                        continue
-
-                print(f"Restauration terminée")
+            self.cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='prompts'")
+            if self.cursor.fetchone() is None:
+                print("Aucune donnée existante à migrer")
+                self._execute("create_prompts_table")
+                self.conn.commit()
+            else:
+                copied, skipped = self._rebuild_prompts_table(progress_callback)
+                print(f"Restauration terminée: {copied} prompts migrés, {skipped} ignorés")
 
-            self.conn.commit()
             self.ensure_additional_columns()
 
+            self.needs_maintenance = True
             return True, "Structure corrigée avec succès"
 
         except Exception as e:
             return False, f"Erreur lors de la correction: {e}"
 
     def close(self):
-        """Fermer la connexion"""
+        """Fermer la connexion (PRAGMA optimize avant fermeture)"""
         if self.conn:
+            try:
+                self.conn.commit()
+                self.conn.execute("PRAGMA optimize")
+            except sqlite3.Error as e:
+                print(f"PRAGMA optimize impossible à la fermeture : {e}")
             self.conn.close()
@@ -0,0 +1,110 @@
+"""
+Module de sauvegarde en ligne de la base - Version cy8
+Instantanés via sqlite3.Connection.backup (copie par pas de pages) avec rotation
+"""
+
+import os
+import re
+import glob
+import time
+import sqlite3
+import threading
+
+
+class cy8_database_backup:
+    """Sauvegardes incrémentales (par pas de pages) d'une base SQLite, avec rotation"""
+
+    # Pages copiées par pas: entre deux pas le verrou de lecture est relâché,
+    # les écritures de l'application ne sont donc pas bloquées pendant la copie
+    PAGES_PER_STEP = 256
+    KEEP_SNAPSHOTS = 10
+
+    def __init__(self, db_path, backup_dir=None, keep=None, pages_per_step=None):
+        self.db_path = db_path
+        self.backup_dir = backup_dir or os.path.join(os.path.dirname(db_path), "backups")
+        self.keep = keep if keep is not None else self.KEEP_SNAPSHOTS
+        self.pages_per_step = pages_per_step or self.PAGES_PER_STEP
+        self._name = os.path.splitext(os.path.basename(db_path))[0]
+        # <nom>_<AAAAMMJJ>_<HHMMSS>_<raison>[_<n>].db: exclut les instantanés d'une base voisine
+        # dont le nom prolonge celui-ci (prompts_test pour prompts)
+        self._snapshot_name = re.compile(rf"{re.escape(self._name)}_\d{{8}}_\d{{6}}_.+\.db")
+
+    def has_data(self):
+        """Vrai si la base existe et n'est pas vide (sinon rien à sauvegarder)"""
+        return os.path.exists(self.db_path) and os.path.getsize(self.db_path) > 0
+
+    def create_snapshot(self, reason="manual", progress_callback=None):
+        """
+        Créer un instantané cohérent de la base.
+        progress_callback(pages_copiees, pages_totales) est appelé après chaque pas.
+        Retourne le chemin de l'instantané, ou None si la base est vide.
+        """
+        if not self.has_data():
+            return None
+
+        os.makedirs(self.backup_dir, exist_ok=True)
+        timestamp = time.strftime("%Y%m%d_%H%M%S", time.localtime())
+        snapshot_path = os.path.join(self.backup_dir, f"{self._name}_{timestamp}_{reason}.db")
+        counter = 1
+        while os.path.exists(snapshot_path):
+            snapshot_path = os.path.join(self.backup_dir, f"{self._name}_{timestamp}_{reason}_{counter}.db")
+            counter += 1
+        partial_path = snapshot_path + ".part"
+
+        def progress(status, remaining, total):
+            if progress_callback:
+                progress_callback(total - remaining, total)
+
+        source = sqlite3.connect(self.db_path, check_same_thread=False)
+        target = sqlite3.connect(partial_path)
+        try:
+            source.backup(target, pages=self.pages_per_step, progress=progress, sleep=0.001)
+        except sqlite3.Error:
+            target.close()
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            raise
+        finally:
+            source.close()
+        target.close()
+
+        # Renommage atomique: un instantané visible est toujours complet
+        os.replace(partial_path, snapshot_path)
+        self.rotate()
+        return snapshot_path
+
+    def create_snapshot_async(self, reason="manual", callback=None, progress_callback=None):
+        """
+        Créer un instantané dans un thread.
+        callback(chemin, erreur) est appelé depuis ce thread à la fin.
+        """
+
+        def worker():
+            try:
+                path = self.create_snapshot(reason, progress_callback)
+                error = None
+            except Exception as e:
+                path, error = None, e
+            if callback:
+                callback(path, error)
+
+        thread = threading.Thread(target=worker, daemon=True)
+        thread.start()
+        return thread
+
+    def list_snapshots(self):
+        """Instantanés de cette base, du plus récent au plus ancien"""
+        pattern = os.path.join(glob.escape(self.backup_dir), f"{glob.escape(self._name)}_[0-9]*_*.db")
+        snapshots = [path for path in glob.glob(pattern) if self._snapshot_name.fullmatch(os.path.basename(path))]
+        return sorted(snapshots, key=os.path.getmtime, reverse=True)
+
+    def rotate(self):
+        """Supprimer les instantanés au-delà des `keep` plus récents"""
+        removed = []
+        for old_snapshot in self.list_snapshots()[self.keep :]:
+            try:
+                os.remove(old_snapshot)
+                removed.append(old_snapshot)
+            except OSError as e:
+                print(f"Impossible de supprimer l'ancien instantané {old_snapshot}: {e}")
+        return removed
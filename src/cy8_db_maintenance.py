@@ -0,0 +1,209 @@
+"""
+Module de maintenance de la base - Version cy8
+PRAGMA optimize, vacuum incrémental et contrôle d'intégrité périodiques
+"""
+
+import time
+import sqlite3
+
+
+class cy8_database_maintenance:
+    """Planificateur de maintenance SQLite pour cy8_database_manager"""
+
+    # Seuil de pages libres (freelist / page_count) au-delà duquel on compacte
+    FREE_PAGE_THRESHOLD = 0.20
+    # Intervalle entre deux contrôles d'intégrité
+    INTEGRITY_INTERVAL_DAYS = 7
+    # Pages libérées par étape de vacuum incrémental (verrou de la base relâché entre deux étapes)
+    VACUUM_STEP_PAGES = 256
+    # Attente d'un verrou SQLite par la connexion dédiée au VACUUM complet
+    VACUUM_BUSY_TIMEOUT_S = 30
+
+    def __init__(self, db_manager, free_page_threshold=None, integrity_interval_days=None):
+        self.db_manager = db_manager
+        self.free_page_threshold = free_page_threshold if free_page_threshold is not None else self.FREE_PAGE_THRESHOLD
+        self.integrity_interval_days = (
+            integrity_interval_days if integrity_interval_days is not None else self.INTEGRITY_INTERVAL_DAYS
+        )
+        self._log_table_ready = False
+        self.vacuum_in_progress = False
+        if db_manager.conn is not None:
+            with db_manager._lock:
+                self._ensure_log_table()
+
+    def _ensure_log_table(self):
+        """Créer la table de journal de maintenance (une seule fois, dès que la connexion est ouverte)"""
+        if self._log_table_ready:
+            return
+        self.db_manager.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS db_maintenance_log (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                task TEXT NOT NULL,
+                result TEXT,
+                ran_at TEXT
+            )
+        """
+        )
+        self.db_manager.conn.commit()
+        self._log_table_ready = True
+
+    def _log(self, task, result):
+        """Journaliser le résultat d'une tâche"""
+        self._ensure_log_table()
+        self.db_manager.conn.execute(
+            "INSERT INTO db_maintenance_log (task, result, ran_at) VALUES (?, ?, ?)",
+            (task, result, self.db_manager.now()),
+        )
+        self.db_manager.conn.commit()
+
+    def last_run(self, task):
+        """Dernière exécution d'une tâche: (résultat, date) ou None"""
+        with self.db_manager._lock:
+            self._ensure_log_table()
+            return self.db_manager.conn.execute(
+                "SELECT result, ran_at FROM db_maintenance_log WHERE task=? ORDER BY id DESC LIMIT 1", (task,)
+            ).fetchone()
+
+    # === Mesures ===
+
+    def page_stats(self):
+        """Retourner (page_count, freelist_count, ratio de pages libres)"""
+        with self.db_manager._lock:
+            conn = self.db_manager.conn
+            page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+            freelist_count = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        ratio = freelist_count / page_count if page_count else 0.0
+        return page_count, freelist_count, ratio
+
+    # === Tâches ===
+
+    def optimize(self):
+        """PRAGMA optimize: met à jour les statistiques utiles au planificateur de requêtes"""
+        with self.db_manager._lock:
+            self.db_manager.conn.commit()
+            self.db_manager.conn.execute("PRAGMA optimize")
+            self._log("optimize", "ok")
+        return "ok"
+
+    def analyze(self):
+        """ANALYZE complet (après une reconstruction de table)"""
+        with self.db_manager._lock:
+            self.db_manager.conn.commit()
+            self.db_manager.conn.execute("ANALYZE")
+            self._log("analyze", "ok")
+        return "ok"
+
+    def vacuum_if_needed(self, force=False, progress_callback=None):
+        """
+        Compacter la base si le ratio de pages libres dépasse le seuil, sans bloquer l'interface:
+        en auto_vacuum=INCREMENTAL (bases créées par cy8), par étapes de VACUUM_STEP_PAGES pages ;
+        une base plus ancienne y passe une fois par un VACUUM complet sur une connexion dédiée.
+        progress_callback(message): début d'un VACUUM complet
+        """
+        page_count, freelist_count, ratio = self.page_stats()
+        if not force and ratio < self.free_page_threshold:
+            return f"inutile ({freelist_count}/{page_count} pages libres, {ratio:.0%})"
+
+        with self.db_manager._lock:
+            auto_vacuum = self.db_manager.conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+        if auto_vacuum == 2:
+            result = f"vacuum incrémental: {self._incremental_vacuum()} pages libérées"
+        else:
+            if progress_callback:
+                progress_callback("Compactage complet de la base en cours (passage en vacuum incrémental)")
+            self._full_vacuum()
+            result = f"VACUUM complet (passage en incrémental): {freelist_count} pages libérées"
+        with self.db_manager._lock:
+            self._log("vacuum", result)
+        return result
+
+    def _incremental_vacuum(self):
+        """Libérer les pages libres par étapes bornées (verrou relâché entre deux) ; retourne le nombre libéré"""
+        released = 0
+        while True:
+            with self.db_manager._lock:
+                conn = self.db_manager.conn
+                conn.commit()
+                before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+                conn.execute(f"PRAGMA incremental_vacuum({self.VACUUM_STEP_PAGES})").fetchall()
+                after = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            released += before - after
+            if after == 0 or after >= before:
+                return released
+            time.sleep(0)  # Laisser passer les threads en attente du verrou
+
+    def _full_vacuum(self):
+        """
+        VACUUM complet (une fois par base) sur une connexion dédiée, hors du verrou du gestionnaire:
+        l'interface continue de lire ; ses écritures attendent la fin (délai SQLite)
+        """
+        with self.db_manager._lock:
+            self.db_manager.conn.commit()  # Aucune transaction ouverte ne doit retenir le VACUUM
+        self.vacuum_in_progress = True
+        try:
+            conn = sqlite3.connect(self.db_manager.db_path, timeout=self.VACUUM_BUSY_TIMEOUT_S)
+            try:
+                conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+                conn.execute("VACUUM")
+            finally:
+                conn.close()
+        finally:
+            self.vacuum_in_progress = False
+
+    def integrity_check(self):
+        """PRAGMA integrity_check: 'ok' ou la liste des problèmes détectés"""
+        with self.db_manager._lock:
+            rows = self.db_manager.conn.execute("PRAGMA integrity_check").fetchall()
+            result = "ok" if rows == [("ok",)] else "; ".join(row[0] for row in rows[:10])
+            self._log("integrity_check", result)
+        return result
+
+    def integrity_check_due(self):
+        """Vrai si le dernier contrôle d'intégrité est plus ancien que l'intervalle"""
+        last = self.last_run("integrity_check")
+        if not last:
+            return True
+        cutoff = time.strftime(
+            "%Y-%m-%d %H:%M:%S", time.localtime(time.time() - self.integrity_interval_days * 86400)
+        )
+        return last[1] < cutoff
+
+    def run_scheduled(self, progress_callback=None):
+        """
+        Exécuter les tâches dues. Une reconstruction de table signalée par le
+        gestionnaire de base (needs_maintenance) force ANALYZE et compactage.
+        Retourne un dict {tâche: résultat}
+        """
+        results = {}
+        try:
+            rebuilt = getattr(self.db_manager, "needs_maintenance", False)
+            results["vacuum"] = self.vacuum_if_needed(force=rebuilt, progress_callback=progress_callback)
+            if rebuilt:
+                results["analyze"] = self.analyze()
+                self.db_manager.needs_maintenance = False
+            else:
+                results["optimize"] = self.optimize()
+            if self.integrity_check_due():
+                results["integrity_check"] = self.integrity_check()
+        except sqlite3.Error as e:
+            results["erreur"] = str(e)
+        return results
+
+    def summary(self):
+        """Résumé lisible de l'état de maintenance (onglet Data)"""
+        page_count, freelist_count, ratio = self.page_stats()
+        lines = [f"Pages: {page_count} | libres: {freelist_count} ({ratio:.0%})"]
+        if self.vacuum_in_progress:
+            lines.append("Compactage: VACUUM complet en cours")
+        labels = (
+            ("optimize", "PRAGMA optimize"),
+            ("analyze", "ANALYZE"),
+            ("vacuum", "Compactage"),
+            ("integrity_check", "Intégrité"),
+        )
+        for task, label in labels:
+            last = self.last_run(task)
+            if last:
+                lines.append(f"{label}: {last[0]} ({last[1]})")
+        return "\n".join(lines)
@@ -0,0 +1,115 @@
+"""
+Ordonnancement des exécutions par checkpoint - Version cy8
+Les travaux en attente qui partagent un checkpoint sont enchaînés pour éviter les
+rechargements de modèle (10 à 30 s), avec une borne de famine: un travail ne peut
+être dépassé que max_skips fois
+"""
+
+import itertools
+import threading
+
+
+def count_reloads(checkpoints, loaded=None):
+    """Nombre de chargements de modèle pour une suite de checkpoints ('' / None = inconnu, ignoré)"""
+    reloads = 0
+    for checkpoint in checkpoints:
+        if checkpoint and checkpoint != loaded:
+            reloads += 1
+            loaded = checkpoint
+    return reloads
+
+
+class cy8_execution_scheduler:
+    """File d'attente réordonnée par affinité de checkpoint, avec borne de famine"""
+
+    # Nombre maximal de fois qu'un travail peut être dépassé par un travail plus récent
+    MAX_SKIPS = 4
+
+    def __init__(self, max_skips=None, loaded=None):
+        """loaded: checkpoint déjà chargé sur le backend au démarrage (si connu)"""
+        self.max_skips = self.MAX_SKIPS if max_skips is None else max_skips
+        self._lock = threading.Lock()
+        self._sequence = itertools.count()
+        # Entrées [ordre d'arrivée, checkpoint, travail, nombre de dépassements]
+        self._pending = []
+        self.loaded = loaded
+        self._fifo_loaded = loaded
+        self.dispatched = 0
+        self.reloads = 0
+        self.fifo_reloads = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._pending)
+
+    def push(self, job, checkpoint=None, skips=0):
+        """
+        Ajouter un travail ; le rechargement qu'il coûterait en FIFO est compté dès l'arrivée.
+        skips: dépassements déjà subis (file persistante relue à chaque choix)
+        """
+        with self._lock:
+            self._pending.append([next(self._sequence), checkpoint or "", job, skips])
+            if checkpoint and checkpoint != self._fifo_loaded:
+                self.fifo_reloads += 1
+                self._fifo_loaded = checkpoint
+
+    def pop(self, loaded=None):
+        """
+        Prochain travail (None si la file est vide).
+        loaded: checkpoint chargé sur le backend cible ; par défaut celui du dernier travail servi.
+        """
+        with self._lock:
+            if not self._pending:
+                return None
+            loaded = loaded or self.loaded
+            index = self._pick(loaded)
+            for entry in self._pending[:index]:
+                entry[3] += 1
+            _, checkpoint, job, _ = self._pending.pop(index)
+            self.dispatched += 1
+            if checkpoint and checkpoint != loaded:
+                self.reloads += 1
+            if checkpoint:
+                self.loaded = checkpoint
+            return job
+
+    def _pick(self, loaded):
+        oldest = self._pending[0]
+        if not loaded or oldest[3] >= self.max_skips or oldest[1] in ("", loaded):
+            return 0
+        for index, entry in enumerate(self._pending):
+            if entry[1] == loaded:
+                return index
+            if entry[3] >= self.max_skips:
+                return index  # Travail affamé: plus aucun dépassement au-delà
+        return 0
+
+    def drain(self):
+        """Vider la file dans l'ordre d'exécution"""
+        jobs = []
+        job = self.pop()
+        while job is not None:
+            jobs.append(job)
+            job = self.pop()
+        return jobs
+
+    def report(self):
+        """Rechargements constatés, rechargements en ordre d'arrivée et rechargements évités"""
+        with self._lock:
+            return {
+                "jobs": self.dispatched,
+                "reloads": self.reloads,
+                "fifo_reloads": self.fifo_reloads,
+                "saved": max(0, self.fifo_reloads - self.reloads),
+            }
+
+
+def order_by_affinity(jobs, checkpoint_of, max_skips=None, loaded=None):
+    """
+    Réordonner une liste de travaux par checkpoint.
+    Retourne (travaux ordonnés, rapport de rechargements) ; checkpoint_of(travail) -> nom du checkpoint
+    """
+    scheduler = cy8_execution_scheduler(max_skips, loaded)
+    for job in jobs:
+        scheduler.push(job, checkpoint_of(job))
+    return scheduler.drain(), scheduler.report()
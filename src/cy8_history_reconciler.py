@@ -0,0 +1,126 @@
+"""
+Réconciliation de l'historique ComfyUI - Version cy8
+Les exécutions en file non clôturées (redémarrage, WebSocket perdue) sont résolues
+par lot: une seule requête /history?max_items=N par backend, rapprochée par prompt_id.
+Les prompts absents de cette liste sont cherchés dans /queue puis un par un dans /history ;
+un prompt présent dans aucun des deux a été perdu par ComfyUI (redémarrage) et son exécution échoue
+"""
+
+
+def _default_listing(max_items, address):
+    from cy6_websocket_api_client import get_history_listing
+
+    return get_history_listing(max_items, address)
+
+
+def _default_history(comfyui_prompt_id, address):
+    from cy6_websocket_api_client import get_history
+
+    return get_history(comfyui_prompt_id, address).get(comfyui_prompt_id)
+
+
+def _default_queued(address):
+    from cy6_websocket_api_client import get_queue
+
+    queue = get_queue(address)
+    # Entrées [numéro, prompt_id, prompt, extra_data, sorties]
+    return {
+        entry[1] for key in ("queue_running", "queue_pending") for entry in queue.get(key) or [] if len(entry) > 1
+    }
+
+
+def _default_outputs(comfyui_prompt_id, history, address):
+    from cy6_websocket_api_client import fetch_history_outputs
+
+    return fetch_history_outputs(comfyui_prompt_id, history, address)
+
+
+def _default_outcome(history):
+    from cy6_websocket_api_client import history_outcome
+
+    return history_outcome(history)
+
+
+class cy8_history_reconciler:
+    """Clôture des exécutions en attente à partir de la liste /history de chaque backend"""
+
+    # Entrées demandées par requête (les plus récentes), au moins autant que d'exécutions en attente
+    MAX_ITEMS = 200
+    LOST_MESSAGE = "Prompt perdu par ComfyUI (absent de /history et de /queue)"
+
+    def __init__(
+        self,
+        db_manager,
+        fetch_listing=None,
+        fetch_outputs=None,
+        outcome=None,
+        max_items=None,
+        fetch_history=None,
+        fetch_queued=None,
+    ):
+        """
+        fetch_listing(max_items, adresse) -> {prompt_id: entrée /history}
+        fetch_outputs(prompt_id, entrée, adresse) -> chemins des images sur le disque
+        outcome(entrée) -> (issue, message)
+        fetch_history(prompt_id, adresse) -> entrée /history du prompt ou None
+        fetch_queued(adresse) -> IDs des prompts en file ou en cours (/queue)
+        """
+        self.db_manager = db_manager
+        self.fetch_listing = fetch_listing or _default_listing
+        self.fetch_outputs = fetch_outputs or _default_outputs
+        self.outcome = outcome or _default_outcome
+        self.max_items = max_items or self.MAX_ITEMS
+        self.fetch_history = fetch_history or _default_history
+        self.fetch_queued = fetch_queued or _default_queued
+
+    def reconcile(self):
+        """
+        Résoudre les exécutions terminées chez ComfyUI.
+        Retourne [{"execution_id", "prompt_id", "status", "message", "outputs"}] des exécutions clôturées ;
+        un backend injoignable est ignoré jusqu'au passage suivant
+        """
+        pending_by_backend = {}
+        for execution_id, prompt_id, comfyui_prompt_id, backend in self.db_manager.get_pending_executions():
+            pending_by_backend.setdefault(backend, []).append((execution_id, prompt_id, comfyui_prompt_id))
+
+        resolved = []
+        for backend, pending in pending_by_backend.items():
+            try:
+                listing = dict(self.fetch_listing(max(self.max_items, len(pending)), backend))
+                missing = [entry for entry in pending if entry[2] not in listing]
+                # File lue avant les historiques individuels: un prompt qui termine entre les deux est dans /history
+                queued = self.fetch_queued(backend) if missing else set()
+                for _, _, comfyui_prompt_id in missing:
+                    if comfyui_prompt_id not in queued:
+                        listing[comfyui_prompt_id] = self.fetch_history(comfyui_prompt_id, backend)
+            except Exception as e:
+                print(f"DEBUG: Réconciliation impossible avec {backend or 'le backend par défaut'}: {e}")
+                continue
+            for execution_id, prompt_id, comfyui_prompt_id in pending:
+                if comfyui_prompt_id not in listing:
+                    continue  # Encore en file ou en cours
+                history = listing[comfyui_prompt_id]
+                if history is None:
+                    # Ni dans /history ni dans /queue: ComfyUI a redémarré sans l'exécuter
+                    outcome, message = "error", self.LOST_MESSAGE
+                else:
+                    outcome, message = self.outcome(history)
+                outputs = []
+                if outcome == "success":
+                    try:
+                        outputs = self.fetch_outputs(comfyui_prompt_id, history, backend)
+                    except Exception as e:
+                        outcome, message = "error", f"Erreur images: {e}"
+                status = "ok" if outcome == "success" else outcome
+                message = f"{message} (réconcilié)"
+                if self.db_manager.finish_execution_record(execution_id, status, message, comfyui_prompt_id, outputs):
+                    resolved.append(
+                        {
+                            "execution_id": execution_id,
+                            "prompt_id": prompt_id,
+                            "status": status,
+                            "message": message,
+                            "outputs": outputs,
+                        }
+                    )
+        return resolved
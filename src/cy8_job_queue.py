@@ -0,0 +1,279 @@
+"""
+File d'exécutions persistante - Version cy8
+Chaque exécution demandée est un travail de la table execution_jobs
+(pending -> submitted -> running -> done / failed / cancelled) : la file survit à la fermeture
+de l'application et les travaux déjà soumis à ComfyUI sont repris au démarrage.
+Les travaux de plus haute priorité sont pris en premier
+"""
+
+from cy8_execution_scheduler import cy8_execution_scheduler
+from cy6_backend_pool import PRIORITY_NORMAL
+
+JOB_COLUMNS = (
+    "execution_id, prompt_id, state, checkpoint, fixed_seeds, comfyui_prompt_id, backend, "
+    "attempts, message, created_at, updated_at, priority"
+)
+
+
+class cy8_job_queue:
+    """Travaux d'exécution persistés dans la base des prompts"""
+
+    PENDING = "pending"
+    SUBMITTED = "submitted"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+    ACTIVE_STATES = (SUBMITTED, RUNNING)
+    OPEN_STATES = (PENDING, SUBMITTED, RUNNING)
+
+    def __init__(self, db_manager, max_skips=None):
+        """max_skips: borne de famine du regroupement par checkpoint des travaux en attente"""
+        self.db_manager = db_manager
+        self.max_skips = max_skips
+        self._table_ready = False
+        if db_manager.conn is not None:
+            with db_manager._lock:
+                self._ensure_table()
+
+    def _ensure_table(self):
+        """Créer la table des travaux (une seule fois, dès que la connexion est ouverte)"""
+        if self._table_ready:
+            return
+        self.db_manager.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS execution_jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                execution_id TEXT NOT NULL UNIQUE,
+                prompt_id INTEGER NOT NULL,
+                state TEXT NOT NULL DEFAULT 'pending',
+                checkpoint TEXT,
+                fixed_seeds INTEGER DEFAULT 0,
+                comfyui_prompt_id TEXT,
+                backend TEXT,
+                attempts INTEGER DEFAULT 0,
+                skips INTEGER DEFAULT 0,
+                message TEXT,
+                created_at TEXT,
+                updated_at TEXT,
+                priority INTEGER DEFAULT 1
+            )
+        """
+        )
+        columns = {row[1] for row in self.db_manager.conn.execute("PRAGMA table_info(execution_jobs)")}
+        if "priority" not in columns:
+            self.db_manager.conn.execute("ALTER TABLE execution_jobs ADD COLUMN priority INTEGER DEFAULT 1")
+        # (state, priority): plus ancien travail d'une priorité ; (state, priority, checkpoint): premier travail
+        # d'un checkpoint. Les deux rendent les lignes dans l'ordre des id (rowid en fin de clé)
+        self.db_manager.conn.execute("DROP INDEX IF EXISTS idx_execution_jobs_state")
+        self.db_manager.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_execution_jobs_priority ON execution_jobs(state, priority)"
+        )
+        self.db_manager.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_execution_jobs_claim ON execution_jobs(state, priority, checkpoint)"
+        )
+        self.db_manager.conn.commit()
+        self._table_ready = True
+
+    def _update(self, execution_id, assignments, params=()):
+        return self._update_where(execution_id, assignments, "1", params)
+
+    def _update_where(self, execution_id, assignments, condition, params=()):
+        with self.db_manager._lock:
+            self._ensure_table()
+            cursor = self.db_manager.conn.execute(
+                f"UPDATE execution_jobs SET {assignments}, updated_at=? WHERE execution_id=? AND {condition}",
+                (*params, self.db_manager.now(), execution_id),
+            )
+            self.db_manager.conn.commit()
+            return cursor.rowcount
+
+    # === Cycle de vie ===
+
+    def enqueue(self, prompt_id, execution_id, checkpoint=None, fixed_seeds=False, priority=PRIORITY_NORMAL):
+        """Ajouter un travail en attente (priority: voir cy6_backend_pool.PRIORITY_*)"""
+        now = self.db_manager.now()
+        with self.db_manager._lock:
+            self._ensure_table()
+            self.db_manager.conn.execute(
+                "INSERT INTO execution_jobs "
+                "(execution_id, prompt_id, state, checkpoint, fixed_seeds, priority, created_at, updated_at) "
+                "VALUES (?, ?, 'pending', ?, ?, ?, ?, ?)",
+                (execution_id, prompt_id, checkpoint or "", int(bool(fixed_seeds)), priority, now, now),
+            )
+            self.db_manager.conn.commit()
+        return execution_id
+
+    def claim_next(self, loaded=None):
+        """
+        Prendre le prochain travail en attente de la plus haute priorité (regroupé par checkpoint,
+        même choix que cy8_execution_scheduler) et le passer à 'submitted'.
+        Requêtes indexées: seuls le plus ancien travail, le premier travail du checkpoint chargé et
+        un travail affamé qui le précède sont lus, quelle que soit la longueur de la file.
+        Retourne un dict du travail, ou None si la file est vide
+        """
+        max_skips = cy8_execution_scheduler.MAX_SKIPS if self.max_skips is None else self.max_skips
+        select = f"SELECT id, skips, checkpoint, {JOB_COLUMNS} FROM execution_jobs WHERE state='pending' AND priority=?"
+        with self.db_manager._lock:
+            self._ensure_table()
+            conn = self.db_manager.conn
+            priority = conn.execute("SELECT MAX(priority) FROM execution_jobs WHERE state='pending'").fetchone()[0]
+            if priority is None:
+                return None
+            chosen = conn.execute(select + " ORDER BY id LIMIT 1", (priority,)).fetchone()
+            # Le plus ancien passe s'il est affamé ou s'il n'impose pas de rechargement ; sinon le premier travail
+            # du checkpoint chargé, à moins qu'un travail affamé ne le précède
+            if loaded and chosen[1] < max_skips and (chosen[2] or "") not in ("", loaded):
+                match = conn.execute(select + " AND checkpoint=? ORDER BY id LIMIT 1", (priority, loaded)).fetchone()
+                if match is not None:
+                    starved = conn.execute(
+                        select + " AND id<? AND skips>=? ORDER BY id LIMIT 1", (priority, match[0], max_skips)
+                    ).fetchone()
+                    chosen = starved or match
+            job = self._as_dict(chosen[3:])
+            # Les travaux plus anciens dépassés le restent en mémoire d'une prise à l'autre (borne de famine)
+            conn.execute(
+                "UPDATE execution_jobs SET skips=skips+1 WHERE state='pending' AND priority=? AND id<?",
+                (job["priority"], chosen[0]),
+            )
+            conn.execute(
+                "UPDATE execution_jobs SET state='submitted', attempts=attempts+1, updated_at=? WHERE id=?",
+                (self.db_manager.now(), chosen[0]),
+            )
+            conn.commit()
+        job["state"] = self.SUBMITTED
+        return job
+
+    def mark_submitted(self, execution_id, comfyui_prompt_id, backend=None):
+        """
+        Travail accepté par ComfyUI (ID et backend conservés pour la reprise).
+        Une annulation arrivée pendant la soumission est conservée: retourne False, le prompt est à annuler
+        """
+        assignments = "state='submitted', comfyui_prompt_id=?, backend=?"
+        return self._update_where(execution_id, assignments, "state != 'cancelled'", (comfyui_prompt_id, backend)) > 0
+
+    def mark_running(self, execution_id):
+        """Exécution commencée chez ComfyUI"""
+        self._update(execution_id, "state='running'")
+
+    def requeue(self, execution_id):
+        """
+        Remettre en attente un travail pris mais jamais accepté par ComfyUI (backends indisponibles) ;
+        son enregistrement d'exécution sera recréé à la reprise. False si le travail n'est plus dans ce cas
+        """
+        with self.db_manager._lock:
+            self._ensure_table()
+            conn = self.db_manager.conn
+            requeued = conn.execute(
+                "UPDATE execution_jobs SET state='pending', updated_at=? "
+                "WHERE execution_id=? AND state='submitted' AND comfyui_prompt_id IS NULL",
+                (self.db_manager.now(), execution_id),
+            ).rowcount
+            if requeued:
+                conn.execute(
+                    "DELETE FROM prompt_executions WHERE execution_id=? AND status='running' "
+                    "AND comfyui_prompt_id IS NULL",
+                    (execution_id,),
+                )
+            conn.commit()
+        return requeued > 0
+
+    def cancel_pending(self, execution_id):
+        """Annuler un travail encore en attente (False s'il a déjà été pris)"""
+        return self._update_where(execution_id, "state='cancelled', message='Annulé'", "state='pending'") > 0
+
+    def mark_cancelled(self, execution_id):
+        """Travail actif annulé chez ComfyUI (retiré de sa file ou interrompu)"""
+        active = "state IN ('submitted', 'running')"
+        return self._update_where(execution_id, "state='cancelled', message='Annulé'", active) > 0
+
+    def is_cancelled(self, execution_id):
+        job = self.get_job(execution_id)
+        return job is not None and job["state"] == self.CANCELLED
+
+    def set_priority(self, execution_id, priority):
+        """Changer la priorité d'un travail en attente (False s'il a déjà été pris)"""
+        return self._update_where(execution_id, "priority=?", "state='pending'", (priority,)) > 0
+
+    def sync_with_executions(self):
+        """Clôturer les travaux dont l'exécution a été clôturée (suivi direct ou réconciliation /history)"""
+        with self.db_manager._lock:
+            self._ensure_table()
+            cursor = self.db_manager.conn.execute(
+                """
+                UPDATE execution_jobs SET
+                    state = (SELECT CASE e.status WHEN 'ok' THEN 'done'
+                                                  WHEN 'interrupted' THEN 'cancelled' ELSE 'failed' END
+                             FROM prompt_executions e WHERE e.execution_id = execution_jobs.execution_id),
+                    message = (SELECT e.message FROM prompt_executions e
+                               WHERE e.execution_id = execution_jobs.execution_id),
+                    updated_at = ?
+                WHERE state IN ('submitted', 'running')
+                  AND EXISTS (SELECT 1 FROM prompt_executions e
+                              WHERE e.execution_id = execution_jobs.execution_id AND e.status != 'running')
+            """,
+                (self.db_manager.now(),),
+            )
+            self.db_manager.conn.commit()
+            return cursor.rowcount
+
+    def recover(self):
+        """
+        Au démarrage: un travail pris mais jamais accepté par ComfyUI repart en attente ;
+        les travaux acceptés restent actifs (clôturés par la réconciliation /history).
+        Retourne (travaux remis en attente, travaux suivis chez ComfyUI)
+        """
+        self.sync_with_executions()
+        with self.db_manager._lock:
+            self._ensure_table()
+            conn = self.db_manager.conn
+            requeued = conn.execute(
+                "UPDATE execution_jobs SET state='pending', updated_at=? "
+                "WHERE state IN ('submitted', 'running') AND comfyui_prompt_id IS NULL",
+                (self.db_manager.now(),),
+            ).rowcount
+            # La tentative interrompue n'a jamais atteint ComfyUI: son enregistrement sera recréé à la reprise
+            conn.execute(
+                "DELETE FROM prompt_executions WHERE status='running' AND comfyui_prompt_id IS NULL "
+                "AND execution_id IN (SELECT execution_id FROM execution_jobs WHERE state='pending')"
+            )
+            tracked = conn.execute(
+                "SELECT COUNT(*) FROM execution_jobs WHERE state IN ('submitted', 'running')"
+            ).fetchone()[0]
+            conn.commit()
+        return requeued, tracked
+
+    # === Consultation ===
+
+    @staticmethod
+    def _as_dict(row):
+        return dict(zip([column.strip() for column in JOB_COLUMNS.split(",")], row))
+
+    def get_job(self, execution_id):
+        with self.db_manager._lock:
+            self._ensure_table()
+            row = self.db_manager.conn.execute(
+                f"SELECT {JOB_COLUMNS} FROM execution_jobs WHERE execution_id=?", (execution_id,)
+            ).fetchone()
+        return self._as_dict(row) if row else None
+
+    def list_jobs(self, states=None, limit=None):
+        """Travaux (tous, ou dans les états donnés), plus ancien en premier ; limit: nombre maximal"""
+        query = f"SELECT {JOB_COLUMNS} FROM execution_jobs"
+        params = ()
+        if states:
+            query += f" WHERE state IN ({', '.join('?' for _ in states)})"
+            params = tuple(states)
+        query += " ORDER BY id"
+        if limit:
+            query += " LIMIT ?"
+            params += (limit,)
+        with self.db_manager._lock:
+            self._ensure_table()
+            rows = self.db_manager.conn.execute(query, params).fetchall()
+        return [self._as_dict(row) for row in rows]
+
+    def count_by_state(self):
+        with self.db_manager._lock:
+            self._ensure_table()
+            return dict(self.db_manager.conn.execute("SELECT state, COUNT(*) FROM execution_jobs GROUP BY state"))
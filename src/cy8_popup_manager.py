@@ -59,16 +59,15 @@ class cy8_popup_manager:
         status_var = tk.StringVar(value="new")
 
         if mode == "edit" and prompt_id:
-            data = self.db_manager.get_prompt_by_id(prompt_id)
-            if data:
-                name, prompt_values, workflow, url, model, comment, status = data
-                name_var.set(name or "")
-                url_var.set(url or "")
-                prompt_values_var = prompt_values or "{}"
-                workflow_var = workflow or "{}"
-                model_var.set(model or "")
-                comment_var.set(comment or "")
-                status_var.set(status or "new")
+            prompt = self.db_manager.get_prompt_by_id(prompt_id)
+            if prompt:
+                name_var.set(prompt.name or "")
+                url_var.set(prompt.url or "")
+                prompt_values_var = prompt.prompt_values or "{}"
+                workflow_var = prompt.workflow or "{}"
+                model_var.set(prompt.model or "")
+                comment_var.set(prompt.comment or "")
+                status_var.set(prompt.status or "new")
         else:
             default_prompt_values = {
                 "1": {
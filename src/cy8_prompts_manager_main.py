@@ -4,17 +4,47 @@ import threading
 import time
 import os
 import json
+from concurrent.futures import ThreadPoolExecutor
 from cy8_database_manager import cy8_database_manager
+from cy8_archive_manager import cy8_archive_manager
+from cy8_db_maintenance import cy8_database_maintenance
+from cy8_db_backup import cy8_database_backup
 from cy8_popup_manager import cy8_popup_manager
 from cy8_editable_tables import cy8_editable_tables
 from cy8_user_preferences import cy8_user_preferences
 from cy8_paths import normalize_path, ensure_dir, get_default_db_path, cy8_paths_manager
 from cy6_wkf001_Basic import comfyui_basic_task
+from cy6_execution_progress import comfyui_execution_progress
+from cy6_node_timings import format_node_timings
+from cy8_sweep_engine import cy8_sweep_engine
+from cy6_backend_pool import comfyui_backend_pool, is_connection_error, PRIORITY_LOW, PRIORITY_NORMAL, PRIORITY_URGENT
+from cy6_websocket_api_client import update_workflow, cancel_prompt
+from cy6_object_info import get_object_info_cache
+from cy8_result_cache import cy8_result_cache, workflow_hash, pin_seeds
+from cy8_history_reconciler import cy8_history_reconciler
+from cy8_job_queue import cy8_job_queue
 
 
 class cy8_prompts_manager:
     """Gestionnaire principal des prompts - Version cy8 refactorisée"""
 
+    # Maintenance de la base: première passe peu après le démarrage, puis périodique
+    MAINTENANCE_STARTUP_DELAY_MS = 60 * 1000
+    MAINTENANCE_INTERVAL_MS = 30 * 60 * 1000
+    # Réconciliation des exécutions en attente avec /history (reprise après redémarrage ou coupure)
+    RECONCILE_STARTUP_DELAY_MS = 5 * 1000
+    RECONCILE_INTERVAL_MS = 30 * 1000
+    # Attente du répartiteur de la file quand elle est vide ou que les backends sont pleins
+    JOB_POLL_S = 5
+    # Rafraîchissement de la vue de la file (onglet Exécutions) et nombre de travaux affichés
+    JOB_VIEW_REFRESH_MS = 3 * 1000
+    JOB_VIEW_LIMIT = 200
+    PRIORITY_LABELS = {PRIORITY_LOW: "basse", PRIORITY_NORMAL: "normale", PRIORITY_URGENT: "urgente"}
+    # Délai maximal d'une exécution ComfyUI (fin signalée par WebSocket)
+    EXECUTION_TIMEOUT_S = 300
+    # Réveil de l'attente pour détecter une exécution sans événement
+    PROGRESS_TICK_S = 5
+
     def __init__(self, root=None, db_path=None, mode="dev"):
         self.root = root or tk.Tk()
 
@@ -36,6 +66,23 @@ class cy8_prompts_manager:
 
         # Gestionnaires
         self.db_manager = cy8_database_manager(self.db_path)
+        self.archive_manager = cy8_archive_manager(self.db_manager)
+        self.result_cache = cy8_result_cache(self.db_manager)
+        self.backend_pool = comfyui_backend_pool.from_env()
+        self.db_maintenance = cy8_database_maintenance(self.db_manager)
+        self._maintenance_job = None
+        self.history_reconciler = cy8_history_reconciler(self.db_manager)
+        self._reconcile_job = None
+        self.job_queue = cy8_job_queue(self.db_manager)
+        self._job_wakeup = threading.Event()
+        # Exécutions bornées: au plus max_concurrency par backend, quel que soit le nombre de travaux en file
+        self.job_executor = ThreadPoolExecutor(
+            max_workers=self.backend_pool.max_concurrency * len(self.backend_pool.backends),
+            thread_name_prefix="cy8-exec",
+        )
+        self._jobs_lock = threading.Lock()
+        self._jobs_in_flight = 0
+        self._job_view_refresh = None
         self.popup_manager = cy8_popup_manager(self.root, self.db_manager)
         self.table_manager = cy8_editable_tables(self.root, self.popup_manager)
 
@@ -64,6 +111,10 @@ class cy8_prompts_manager:
         self.db_manager.init_database(mode)
         self.load_prompts()
         self.update_database_stats()
+        self.schedule_database_maintenance(self.MAINTENANCE_STARTUP_DELAY_MS)
+        self.schedule_history_reconciliation(self.RECONCILE_STARTUP_DELAY_MS)
+        threading.Thread(target=self._job_worker, daemon=True, name="cy8-jobs").start()
+        self.refresh_job_queue_view()
 
     def init_images_paths(self):
         """Initialiser le chemin du répertoire d'images depuis le fichier .env"""
@@ -167,6 +218,18 @@ class cy8_prompts_manager:
         exec_menu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="Exécution", menu=exec_menu)
         exec_menu.add_command(label="Exécuter prompt", command=self.execute_workflow)
+        exec_menu.add_command(
+            label="Exécuter en urgence", command=lambda: self.execute_workflow(priority=PRIORITY_URGENT)
+        )
+        exec_menu.add_command(label="Balayage de paramètres...", command=self.open_sweep_dialog)
+        exec_menu.add_separator()
+        # Graines fixes: workflow reproductible, résultats identiques repris du cache
+        self.fixed_seeds_var = tk.BooleanVar(value=bool(self.user_prefs.get_preference("fixed_seeds", False)))
+        exec_menu.add_checkbutton(
+            label="Graines fixes (réutiliser les résultats)",
+            variable=self.fixed_seeds_var,
+            command=lambda: self.user_prefs.set_preference("fixed_seeds", self.fixed_seeds_var.get()),
+        )
         exec_menu.add_command(label="Analyser prompt", command=self.open_prompt_analysis)
 
     def setup_ribbon(self):
@@ -245,6 +308,15 @@ class cy8_prompts_manager:
             width=16
         ).grid(row=1, column=0, columnspan=2, sticky="ew", pady=1)
 
+        # Balayage de paramètres (grille)
+        ttk.Button(
+            exec_buttons_frame,
+            text="🧪 Balayage",
+            command=self.open_sweep_dialog,
+            style="RibbonButton.TButton",
+            width=16
+        ).grid(row=2, column=0, columnspan=2, sticky="ew", pady=1)
+
         # Séparateur vertical
         ttk.Separator(main_ribbon, orient="vertical").pack(side="left", fill="y", padx=5)
 
@@ -577,7 +649,8 @@ class cy8_prompts_manager:
         info_frame = ttk.Frame(test_frame)
         info_frame.pack(fill="x", pady=(0, 20))
 
-        server_info = os.getenv("COMFYUI_SERVER", "127.0.0.1:8188")
+        # Tous les backends du pool (COMFYUI_SERVERS), le test porte sur COMFYUI_SERVER
+        server_info = ", ".join(backend.address for backend in self.backend_pool.backends)
         ttk.Label(info_frame, text="Serveur:", font=("TkDefaultFont", 9, "bold")).pack(side="left")
         ttk.Label(info_frame, text=server_info, font=("Consolas", 9)).pack(side="left", padx=(10, 0))
 
@@ -776,6 +849,56 @@ class cy8_prompts_manager:
 
         images_frame.grid_columnconfigure(0, weight=1)
 
+        # Archive des prompts anciens (nok/test)
+        archive_frame = ttk.LabelFrame(data_frame, text="Archive des prompts", padding="10")
+        archive_frame.pack(fill="x", pady=(0, 20))
+
+        archive_actions = ttk.Frame(archive_frame)
+        archive_actions.pack(fill="x")
+
+        self.archive_info_var = tk.StringVar()
+        ttk.Label(archive_actions, textvariable=self.archive_info_var).pack(side="left")
+
+        ttk.Button(
+            archive_actions,
+            text="Archiver nok/test anciens",
+            command=self.archive_old_prompts,
+        ).pack(side="right")
+
+        archive_search = ttk.Frame(archive_frame)
+        archive_search.pack(fill="x", pady=(10, 0))
+
+        self.archive_search_var = tk.StringVar()
+        ttk.Entry(archive_search, textvariable=self.archive_search_var, width=40).pack(side="left")
+        ttk.Button(archive_search, text="Rechercher (archive incluse)", command=self.search_archived_prompts).pack(
+            side="left", padx=(10, 0)
+        )
+        ttk.Button(archive_search, text="Restaurer", command=self.restore_selected_archived).pack(side="right")
+
+        self.archive_results_listbox = tk.Listbox(archive_frame, height=5)
+        self.archive_results_listbox.pack(fill="x", pady=(10, 0))
+        self.archive_results = []
+
+        # Maintenance automatique (optimize, compactage, intégrité)
+        maintenance_frame = ttk.LabelFrame(data_frame, text="Maintenance de la base", padding="10")
+        maintenance_frame.pack(fill="x", pady=(0, 20))
+
+        self.maintenance_text = tk.StringVar()
+        ttk.Label(maintenance_frame, textvariable=self.maintenance_text, justify="left").pack(side="left", anchor="w")
+        ttk.Button(
+            maintenance_frame,
+            text="Lancer la maintenance",
+            command=self.run_database_maintenance,
+        ).pack(side="right")
+
+        # Sauvegardes en ligne (instantanés avec rotation)
+        backup_frame = ttk.LabelFrame(data_frame, text="Sauvegardes", padding="10")
+        backup_frame.pack(fill="x", pady=(0, 20))
+
+        self.backup_info_var = tk.StringVar()
+        ttk.Label(backup_frame, textvariable=self.backup_info_var, justify="left").pack(side="left", anchor="w")
+        ttk.Button(backup_frame, text="Sauvegarder maintenant", command=self.backup_database).pack(side="right")
+
         # Statistiques
         stats_frame = ttk.LabelFrame(data_frame, text="Statistiques", padding="10")
         stats_frame.pack(fill="x")
@@ -846,6 +969,43 @@ class cy8_prompts_manager:
         tree_frame.grid_rowconfigure(0, weight=1)
         tree_frame.grid_columnconfigure(0, weight=1)
 
+        # File d'attente persistante: travaux en attente ou confiés à ComfyUI
+        queue_frame = ttk.LabelFrame(exec_frame, text="File d'attente", padding="10")
+        queue_frame.pack(fill="x", pady=(10, 0))
+
+        self.job_queue_text = tk.StringVar(value="File vide")
+        ttk.Label(queue_frame, textvariable=self.job_queue_text).pack(anchor="w", pady=(0, 5))
+
+        queue_controls = ttk.Frame(queue_frame)
+        queue_controls.pack(fill="x", pady=(0, 5))
+        ttk.Button(queue_controls, text="Annuler", command=self.cancel_selected_job).pack(side="left")
+        ttk.Button(
+            queue_controls, text="Urgent", command=lambda: self.set_selected_job_priority(PRIORITY_URGENT)
+        ).pack(side="left", padx=(5, 0))
+        ttk.Button(
+            queue_controls, text="Priorité normale", command=lambda: self.set_selected_job_priority(PRIORITY_NORMAL)
+        ).pack(side="left", padx=(5, 0))
+
+        queue_columns = ("id", "prompt", "state", "priority", "checkpoint", "created")
+        self.job_queue_tree = ttk.Treeview(queue_frame, columns=queue_columns, show="headings", height=5)
+        self.job_queue_tree.heading("id", text="ID Exécution")
+        self.job_queue_tree.heading("prompt", text="Nom du Prompt")
+        self.job_queue_tree.heading("state", text="État")
+        self.job_queue_tree.heading("priority", text="Priorité")
+        self.job_queue_tree.heading("checkpoint", text="Checkpoint")
+        self.job_queue_tree.heading("created", text="Ajouté à")
+        self.job_queue_tree.column("id", width=150)
+        self.job_queue_tree.column("prompt", width=200)
+        self.job_queue_tree.column("state", width=100)
+        self.job_queue_tree.column("priority", width=80)
+        self.job_queue_tree.column("checkpoint", width=200)
+        self.job_queue_tree.column("created", width=150)
+
+        queue_scrollbar = ttk.Scrollbar(queue_frame, orient="vertical", command=self.job_queue_tree.yview)
+        self.job_queue_tree.configure(yscrollcommand=queue_scrollbar.set)
+        self.job_queue_tree.pack(side="left", fill="x", expand=True)
+        queue_scrollbar.pack(side="right", fill="y")
+
         # Frame pour les détails de l'exécution sélectionnée
         details_frame = ttk.LabelFrame(exec_frame, text="Détails de l'exécution", padding="10")
         details_frame.pack(fill="both", expand=True, pady=(10, 0))
@@ -854,7 +1014,10 @@ class cy8_prompts_manager:
         details_text_frame = ttk.Frame(details_frame)
         details_text_frame.pack(fill="both", expand=True)
 
-        self.execution_details = tk.Text(details_text_frame, height=12, wrap="word", state="disabled")
+        # Police à chasse fixe: tableau des durées par node
+        self.execution_details = tk.Text(
+            details_text_frame, height=12, wrap="word", state="disabled", font=("Consolas", 9)
+        )
         details_scrollbar = ttk.Scrollbar(details_text_frame, orient="vertical", command=self.execution_details.yview)
         self.execution_details.configure(yscrollcommand=details_scrollbar.set)
 
@@ -886,12 +1049,12 @@ class cy8_prompts_manager:
 
         try:
             prompts = self.db_manager.get_all_prompts()
-            for prompt_id, name, parent, model, workflow, status, comment in prompts:
+            for prompt in prompts:
                 self.prompts_tree.insert(
                     "",
                     "end",
-                    iid=str(prompt_id),
-                    values=(prompt_id, name, status, model, comment, parent or ""),
+                    iid=str(prompt.id),
+                    values=(prompt.id, prompt.name, prompt.status, prompt.model, prompt.comment, prompt.parent or ""),
                 )
 
             self.update_status(f"{len(prompts)} prompts chargés")
@@ -919,34 +1082,32 @@ class cy8_prompts_manager:
         1) Panel détaillé
         """
         try:
-            data = self.db_manager.get_prompt_by_id(prompt_id)
-            if data:
-                name, prompt_values, workflow, url, model, comment, status = data
-
+            prompt = self.db_manager.get_prompt_by_id(prompt_id)
+            if prompt:
                 # Mettre à jour les informations générales
-                self.name_var.set(name or "")
-                self.url_var.set(url or "")
-                self.comment_var.set(comment or "")
-                self.model_var.set(model or "")
-                self.status_var.set(status or "new")
+                self.name_var.set(prompt.name or "")
+                self.url_var.set(prompt.url or "")
+                self.comment_var.set(prompt.comment or "")
+                self.model_var.set(prompt.model or "")
+                self.status_var.set(prompt.status or "new")
 
                 # 1.1) Charger les prompt_values dans le tableau
-                self.table_manager.load_prompt_values_data(self.values_tree, prompt_values or "{}")
+                self.table_manager.load_prompt_values_data(self.values_tree, prompt.prompt_values or "{}")
 
                 # 1.2) Charger le workflow dans le tableau
-                self.table_manager.load_workflow_data(self.workflow_tree, workflow or "{}")
+                self.table_manager.load_workflow_data(self.workflow_tree, prompt.workflow or "{}")
 
-                self.update_status(f"Prompt '{name}' chargé")
+                self.update_status(f"Prompt '{prompt.name}' chargé")
 
                 # Mettre à jour les détails dans l'onglet Détails
                 if hasattr(self, "id_label"):
                     self.id_label.config(text=str(prompt_id))
                 if hasattr(self, "name_label"):
-                    self.name_label.config(text=name or "")
+                    self.name_label.config(text=prompt.name or "")
                 if hasattr(self, "model_label"):
-                    self.model_label.config(text=model or "")
+                    self.model_label.config(text=prompt.model or "")
                 if hasattr(self, "status_label"):
-                    self.status_label.config(text=status or "")
+                    self.status_label.config(text=prompt.status or "")
                 if hasattr(self, "parent_label"):
                     self.parent_label.config(text=parent or "")
 
@@ -1058,29 +1219,27 @@ class cy8_prompts_manager:
 
         try:
             # Récupérer les données du prompt parent
-            data = self.db_manager.get_prompt_by_id(self.selected_prompt_id)
-            if not data:
+            parent_prompt = self.db_manager.get_prompt_by_id(self.selected_prompt_id)
+            if not parent_prompt:
                 messagebox.showerror("Erreur", "Impossible de récupérer les données du prompt.")
                 return
 
-            name, prompt_values, workflow, url, model, comment, status = data
-
             # Générer un nouveau nom
-            new_name = f"{name}_herite"
+            new_name = f"{parent_prompt.name}_herite"
             counter = 1
             while self.db_manager.prompt_name_exists(new_name):
-                new_name = f"{name}_herite_{counter}"
+                new_name = f"{parent_prompt.name}_herite_{counter}"
                 counter += 1
 
             # Créer le nouveau prompt avec parent
             new_id = self.db_manager.create_prompt(
                 new_name,
-                prompt_values,
-                workflow,
-                url,
-                model,
+                parent_prompt.prompt_values,
+                parent_prompt.workflow,
+                parent_prompt.url,
+                parent_prompt.model,
                 "new",
-                f"Hérité de: {name}",
+                f"Hérité de: {parent_prompt.name}",
                 parent=self.selected_prompt_id,
             )
 
@@ -1167,9 +1326,10 @@ class cy8_prompts_manager:
             except Exception as e:
                 messagebox.showerror("Erreur", f"Erreur lors de la suppression: {e}")
 
-    def execute_workflow(self):
+    def execute_workflow(self, priority=PRIORITY_NORMAL):
         """
         0.6) Exécuter le workflow - Fonction initiale: execute_workflow
+        priority: PRIORITY_URGENT passe devant les travaux en attente et les balayages
         """
         if not self.selected_prompt_id:
             messagebox.showwarning("Attention", "Sélectionnez un prompt à exécuter.")
@@ -1178,207 +1338,655 @@ class cy8_prompts_manager:
         # Simulation d'exécution (à adapter selon l'implémentation originale)
         try:
             # Récupérer les données
-            data = self.db_manager.get_prompt_by_id(self.selected_prompt_id)
-            if not data:
+            prompt = self.db_manager.get_prompt_by_id(self.selected_prompt_id)
+            if not prompt:
                 messagebox.showerror("Erreur", "Impossible de récupérer les données du prompt.")
                 return
 
-            name, prompt_values, workflow, url, model, comment, status = data
+            name = prompt.name
 
-            # Ajouter à la pile d'exécution
-            execution_id = f"exec_{int(time.time())}"
-            self.add_to_execution_stack(execution_id, "Initialisation", name, 10)
-
-            # Créer un thread pour l'exécution
-            thread = threading.Thread(
-                target=self._execute_workflow_task,
-                args=(self.selected_prompt_id, execution_id),
+            # File persistante: le travail survit à la fermeture de l'application
+            execution_id = f"exec_{int(time.time() * 1000)}"
+            self.job_queue.enqueue(
+                self.selected_prompt_id,
+                execution_id,
+                self.db_manager.prompt_checkpoint(prompt),
+                self.fixed_seeds_var.get(),
+                priority,
             )
-            thread.daemon = True
-            thread.start()
+            self.add_to_execution_stack(execution_id, "En attente", name, 5)
+            self._job_wakeup.set()
+            self.refresh_job_queue_view()
 
-            self.update_status(f"Exécution démarrée pour: {name}")
+            self.update_status(f"Exécution mise en file pour: {name}")
 
         except Exception as e:
             messagebox.showerror("Erreur", f"Erreur lors du démarrage de l'exécution: {e}")
 
-    def _execute_workflow_task(self, prompt_id, execution_id):
-        """Tâche d'exécution du workflow (en thread séparé)"""
+    def open_sweep_dialog(self):
+        """
+        Balayage de paramètres sur le prompt sélectionné
+        POPUP-ID: CY8-POPUP-011
+        """
+        if not self.selected_prompt_id:
+            messagebox.showwarning("Attention", "Sélectionnez un prompt à balayer.")
+            return
+
+        prompt = self.db_manager.get_prompt_by_id(self.selected_prompt_id)
+        if not prompt:
+            messagebox.showerror("Erreur", "Impossible de récupérer les données du prompt.")
+            return
+        try:
+            values = json.loads(prompt.prompt_values or "{}")
+        except json.JSONDecodeError as e:
+            messagebox.showerror("Erreur", f"Valeurs du prompt invalides: {e}")
+            return
+
+        # Grille d'exemple: trois graines successives pour chaque valeur de type seed
+        example_grid = {
+            f"{key}.value": [entry.get("value", 0) + offset for offset in range(3)]
+            for key, entry in values.items()
+            if entry.get("type") == "seed" and isinstance(entry.get("value", 0), int)
+        }
+
+        # CY8-POPUP-011: Popup balayage de paramètres
+        popup = tk.Toplevel(self.root)
+        popup.title("CY8-POPUP-011 | Balayage de paramètres")
+        popup.transient(self.root)
+        popup.grab_set()
+
+        self.popup_manager.center_window(popup, 600, 450)
+
+        main_frame = ttk.Frame(popup, padding="20")
+        main_frame.pack(fill="both", expand=True)
+
+        # Identifiant popup en haut
+        ttk.Label(
+            main_frame,
+            text="CY8-POPUP-011",
+            font=("TkDefaultFont", 8, "bold"),
+            foreground="blue",
+        ).pack(anchor="e", pady=(0, 10))
+
+        ttk.Label(
+            main_frame,
+            text=f"Balayage de paramètres: {prompt.name}",
+            font=("TkDefaultFont", 12, "bold"),
+        ).pack(pady=(0, 10))
+
+        ttk.Label(
+            main_frame,
+            text='Grille JSON {"<clé>.<champ>": [valeurs]} sur les clés de prompt_values\n'
+            "(ex: seed × prompt × lora_name × KSampler.cfg) ; les graines non balayées restent fixes.",
+            justify="left",
+        ).pack(anchor="w", pady=(0, 5))
+
+        grid_text = tk.Text(main_frame, height=10, font=("Consolas", 10))
+        grid_text.pack(fill="both", expand=True, pady=(0, 10))
+        grid_text.insert("1.0", json.dumps(example_grid, indent=2, ensure_ascii=False))
+
+        workers_frame = ttk.Frame(main_frame)
+        workers_frame.pack(fill="x", pady=(0, 10))
+        ttk.Label(workers_frame, text="Variantes simultanées:").pack(side="left")
+        workers_var = tk.IntVar(value=cy8_sweep_engine.MAX_WORKERS * len(self.backend_pool.backends))
+        ttk.Spinbox(workers_frame, from_=1, to=16, textvariable=workers_var, width=5).pack(side="left", padx=(5, 0))
+
+        button_frame = ttk.Frame(main_frame)
+        button_frame.pack(fill="x")
+
+        def start_sweep():
+            try:
+                grid = json.loads(grid_text.get("1.0", tk.END))
+                if not isinstance(grid, dict) or not grid:
+                    raise ValueError("la grille doit être un objet JSON non vide")
+                workflow = json.loads(prompt.workflow or "{}")
+                max_workers = max(1, workers_var.get())
+            except (ValueError, tk.TclError) as e:
+                messagebox.showerror("Erreur", f"Grille invalide: {e}", parent=popup)
+                return
+            launch_button.config(state="disabled")
+            self.update_status("Balayage: validation des variantes")
+
+            def plan_worker():
+                # Sondage des backends et /object_info hors du thread Tk (backend lent ou injoignable)
+                try:
+                    self.backend_pool.refresh()
+                    healthy = self.backend_pool.healthy_backends()
+                    address = healthy[0].address if healthy else None
+                    engine = cy8_sweep_engine(
+                        self.db_manager,
+                        max_workers=max_workers,
+                        backend_pool=self.backend_pool,
+                        result_cache=self.result_cache,
+                        # Schéma /object_info d'un backend sain (les backends d'un pool partagent leurs nodes) ;
+                        # aucun backend sain: pas de validation locale, ComfyUI reste juge
+                        validator=lambda workflow: (
+                            get_object_info_cache().validate(workflow, address) if address else []
+                        ),
+                    )
+                    planned = engine.plan(workflow, values, grid)
+                except Exception as e:
+                    self.root.after(0, lambda error=e: confirm_sweep(None, grid, None, error))
+                    return
+                self.root.after(0, lambda: confirm_sweep(engine, grid, planned, None))
+
+            threading.Thread(target=plan_worker, daemon=True).start()
+
+        def confirm_sweep(engine, grid, planned, error):
+            if not popup.winfo_exists():
+                return
+            launch_button.config(state="normal")
+            if error is not None:
+                messagebox.showerror("Erreur", f"Grille invalide: {error}", parent=popup)
+                return
+            variants, duplicates = planned
+            invalid = [variant for variant in variants if variant[4]]
+            if len(invalid) == len(variants):
+                messagebox.showerror(
+                    "Erreur", "Workflow refusé par la validation:\n" + "\n".join(invalid[0][4][:10]), parent=popup
+                )
+                return
+            if not messagebox.askyesno(
+                "Confirmer",
+                f"Lancer {len(variants) - len(invalid)} variantes ({duplicates} doublons écartés, "
+                f"{len(invalid)} invalides) ?",
+                parent=popup,
+            ):
+                return
+            popup.destroy()
+            self.run_sweep(prompt.id, prompt.name, engine, grid)
+
+        launch_button = ttk.Button(button_frame, text="Lancer", command=start_sweep)
+        launch_button.pack(side="right", padx=(5, 0))
+        ttk.Button(button_frame, text="Annuler", command=popup.destroy).pack(side="right")
+
+    def run_sweep(self, prompt_id, prompt_name, engine, grid):
+        """Exécuter un balayage en thread, suivi dans la pile d'exécution"""
+        execution_id = f"sweep_{int(time.time())}"
+        self.add_to_execution_stack(execution_id, "Balayage: préparation", prompt_name, 5)
+
+        def progress(done, total, result):
+            message = f"Balayage: {done}/{total} variantes ({result['parameters']} -> {result['status']})"
+            self.root.after(
+                0, lambda: self.update_execution_stack_status(execution_id, message, max(5, int(done * 100 / total)))
+            )
+
+        def worker():
+            try:
+                summary = engine.run(prompt_id, grid, progress_callback=progress)
+                failed = sum(1 for result in summary["results"] if result["status"] != "ok")
+                message = (
+                    f"Balayage terminé: {summary['variants']} variantes, {failed} en échec, "
+                    f"{summary['duplicates']} doublons écartés, {summary['invalid']} invalides, "
+                    f"{summary['reloads']['reloads']} chargements de modèle "
+                    f"({summary['reloads']['saved']} évités par regroupement)"
+                )
+                progress_value = 100
+            except Exception as e:
+                message, progress_value = f"Balayage en erreur: {e}", 0
+            self.root.after(0, lambda: self.update_execution_stack_status(execution_id, message, progress_value))
+            self.root.after(0, lambda: self.update_status(message))
+
+        threading.Thread(target=worker, daemon=True).start()
+        self.update_status(f"Balayage démarré pour: {prompt_name}")
+
+    def _execute_workflow_task(
+        self, prompt_id, execution_id, fixed_seeds=False, priority=PRIORITY_NORMAL, db_manager=None, job_queue=None
+    ):
+        """
+        Tâche d'exécution du workflow (en thread séparé)
+        db_manager, job_queue: base et file du travail, fixées à sa prise en charge (changement de base en cours)
+        """
+        db_manager = db_manager or self.db_manager
+        job_queue = job_queue or self.job_queue
+        result_cache = self.result_cache if db_manager is self.db_manager else cy8_result_cache(db_manager)
         try:
             # Récupérer les données du prompt
-            data = self.db_manager.get_prompt_by_id(prompt_id)
-            if not data:
+            prompt = db_manager.get_prompt_by_id(prompt_id)
+            if not prompt:
                 self.update_execution_stack_status(execution_id, "Erreur: Prompt introuvable", 0)
+                self._finish_execution_record(execution_id, "error", "Prompt introuvable", db_manager=db_manager)
                 self.root.after(
                     0,
-                    lambda: self.update_prompt_status_after_execution(prompt_id, "nok"),
+                    lambda: self.update_prompt_status_after_execution(prompt_id, "nok", db_manager),
                 )
                 return
 
-            name, prompt_values_json, workflow_json, url, model, comment, status = data
+            name = prompt.name
+            prompt_values_json = prompt.prompt_values
+            workflow_json = prompt.workflow
 
             # Mettre à jour le statut
             self.update_execution_stack_status(execution_id, f"Préparation des données", 25)
 
-            # Créer le répertoire data/Workflows s'il n'existe pas
-            os.makedirs("data/Workflows", exist_ok=True)
-
-            # Générer des noms de fichiers uniques dans data/Workflows
-            timestamp = int(time.time())
-            workflow_file_path = f"data/Workflows/{name}_workflow_{timestamp}.json"
-            prompt_values_file_path = f"data/Workflows/{name}_values_{timestamp}.json"
-
-            # Écrire les fichiers directement dans data/Workflows
-            with open(workflow_file_path, "w", encoding="utf-8") as wf_file:
-                wf_file.write(workflow_json)
+            # Décoder le workflow et les valeurs en mémoire (plus de fichiers intermédiaires)
+            try:
+                workflow_data = json.loads(workflow_json)
+                print(f"DEBUG: Workflow JSON valide, {len(workflow_data)} nodes")
+                values_data = json.loads(prompt_values_json)
+                print(f"DEBUG: Values JSON valide, {len(values_data)} entrées")
+            except (json.JSONDecodeError, TypeError) as e:
+                self.update_execution_stack_status(execution_id, f"Erreur JSON: {e}", 0)
+                self._finish_execution_record(execution_id, "error", f"Erreur JSON: {e}", db_manager=db_manager)
+                return
 
-            with open(prompt_values_file_path, "w", encoding="utf-8") as pv_file:
-                pv_file.write(prompt_values_json)
+            # Graines fixes: le workflow patché est reproductible, un résultat identique est repris du cache
+            if fixed_seeds:
+                values_data = pin_seeds(values_data)
+                try:
+                    cached_paths = result_cache.lookup(workflow_hash(update_workflow(values_data, workflow_data)[0]))
+                except ValueError as e:
+                    print(f"DEBUG: Cache ignoré: {e}")
+                    cached_paths = None
+                if cached_paths is not None:
+                    self._finish_execution_record(
+                        execution_id,
+                        "ok",
+                        f"Résultat en cache - {len(cached_paths)} images",
+                        None,
+                        cached_paths,
+                        db_manager=db_manager,
+                    )
+                    self.update_execution_stack_status(
+                        execution_id, f"Terminé (cache) - {len(cached_paths)} images", 100
+                    )
+                    self.root.after(0, lambda: self.update_prompt_status_after_execution(prompt_id, "ok", db_manager))
+                    return
 
             # Mettre à jour le statut
             self.update_execution_stack_status(execution_id, f"Connexion à ComfyUI", 50)
 
-            # Vérifier les fichiers générés
-            print(f"DEBUG: Workflow file: {workflow_file_path}")
-            print(f"DEBUG: Values file: {prompt_values_file_path}")
-
-            # Vérifier le contenu JSON
+            # Backend ComfyUI: checkpoint déjà chargé ou file la plus courte
             try:
-                import json
-                with open(workflow_file_path, 'r', encoding='utf-8') as f:
-                    workflow_data = json.load(f)
-                    print(f"DEBUG: Workflow JSON valide, {len(workflow_data)} nodes")
-
-                with open(prompt_values_file_path, 'r', encoding='utf-8') as f:
-                    values_data = json.load(f)
-                    print(f"DEBUG: Values JSON valide, {len(values_data)} entrées")
-            except json.JSONDecodeError as e:
-                self.update_execution_stack_status(execution_id, f"Erreur JSON: {e}", 0)
-                return
-            except Exception as e:
-                self.update_execution_stack_status(execution_id, f"Erreur fichiers: {e}", 0)
+                backend = self.backend_pool.acquire(db_manager.prompt_checkpoint(prompt), priority=priority)
+            except RuntimeError as e:
+                # Backends arrêtés ou suspendus (disjoncteur): le travail attend leur retour en file
+                if job_queue.requeue(execution_id):
+                    self.update_execution_stack_status(execution_id, f"En attente: {e}", 5)
+                    return
+                self.update_execution_stack_status(execution_id, str(e), 0)
+                self._finish_execution_record(execution_id, "error", str(e), db_manager=db_manager)
                 return
-
-            # Exécuter le workflow avec ComfyUI
+            print(f"DEBUG: Exécution {execution_id} envoyée à {backend.address}")
+            backend_failed = False
             try:
-                from cy6_websocket_api_client import workflow_is_running
-                import time
+                # Annulé pendant l'attente d'une place sur un backend
+                if job_queue.is_cancelled(execution_id):
+                    self.update_execution_stack_status(execution_id, "Annulé", 0)
+                    self._finish_execution_record(execution_id, "interrupted", "Annulé", db_manager=db_manager)
+                    return
 
+                # Exécuter le workflow avec ComfyUI
                 tsk1 = comfyui_basic_task()
+                tsk1.server_address = backend.address
+                try:
+                    # Progression réelle (75% -> 95%) calculée depuis les événements du prompt
+                    def report_progress(percent, progress_message):
+                        self.root.after(
+                            0, lambda: self.update_execution_stack_status(execution_id, progress_message, percent)
+                        )
+
+                    progress = comfyui_execution_progress(workflow_data, report_progress)
+
+                    def on_event(message):
+                        if message.get("type") == "execution_start":
+                            job_queue.mark_running(execution_id)
+                        progress.on_event(message)
+
+                    # Étape 1: Ajout à la queue (50% -> 60%)
+                    self.update_execution_stack_status(execution_id, "Ajout à la queue ComfyUI", 60)
+                    comfyui_prompt_id = tsk1.addToQueue(
+                        workflow_data, values_data, on_event=on_event, dump_name=name
+                    )
+                    print(f"DEBUG: ComfyUI prompt ID: {comfyui_prompt_id}")
+                    db_manager.mark_execution_queued(execution_id, comfyui_prompt_id, backend.address)
+                    if not job_queue.mark_submitted(execution_id, comfyui_prompt_id, backend.address):
+                        # Annulé pendant la soumission: le prompt accepté par ComfyUI est retiré ou interrompu
+                        try:
+                            cancel_prompt(comfyui_prompt_id, backend.address)
+                        except Exception as e:
+                            print(f"DEBUG: Annulation ComfyUI impossible: {e}")
+                        self.update_execution_stack_status(execution_id, "Annulé", 0)
+                        self._finish_execution_record(
+                            execution_id, "interrupted", "Annulé", comfyui_prompt_id, db_manager=db_manager
+                        )
+                        return
 
-                # Étape 1: Ajout à la queue (50% -> 60%)
-                self.update_execution_stack_status(execution_id, "Ajout à la queue ComfyUI", 60)
-                comfyui_prompt_id = tsk1.addToQueue(workflow_file_path, prompt_values_file_path)
-                print(f"DEBUG: ComfyUI prompt ID: {comfyui_prompt_id}")
+                    # Étape 2: Workflow en queue (60% -> 75%)
+                    self.update_execution_stack_status(execution_id, f"En queue (ID: {comfyui_prompt_id})", 75)
+
+                    # Étape 3: Fin signalée par les événements WebSocket (plus de polling),
+                    # avec un réveil périodique pour signaler une exécution bloquée
+                    deadline = time.time() + self.EXECUTION_TIMEOUT_S
+                    outcome, message = tsk1.wait_for_completion(self.PROGRESS_TICK_S)
+                    while outcome == "timeout" and time.time() < deadline:
+                        if job_queue.is_cancelled(execution_id):
+                            # Annulé pendant la soumission ou retiré de la file ComfyUI (aucun événement de fin)
+                            try:
+                                cancel_prompt(comfyui_prompt_id, backend.address)
+                            except Exception as e:
+                                print(f"DEBUG: Annulation ComfyUI impossible: {e}")
+                            outcome, message = "interrupted", "Annulé"
+                            break
+                        progress.tick()
+                        outcome, message = tsk1.wait_for_completion(self.PROGRESS_TICK_S)
+                    if outcome == "timeout":
+                        message = f"Aucune fin signalée après {self.EXECUTION_TIMEOUT_S}s"
+                    tsk1.close()
+                    print(f"DEBUG: Workflow {comfyui_prompt_id} -> {outcome} ({message})")
+                    self._save_node_timings(execution_id, tsk1, db_manager=db_manager)
+
+                    if outcome == "timeout":
+                        self.update_execution_stack_status(execution_id, "Timeout - Workflow trop long", 0)
+                        self._finish_execution_record(
+                            execution_id, "timeout", message, comfyui_prompt_id, db_manager=db_manager
+                        )
+                        return
+                    if outcome == "disconnected":
+                        # Le prompt peut encore s'exécuter: la réconciliation /history clôturera l'exécution
+                        self.update_execution_stack_status(
+                            execution_id, "Connexion perdue - résultat attendu via l'historique ComfyUI", 75
+                        )
+                        return
+                    if outcome == "interrupted":
+                        self.update_execution_stack_status(execution_id, "Interrompu", 0)
+                        self._finish_execution_record(
+                            execution_id, "interrupted", message, comfyui_prompt_id, db_manager=db_manager
+                        )
+                        return
+                    if outcome != "success":
+                        self.update_execution_stack_status(execution_id, f"Erreur ComfyUI: {message}", 0)
+                        self._finish_execution_record(
+                            execution_id, "error", message, comfyui_prompt_id, db_manager=db_manager
+                        )
+                        self.root.after(
+                            0, lambda: self.update_prompt_status_after_execution(prompt_id, "nok", db_manager)
+                        )
+                        return
 
-                # Étape 2: Workflow en queue (60% -> 75%)
-                self.update_execution_stack_status(execution_id, f"En queue (ID: {comfyui_prompt_id})", 75)
+                    # Étape 4: Récupération des images (95% -> 100%)
+                    self.update_execution_stack_status(execution_id, "Récupération des images", 95)
 
-                # Étape 3: Génération en cours avec vérification progressive
-                max_wait_time = 300  # 5 minutes max
-                start_time = time.time()
-                progress_step = 75
-                check_count = 0
+                except Exception as comfy_error:
+                    print(f"DEBUG: Erreur ComfyUI: {comfy_error}")
+                    backend_failed = is_connection_error(comfy_error)
+                    self.update_execution_stack_status(execution_id, f"Erreur ComfyUI: {str(comfy_error)}", 0)
+                    self._finish_execution_record(
+                        execution_id, "error", f"Erreur ComfyUI: {comfy_error}", db_manager=db_manager
+                    )
+                    return
+                finally:
+                    tsk1.close()
 
-                while True:
-                    elapsed_time = time.time() - start_time
-                    check_count += 1
+                # Récupérer les images générées
+                try:
+                    output_images = tsk1.GetImages(comfyui_prompt_id)
+                except Exception as img_error:
+                    print(f"DEBUG: Erreur récupération images: {img_error}")
+                    self.update_execution_stack_status(execution_id, f"Erreur images: {str(img_error)}", 0)
+                    self._finish_execution_record(
+                        execution_id, "error", f"Erreur images: {img_error}", comfyui_prompt_id, db_manager=db_manager
+                    )
+                    return
 
-                    if elapsed_time > max_wait_time:
-                        self.update_execution_stack_status(execution_id, "Timeout - Workflow trop long", 0)
-                        print(f"DEBUG: Timeout après {elapsed_time:.1f}s pour prompt {comfyui_prompt_id}")
-                        return
+                self._finish_execution_record(
+                    execution_id,
+                    "ok",
+                    f"{len(output_images)} images",
+                    comfyui_prompt_id,
+                    output_images,
+                    db_manager=db_manager,
+                )
+                try:
+                    submitted_hash = workflow_hash(tsk1.last_workflow)
+                    db_manager.set_execution_hash(execution_id, submitted_hash)
+                    result_cache.store(submitted_hash, execution_id, output_images)
+                except Exception as e:
+                    print(f"DEBUG: Mise en cache impossible pour {execution_id}: {e}")
+                if output_images:
+                    self.update_execution_stack_status(
+                        execution_id, f"Terminé avec succès - {len(output_images)} images générées", 100
+                    )
+                    self.root.after(
+                        0,
+                        lambda: self.update_prompt_status_after_execution(prompt_id, "ok", db_manager),
+                    )
+                else:
+                    self.update_execution_stack_status(execution_id, "Terminé - Aucune image générée", 100)
+                    self.root.after(
+                        0,
+                        lambda: self.update_prompt_status_after_execution(prompt_id, "ok", db_manager),
+                    )
 
-                    # Mise à jour progressive du statut (75% -> 95%)
-                    if elapsed_time > 5:  # Après 5 secondes, on augmente le progrès
-                        progress_increment = min(20, int(elapsed_time / 10) * 5)  # 5% toutes les 10 secondes
-                        progress_step = min(95, 75 + progress_increment)
-                        self.update_execution_stack_status(execution_id, f"Génération en cours ({int(elapsed_time)}s)", progress_step)
+            finally:
+                self.backend_pool.release(backend, failed=backend_failed)
 
-                    # Vérifier si le workflow est toujours en cours
-                    try:
-                        if hasattr(tsk1, 'ws') and tsk1.ws:
-                            is_running = workflow_is_running(tsk1.ws, comfyui_prompt_id)
-                            print(f"DEBUG: Check {check_count}: workflow_is_running = {is_running}")
-                            if not is_running:
-                                print(f"DEBUG: Workflow terminé après {elapsed_time:.1f}s")
-                                break
-                        else:
-                            print("DEBUG: Pas de connexion WebSocket active")
-                            break
-                    except Exception as ws_error:
-                        print(f"DEBUG: Erreur WebSocket check: {ws_error}")
-                        # On continue même en cas d'erreur WebSocket
-                        if elapsed_time > 30:  # Si on a attendu au moins 30s, on considère que c'est probablement fini
-                            break
+        except Exception as e:
+            error_msg = f"Erreur ComfyUI: {str(e)}"
+            self.update_execution_stack_status(execution_id, error_msg, 0)
+            self._finish_execution_record(execution_id, "error", error_msg, db_manager=db_manager)
+            self.root.after(0, lambda: self.update_prompt_status_after_execution(prompt_id, "nok", db_manager))
+            print(f"Erreur dans _execute_workflow_task: {e}")
 
-                    time.sleep(3)  # Vérifier toutes les 3 secondes
+    def _job_worker(self):
+        """
+        Répartiteur de la file persistante: reprend au démarrage les travaux interrompus,
+        puis confie les travaux en attente à l'exécuteur borné dans la limite de la capacité des backends.
+        Les travaux au-delà restent en file (pression arrière) ; sans backend utilisable
+        (arrêté ou disjoncteur ouvert), la capacité est nulle et la répartition est suspendue
+        """
+        job_queue = None
+        while True:
+            job = None
+            try:
+                if job_queue is not self.job_queue:
+                    # Nouvelle base: reprise de sa file (retentée au tour suivant en cas d'échec)
+                    requeued, tracked = self.job_queue.recover()
+                    job_queue = self.job_queue
+                    if requeued or tracked:
+                        print(f"DEBUG: File reprise: {requeued} en attente, {tracked} suivis chez ComfyUI")
+                self.backend_pool.refresh()
+                with self._jobs_lock:
+                    full = self._jobs_in_flight >= self.backend_pool.capacity()
+                if not full:
+                    # Regroupement par checkpoint: celui du backend qui recevra le travail. Tous pleins
+                    # (balayage en cours): le travail attend une place selon sa priorité (acquire)
+                    target = self.backend_pool.select()
+                    job = job_queue.claim_next(target.loaded_checkpoint if target else None)
+            except Exception as e:
+                print(f"DEBUG: File d'exécution indisponible: {e}")
+            if job is None:
+                self._job_wakeup.wait(self.JOB_POLL_S)
+                self._job_wakeup.clear()
+                continue
 
-                # Étape 4: Récupération des images (95% -> 100%)
-                self.update_execution_stack_status(execution_id, "Récupération des images", 95)
+            with self._jobs_lock:
+                self._jobs_in_flight += 1
+            self.job_executor.submit(self._run_job, job_queue, job)
 
-            except Exception as comfy_error:
-                print(f"DEBUG: Erreur ComfyUI: {comfy_error}")
-                self.update_execution_stack_status(execution_id, f"Erreur ComfyUI: {str(comfy_error)}", 0)
-                return
+    def _run_job(self, job_queue, job):
+        """Exécuter un travail de la file (thread de l'exécuteur borné), dans la base d'où il a été tiré"""
+        execution_id, prompt_id = job["execution_id"], job["prompt_id"]
+        db_manager = job_queue.db_manager
+        try:
+            prompt = db_manager.get_prompt_by_id(prompt_id)
+            prompt_name = prompt.name if prompt else f"#{prompt_id}"
+            self.root.after(0, lambda: self._show_job_started(execution_id, prompt_name))
+            db_manager.start_execution_record(prompt_id, execution_id)
+            self._execute_workflow_task(
+                prompt_id, execution_id, bool(job["fixed_seeds"]), job["priority"], db_manager, job_queue
+            )
+            job_queue.sync_with_executions()
+        except Exception as e:
+            print(f"DEBUG: Travail {execution_id} en erreur: {e}")
+        finally:
+            with self._jobs_lock:
+                self._jobs_in_flight -= 1
+            self._job_wakeup.set()
+
+    def refresh_job_queue_view(self):
+        """Mettre à jour la vue de la file d'attente, puis replanifier"""
+        if self._job_view_refresh is not None:
+            self.root.after_cancel(self._job_view_refresh)
+        self._job_view_refresh = self.root.after(self.JOB_VIEW_REFRESH_MS, self.refresh_job_queue_view)
+        if not hasattr(self, "job_queue_tree"):
+            return
+        try:
+            counts = self.job_queue.count_by_state()
+            jobs = self.job_queue.list_jobs(cy8_job_queue.OPEN_STATES, limit=self.JOB_VIEW_LIMIT)
+        except Exception as e:
+            self.job_queue_text.set(f"File indisponible: {e}")
+            return
+
+        with self._jobs_lock:
+            in_flight = self._jobs_in_flight
+        self.job_queue_text.set(
+            f"{counts.get(cy8_job_queue.PENDING, 0)} en attente, "
+            f"{counts.get(cy8_job_queue.SUBMITTED, 0) + counts.get(cy8_job_queue.RUNNING, 0)} chez ComfyUI, "
+            f"{in_flight}/{self.backend_pool.capacity()} exécution(s) suivie(s)"
+        )
+        selection = self.job_queue_tree.selection()
+        for item in self.job_queue_tree.get_children():
+            self.job_queue_tree.delete(item)
+        names = {}
+        for job in jobs:
+            prompt_id = job["prompt_id"]
+            if prompt_id not in names:
+                prompt = self.db_manager.get_prompt_by_id(prompt_id)
+                names[prompt_id] = prompt.name if prompt else f"#{prompt_id}"
+            self.job_queue_tree.insert(
+                "",
+                "end",
+                iid=job["execution_id"],
+                values=(
+                    job["execution_id"],
+                    names[prompt_id],
+                    job["state"],
+                    self.PRIORITY_LABELS.get(job["priority"], job["priority"]),
+                    job["checkpoint"],
+                    job["created_at"],
+                ),
+            )
+        kept = [item for item in selection if self.job_queue_tree.exists(item)]
+        if kept:
+            self.job_queue_tree.selection_set(kept)
+
+    def _selected_job(self):
+        """Travail sélectionné dans la vue de la file (None si aucun)"""
+        selection = self.job_queue_tree.selection() if hasattr(self, "job_queue_tree") else ()
+        if not selection:
+            messagebox.showwarning("Attention", "Sélectionnez un travail dans la file d'attente.")
+            return None
+        return self.job_queue.get_job(selection[0])
+
+    def cancel_selected_job(self):
+        """Annuler le travail sélectionné: retiré de la file locale, de la file ComfyUI, ou interrompu"""
+        job = self._selected_job()
+        if job is None or job["state"] not in cy8_job_queue.OPEN_STATES:
+            return
+        execution_id = job["execution_id"]
+        if job["state"] == cy8_job_queue.PENDING and self.job_queue.cancel_pending(execution_id):
+            self.update_execution_stack_status(execution_id, "Annulé", 0)
+            self.update_status(f"Exécution {execution_id} annulée")
+            self.refresh_job_queue_view()
+            return
+
+        # Travail confié à ComfyUI (requêtes réseau hors du thread Tk)
+        job_queue = self.job_queue
+        db_manager = self.db_manager
 
-            # Récupérer les images générées
+        def worker():
+            comfyui_prompt_id = job["comfyui_prompt_id"]
+            result = None
             try:
-                output_images = tsk1.GetImages(comfyui_prompt_id)
-            except Exception as img_error:
-                print(f"DEBUG: Erreur récupération images: {img_error}")
-                self.update_execution_stack_status(execution_id, f"Erreur images: {str(img_error)}", 0)
-                return
+                result = cancel_prompt(comfyui_prompt_id, job["backend"]) if comfyui_prompt_id else "deleted"
+                if result is None:
+                    message = f"Exécution {execution_id} déjà terminée chez ComfyUI"
+                else:
+                    job_queue.mark_cancelled(execution_id)
+                    if result == "deleted":
+                        # Un prompt retiré de la file n'apparaîtra jamais dans /history
+                        db_manager.finish_execution_record(execution_id, "interrupted", "Annulé", comfyui_prompt_id)
+                    message = f"Exécution {execution_id} " + (
+                        "interrompue" if result == "interrupted" else "retirée de la file ComfyUI"
+                    )
+            except Exception as e:
+                message = f"Annulation impossible: {e}"
+            print(f"DEBUG: {message}")
 
-            if output_images:
-                self.update_execution_stack_status(
-                    execution_id, f"Terminé avec succès - {len(output_images)} images générées", 100
-                )
-                self.root.after(
-                    0,
-                    lambda: self.update_prompt_status_after_execution(prompt_id, "ok"),
-                )
-            else:
-                self.update_execution_stack_status(execution_id, "Terminé - Aucune image générée", 100)
-                self.root.after(
-                    0,
-                    lambda: self.update_prompt_status_after_execution(prompt_id, "ok"),
-                )
+            def show():
+                self.update_status(message)
+                if result is not None:
+                    self.update_execution_stack_status(execution_id, "Annulé", 0)
+                self.refresh_job_queue_view()
+
+            self.root.after(0, show)
 
+        threading.Thread(target=worker, daemon=True).start()
+
+    def set_selected_job_priority(self, priority):
+        """Changer la priorité du travail sélectionné (travaux en attente uniquement)"""
+        job = self._selected_job()
+        if job is None:
+            return
+        if self.job_queue.set_priority(job["execution_id"], priority):
+            self._job_wakeup.set()
+            self.update_status(f"Priorité de {job['execution_id']}: {self.PRIORITY_LABELS[priority]}")
+        else:
+            messagebox.showinfo("Information", "Seul un travail en attente peut changer de priorité.")
+        self.refresh_job_queue_view()
+
+    def _show_job_started(self, execution_id, prompt_name):
+        """Ajouter à la pile un travail repris depuis la file (absent après un redémarrage)"""
+        if not any(item["id"] == execution_id for item in self.execution_stack):
+            self.add_to_execution_stack(execution_id, "Initialisation", prompt_name, 10)
+        else:
+            self.update_execution_stack_status(execution_id, "Initialisation", 10)
+
+    def _finish_execution_record(
+        self, execution_id, status, message, comfyui_prompt_id=None, output_paths=None, db_manager=None
+    ):
+        """Clôturer l'exécution dans l'historique en base (sans interrompre la tâche en cas d'erreur)"""
+        try:
+            (db_manager or self.db_manager).finish_execution_record(
+                execution_id, status, message, comfyui_prompt_id, output_paths
+            )
         except Exception as e:
-            error_msg = f"Erreur ComfyUI: {str(e)}"
-            self.update_execution_stack_status(execution_id, error_msg, 0)
-            self.root.after(0, lambda: self.update_prompt_status_after_execution(prompt_id, "nok"))
-            print(f"Erreur dans _execute_workflow_task: {e}")
+            print(f"Erreur lors de l'enregistrement de l'historique: {e}")
 
-    def update_prompt_status_after_execution(self, prompt_id, status):
-        """Mettre à jour le statut du prompt après exécution"""
+    def _save_node_timings(self, execution_id, task, db_manager=None):
+        """Enregistrer les durées par node relevées pendant l'exécution (sans interrompre la tâche en cas d'erreur)"""
         try:
-            # Récupérer les données actuelles
-            data = self.db_manager.get_prompt_by_id(prompt_id)
-            if data:
-                name, prompt_values, workflow, url, model, comment, _ = data
+            timings = task.node_timings()
+            if timings and timings["nodes"]:
+                (db_manager or self.db_manager).set_execution_node_timings(execution_id, timings)
+        except Exception as e:
+            print(f"DEBUG: Durées des nodes non enregistrées pour {execution_id}: {e}")
 
+    def update_prompt_status_after_execution(self, prompt_id, status, db_manager=None):
+        """Mettre à jour le statut du prompt après exécution (dans la base du travail, si elle est encore ouverte)"""
+        db_manager = db_manager or self.db_manager
+        try:
+            # Récupérer les données actuelles
+            prompt = db_manager.get_prompt_by_id(prompt_id)
+            if prompt:
                 # Mettre à jour avec le nouveau statut
-                self.db_manager.update_prompt(
+                db_manager.update_prompt(
                     prompt_id,
-                    name,
-                    prompt_values,
-                    workflow,
-                    url,
-                    model,
-                    comment,
+                    prompt.name,
+                    prompt.prompt_values,
+                    prompt.workflow,
+                    prompt.url,
+                    prompt.model,
+                    prompt.comment,
                     status,
                 )
+                if db_manager is not self.db_manager:
+                    return  # Base quittée depuis: la liste affichée est celle d'une autre base
 
-                # Mettre à jour l'affichage
-                if str(prompt_id) in [self.prompts_tree.item(item, "values")[0] for item in self.prompts_tree.get_children()]:
-                    for item in self.prompts_tree.get_children():
-                        if self.prompts_tree.item(item, "values")[0] == str(prompt_id):
-                            values = list(self.prompts_tree.item(item, "values"))
-                            values[2] = status  # Colonne statut
-                            self.prompts_tree.item(item, values=values)
-                            break
+                # Mettre à jour l'affichage (l'iid de la ligne est l'ID du prompt)
+                if self.prompts_tree.exists(str(prompt_id)):
+                    self.prompts_tree.set(str(prompt_id), "status", status)
 
                 # Si c'est le prompt sélectionné, mettre à jour aussi les détails
                 if self.selected_prompt_id == prompt_id:
@@ -1423,9 +2031,10 @@ class cy8_prompts_manager:
 
         # Effectuer l'analyse
         try:
-            data = self.db_manager.get_prompt_by_id(self.selected_prompt_id)
-            if data:
-                name, prompt_values, workflow, url, model, comment, status = data
+            prompt = self.db_manager.get_prompt_by_id(self.selected_prompt_id)
+            if prompt:
+                name, prompt_values, workflow = prompt.name, prompt.prompt_values, prompt.workflow
+                url, model, comment, status = prompt.url, prompt.model, prompt.comment, prompt.status
 
                 analysis = f"""ANALYSE DU PROMPT: {name}
 {'='*50}
@@ -1591,6 +2200,14 @@ WORKFLOW:
                 for detail in execution["details"]:
                     details_text += f"{detail}\n"
 
+            # Durées par node relevées pendant l'exécution (quel node domine le rendu)
+            try:
+                timing_lines = format_node_timings(self.db_manager.get_execution_node_timings(execution["id"]))
+            except Exception as e:
+                timing_lines = [f"Durées indisponibles: {e}"]
+            if timing_lines:
+                details_text += "\nDurées par node:\n" + "\n".join(timing_lines) + "\n"
+
             self.execution_details.insert("1.0", details_text)
             self.execution_details.config(state="disabled")
 
@@ -1624,8 +2241,8 @@ WORKFLOW:
 
             # Statistiques par statut
             status_counts = {}
-            for _, _, _, _, _, status, _ in prompts:
-                status_counts[status] = status_counts.get(status, 0) + 1
+            for prompt in prompts:
+                status_counts[prompt.status] = status_counts.get(prompt.status, 0) + 1
 
             stats_text = f"Total prompts: {total_prompts}"
             if status_counts:
@@ -1635,6 +2252,200 @@ WORKFLOW:
         except Exception as e:
             self.stats_text.set(f"Erreur lors du calcul des statistiques: {e}")
 
+        self.update_maintenance_display()
+        self.update_backup_display()
+
+        if hasattr(self, "archive_info_var"):
+            archived_count = self.archive_manager.count_archived()
+            self.archive_info_var.set(f"{archived_count} prompts archivés ({os.path.basename(self.archive_manager.archive_path)})")
+
+    def schedule_database_maintenance(self, delay_ms):
+        """Planifier la prochaine passe de maintenance de la base"""
+        if self._maintenance_job is not None:
+            self.root.after_cancel(self._maintenance_job)
+        self._maintenance_job = self.root.after(delay_ms, self.run_database_maintenance)
+
+    def run_database_maintenance(self):
+        """Lancer les tâches de maintenance dues (en thread) puis replanifier"""
+        maintenance = self.db_maintenance
+
+        def progress(message):
+            self.root.after(0, lambda: self.update_status(message))
+            self.root.after(0, self.update_maintenance_display)
+
+        def worker():
+            results = maintenance.run_scheduled(progress_callback=progress)
+            self.root.after(0, lambda: self._on_maintenance_finished(maintenance, results))
+
+        threading.Thread(target=worker, daemon=True).start()
+        self.schedule_database_maintenance(self.MAINTENANCE_INTERVAL_MS)
+
+    def _on_maintenance_finished(self, maintenance, results):
+        """Afficher le résultat de la maintenance"""
+        if maintenance is not self.db_maintenance:
+            return  # La base a changé pendant la maintenance
+        self.update_maintenance_display()
+        if "erreur" in results:
+            self.update_status(f"Maintenance de la base en erreur: {results['erreur']}")
+        elif results.get("integrity_check", "ok") != "ok":
+            self.update_status(f"Contrôle d'intégrité: {results['integrity_check']}")
+        else:
+            self.update_status("Maintenance de la base terminée")
+
+    def schedule_history_reconciliation(self, delay_ms):
+        """Planifier la prochaine réconciliation des exécutions en attente"""
+        if self._reconcile_job is not None:
+            self.root.after_cancel(self._reconcile_job)
+        self._reconcile_job = self.root.after(delay_ms, self.run_history_reconciliation)
+
+    def run_history_reconciliation(self):
+        """Clôturer (en thread) les exécutions terminées chez ComfyUI, puis replanifier"""
+        reconciler = self.history_reconciler
+        job_queue = self.job_queue
+
+        def worker():
+            try:
+                resolved = reconciler.reconcile()
+                if resolved:
+                    job_queue.sync_with_executions()
+            except Exception as e:
+                print(f"DEBUG: Réconciliation en erreur: {e}")
+                resolved = []
+            if resolved:
+                self.root.after(0, lambda: self._on_reconciliation_finished(reconciler, resolved))
+
+        threading.Thread(target=worker, daemon=True).start()
+        self.schedule_history_reconciliation(self.RECONCILE_INTERVAL_MS)
+
+    def _on_reconciliation_finished(self, reconciler, resolved):
+        """Reporter les exécutions clôturées par réconciliation"""
+        if reconciler is not self.history_reconciler:
+            return  # La base a changé pendant la réconciliation
+        for result in resolved:
+            succeeded = result["status"] == "ok"
+            self.update_execution_stack_status(result["execution_id"], result["message"], 100 if succeeded else 0)
+            if succeeded or result["status"] == "error":
+                self.update_prompt_status_after_execution(result["prompt_id"], "ok" if succeeded else "nok")
+        self.update_status(f"{len(resolved)} exécution(s) récupérée(s) depuis l'historique ComfyUI")
+
+    def update_maintenance_display(self):
+        """Mettre à jour le résumé de maintenance dans l'onglet Data"""
+        if not hasattr(self, "maintenance_text"):
+            return
+        try:
+            self.maintenance_text.set(self.db_maintenance.summary())
+        except Exception as e:
+            self.maintenance_text.set(f"Maintenance indisponible: {e}")
+
+    def update_backup_display(self):
+        """Mettre à jour le résumé des instantanés dans l'onglet Data"""
+        if not hasattr(self, "backup_info_var"):
+            return
+        backup_manager = self.db_manager.backup_manager
+        snapshots = backup_manager.list_snapshots()
+        if snapshots:
+            self.backup_info_var.set(
+                f"{len(snapshots)} instantanés (max {backup_manager.keep}) dans {backup_manager.backup_dir}\n"
+                f"Dernier: {os.path.basename(snapshots[0])}"
+            )
+        else:
+            self.backup_info_var.set(f"Aucun instantané ({backup_manager.backup_dir})")
+
+    def backup_database(self, reason="manual", on_done=None):
+        """
+        Sauvegarder la base sans bloquer l'interface (copie par pas de pages en thread).
+        on_done(chemin) est appelé dans le thread Tk si la sauvegarde réussit.
+        """
+        db_manager = self.db_manager
+        with db_manager._lock:
+            if db_manager.conn:
+                db_manager.conn.commit()
+
+        def progress(copied, total):
+            self.root.after(0, lambda: self.update_status(f"Sauvegarde: {copied}/{total} pages"))
+
+        def finished(path, error):
+            self.root.after(0, lambda: self._on_backup_finished(path, error, on_done))
+
+        db_manager.backup_manager.create_snapshot_async(reason, callback=finished, progress_callback=progress)
+
+    def _on_backup_finished(self, path, error, on_done=None):
+        """Afficher le résultat d'une sauvegarde puis poursuivre l'opération en attente"""
+        if error:
+            messagebox.showerror("Erreur", f"Sauvegarde impossible: {error}")
+            self.update_status("Sauvegarde échouée")
+            return
+        self.update_backup_display()
+        self.update_status(f"Instantané créé: {os.path.basename(path)}" if path else "Base vide, rien à sauvegarder")
+        if on_done:
+            on_done(path)
+
+    def archive_old_prompts(self):
+        """Archiver les prompts nok/test anciens et sans exécution récente"""
+        candidates = self.archive_manager.find_candidates()
+        if not candidates:
+            messagebox.showinfo("Archive", "Aucun prompt ne correspond à la politique d'archivage.")
+            return
+
+        if not messagebox.askyesno(
+            "Confirmer",
+            f"Archiver {len(candidates)} prompts (statut nok/test, inchangés depuis 180 jours, "
+            "sans exécution depuis 90 jours) ?",
+        ):
+            return
+
+        def progress(done, total):
+            self.root.after(0, lambda: self.update_status(f"Archivage: {done}/{total} prompts"))
+
+        def worker():
+            count, message = self.archive_manager.archive_prompts(candidates, progress_callback=progress)
+            self.root.after(0, lambda: self._on_archive_finished(message))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _on_archive_finished(self, message):
+        """Rafraîchir l'affichage après un archivage"""
+        if self.selected_prompt_id and not self.prompts_tree.exists(str(self.selected_prompt_id)):
+            self.selected_prompt_id = None
+        self.refresh_prompts_display()
+        self.update_database_stats()
+        self.update_status(message)
+
+    def search_archived_prompts(self):
+        """Rechercher dans la base principale et dans l'archive"""
+        term = self.archive_search_var.get().strip()
+        if not term:
+            messagebox.showwarning("Recherche", "Saisissez un terme à rechercher.")
+            return
+
+        self.archive_results = self.archive_manager.search(term, include_archived=True)
+        self.archive_results_listbox.delete(0, tk.END)
+        for prompt_id, name, status, model, comment, archived in self.archive_results:
+            marker = "[ARCHIVE] " if archived else ""
+            self.archive_results_listbox.insert(tk.END, f"{marker}{prompt_id} - {name} ({status}) {model or ''}")
+        self.update_status(f"{len(self.archive_results)} résultats pour '{term}'")
+
+    def restore_selected_archived(self):
+        """Restaurer le prompt archivé sélectionné dans les résultats de recherche"""
+        selection = self.archive_results_listbox.curselection()
+        if not selection:
+            messagebox.showwarning("Sélection", "Sélectionnez un prompt archivé.")
+            return
+
+        prompt_id, name, _, _, _, archived = self.archive_results[selection[0]]
+        if not archived:
+            messagebox.showinfo("Information", f"'{name}' est déjà dans la base principale.")
+            return
+
+        success, message = self.archive_manager.restore_prompt(prompt_id)
+        if success:
+            self.refresh_prompts_display()
+            self.update_database_stats()
+            self.search_archived_prompts()
+        else:
+            messagebox.showerror("Erreur", message)
+        self.update_status(message)
+
     def change_database(self):
         """Changer de base de données existante"""
         from tkinter import filedialog
@@ -1749,12 +2560,27 @@ WORKFLOW:
         ttk.Button(button_frame, text="Créer", command=create_database).pack(side="right", padx=(5, 0))
         ttk.Button(button_frame, text="Annuler", command=cancel).pack(side="right")
 
-    def switch_to_database(self, new_db_path, create_new=False):
+    def switch_to_database(self, new_db_path, create_new=False, backup_done=False):
         """Basculer vers une nouvelle base de données"""
         try:
             # Normaliser le chemin
             normalized_path = normalize_path(new_db_path)
 
+            # Recréer une base existante l'efface: instantané d'abord, en thread
+            if create_new and not backup_done:
+                backup_manager = cy8_database_backup(normalized_path)
+                if backup_manager.has_data():
+
+                    def finished(path, error):
+                        self.root.after(0, lambda: self._on_backup_finished(path, error, on_done))
+
+                    def on_done(path):
+                        self.switch_to_database(normalized_path, create_new=True, backup_done=True)
+
+                    self.update_status("Sauvegarde de la base existante avant recréation...")
+                    backup_manager.create_snapshot_async("init", callback=finished)
+                    return
+
             # Fermer l'ancienne connexion
             if hasattr(self, "db_manager") and self.db_manager:
                 self.db_manager.close()
@@ -1762,13 +2588,23 @@ WORKFLOW:
             # Créer le nouveau gestionnaire de base
             self.db_path = normalized_path
             self.db_manager = cy8_database_manager(normalized_path)
+            self.archive_manager = cy8_archive_manager(self.db_manager)
+            self.result_cache = cy8_result_cache(self.db_manager)
+            self.db_maintenance = cy8_database_maintenance(self.db_manager)
+            self.history_reconciler = cy8_history_reconciler(self.db_manager)
 
             # Initialiser la base (créer les tables si nécessaire)
             if create_new:
-                self.db_manager.init_database("init")  # Mode init pour créer avec prompt par défaut
+                # Mode init pour créer avec prompt par défaut (base existante déjà sauvegardée)
+                self.db_manager.init_database("init", backup=False)
             else:
                 self.db_manager.init_database("dev")  # Mode dev pour ouvrir existante
 
+            # File de la nouvelle base: le répartiteur ne la voit qu'une fois la connexion ouverte
+            self.job_queue = cy8_job_queue(self.db_manager)
+            self._job_wakeup.set()
+            self.refresh_job_queue_view()
+
             # Recréer tous les gestionnaires avec le nouveau db_manager
             self.popup_manager = cy8_popup_manager(self.root, self.db_manager)
             self.table_manager = cy8_editable_tables(self.root, self.popup_manager)
@@ -1934,6 +2770,10 @@ WORKFLOW:
             if hasattr(self, "db_path") and self.db_path:
                 self.user_prefs.set_last_database_path(self.db_path)
 
+            # Les travaux non terminés restent dans la file persistante (repris au prochain démarrage)
+            if hasattr(self, "job_executor"):
+                self.job_executor.shutdown(wait=False, cancel_futures=True)
+
             # Fermer la base de données
             if hasattr(self, "db_manager") and self.db_manager:
                 self.db_manager.close()
@@ -2138,8 +2978,8 @@ WORKFLOW:
         result = []
 
         for prompt in prompts:
-            # prompt est un tuple: (id, name, parent, model, workflow, status, comment) - format get_all_prompts
-            prompt_id, name, parent, model, workflow, status, comment = prompt
+            # prompt est un cy8_prompt_summary (format get_all_prompts)
+            name, parent, model, status = prompt.name, prompt.parent, prompt.model, prompt.status
 
             include_prompt = False
 
@@ -2213,16 +3053,16 @@ WORKFLOW:
 
         # Ajouter les prompts filtrés
         for prompt in filtered_prompts:
-            prompt_id, name, parent, model, workflow, status, comment = prompt
+            prompt_id = prompt.id
 
             # Format des valeurs pour l'affichage (même format que load_prompts)
             display_values = (
                 prompt_id,
-                name or "",
-                status or "new",
-                model or "",
-                comment or "",
-                parent or ""
+                prompt.name or "",
+                prompt.status or "new",
+                prompt.model or "",
+                prompt.comment or "",
+                prompt.parent or ""
             )
 
             # Insérer avec iid pour pouvoir identifier l'élément
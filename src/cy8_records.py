@@ -0,0 +1,83 @@
+"""
+Module des enregistrements typés - Version cy8
+Objets légers (__slots__) retournés par cy8_database_manager à la place des tuples
+"""
+
+
+class cy8_record:
+    """
+    Base des enregistrements: champs nommés, sans __dict__.
+    Reste compatible avec l'ancien format tuple (dépaquetage, index, égalité avec un tuple).
+    """
+
+    __slots__ = ()
+
+    def __init__(self, *values):
+        if len(values) != len(self.__slots__):
+            raise TypeError(f"{type(self).__name__} attend {len(self.__slots__)} valeurs, {len(values)} reçues")
+        for field, value in zip(self.__slots__, values):
+            setattr(self, field, value)
+
+    @classmethod
+    def fields(cls):
+        """Noms des champs dans l'ordre des colonnes SQL"""
+        return cls.__slots__
+
+    def as_tuple(self):
+        return tuple(getattr(self, field) for field in self.__slots__)
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    def __iter__(self):
+        return iter(self.as_tuple())
+
+    def __getitem__(self, index):
+        return self.as_tuple()[index]
+
+    def __len__(self):
+        return len(self.__slots__)
+
+    def __eq__(self, other):
+        if isinstance(other, cy8_record):
+            return type(self) is type(other) and self.as_tuple() == other.as_tuple()
+        if isinstance(other, tuple):
+            return self.as_tuple() == other
+        return NotImplemented
+
+    def __hash__(self):
+        # Même hash que le tuple équivalent (égalité avec un tuple conservée dans les sets et les dicts).
+        # Les champs ne sont modifiés qu'à la construction: ne pas muter un enregistrement déjà indexé
+        return hash(self.as_tuple())
+
+    def __repr__(self):
+        values = ", ".join(f"{field}={getattr(self, field)!r}" for field in self.__slots__)
+        return f"{type(self).__name__}({values})"
+
+
+class cy8_prompt_summary(cy8_record):
+    """Ligne de la liste des prompts (get_all_prompts)"""
+
+    __slots__ = ("id", "name", "parent", "model", "workflow", "status", "comment")
+
+
+class cy8_prompt_record(cy8_record):
+    """Détail d'un prompt (get_prompt_by_id)"""
+
+    __slots__ = ("name", "prompt_values", "workflow", "url", "model", "comment", "status")
+
+
+class cy8_execution_record(cy8_record):
+    """Entrée de l'historique d'exécution (get_prompt_executions)"""
+
+    __slots__ = (
+        "execution_id",
+        "comfyui_prompt_id",
+        "status",
+        "message",
+        "started_at",
+        "finished_at",
+        "parameters",
+        "workflow_hash",
+        "node_timings",
+    )
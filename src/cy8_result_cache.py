@@ -0,0 +1,54 @@
+"""
+Cache des résultats d'exécution - Version cy8
+Un workflow patché identique (graines comprises) produit les mêmes images: son empreinte
+canonique pointe vers l'exécution dont les images (prompt_outputs) sont réutilisées.
+Une entrée dont une image a disparu du disque est évincée
+"""
+
+import os
+import json
+import hashlib
+
+
+def workflow_hash(workflow):
+    """Empreinte stable d'un workflow patché (clés triées)"""
+    canonical = json.dumps(workflow, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def pin_seeds(values):
+    """Mode graines fixes: copie des valeurs où chaque graine garde sa valeur enregistrée"""
+    pinned = {key: dict(entry) for key, entry in values.items()}
+    for entry in pinned.values():
+        if entry.get("type") == "seed":
+            entry["fixed"] = True
+    return pinned
+
+
+class cy8_result_cache:
+    """Recherche, enregistrement et éviction des résultats par empreinte de workflow"""
+
+    def __init__(self, db_manager, exists=os.path.exists):
+        self.db_manager = db_manager
+        self.exists = exists
+
+    def lookup(self, hash_value):
+        """Chemins des images en cache, ou None (entrée absente ou évincée car incomplète sur le disque)"""
+        if not hash_value:
+            return None
+        cached = self.db_manager.get_cached_result(hash_value)
+        if cached is None:
+            return None
+        execution_id, paths = cached
+        missing = [path for path in paths if not self.exists(path)]
+        if not paths or missing:
+            print(f"DEBUG: Cache évincé pour {execution_id}: {len(missing)} image(s) absente(s)")
+            self.db_manager.evict_cached_result(hash_value)
+            return None
+        self.db_manager.hit_cached_result(hash_value)
+        return paths
+
+    def store(self, hash_value, execution_id, output_paths):
+        """Mettre en cache une exécution réussie (sans image, rien à réutiliser)"""
+        if hash_value and output_paths:
+            self.db_manager.store_cached_result(hash_value, execution_id)
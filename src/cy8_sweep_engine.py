@@ -0,0 +1,244 @@
+"""
+Module de balayage de paramètres - Version cy8
+Grille déclarative sur les clés de prompt_values (seed × prompt × LoRA × CFG ...),
+variantes dédupliquées et soumises à ComfyUI avec une concurrence bornée
+"""
+
+import json
+import time
+import functools
+import itertools
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from cy6_workflow_patcher import compile_patch_plan, apply_patch_plan
+from cy6_backend_pool import PRIORITY_LOW
+from cy8_execution_scheduler import order_by_affinity
+from cy8_result_cache import workflow_hash, pin_seeds
+
+
+def parse_grid(values, grid):
+    """
+    Valider une grille {"<clé>.<champ>": [valeurs...]} ("<clé>" seul = champ "value").
+    Retourne [((clé, champ), valeurs), ...] ; ValueError si une clé est inconnue ou un axe vide
+    """
+    axes = []
+    for axis, axis_values in grid.items():
+        key, _, field = str(axis).partition(".")
+        field = field or "value"
+        if key not in values:
+            raise ValueError(f"Clé '{key}' absente de prompt_values")
+        if not isinstance(axis_values, (list, tuple)) or not axis_values:
+            raise ValueError(f"L'axe '{axis}' doit être une liste non vide")
+        axes.append(((key, field), list(axis_values)))
+    return axes
+
+
+def expand_grid(values, grid):
+    """
+    Produit cartésien de la grille: liste de (paramètres, valeurs de la variante).
+    Les graines sont figées (fixed) pour que les variantes ne diffèrent que par les axes balayés.
+    """
+    axes = parse_grid(values, grid)
+    base = pin_seeds(values)
+
+    variants = []
+    for combination in itertools.product(*(axis_values for _, axis_values in axes)):
+        variant = {key: dict(entry) for key, entry in base.items()}
+        parameters = {}
+        for ((key, field), _), value in zip(axes, combination):
+            variant[key][field] = value
+            parameters[f"{key}.{field}"] = value
+        variants.append((parameters, variant))
+    return variants
+
+
+def submit_to_comfyui(workflow, values, name, timeout, server_address=None, on_queued=None):
+    """
+    Soumission par défaut: une tâche ComfyUI par variante, attente événementielle de la fin.
+    on_queued(comfyui_prompt_id) est appelé dès l'acceptation du prompt, avant l'attente
+    """
+    from cy6_task_comfyui import comfyui_task
+
+    task = comfyui_task()
+    task.server_address = server_address
+    try:
+        comfyui_prompt_id = task.addToQueue(workflow, values, dump_name=name)
+        if on_queued:
+            on_queued(comfyui_prompt_id)
+        outcome, message = task.wait_for_completion(timeout)
+        task.close()
+        output_paths = task.GetImages(comfyui_prompt_id) if outcome == "success" else []
+        return outcome, message, comfyui_prompt_id, output_paths
+    finally:
+        task.close()
+
+
+class cy8_sweep_engine:
+    """Moteur de balayage: expansion, déduplication, soumission bornée et historique"""
+
+    MAX_WORKERS = 2
+    VARIANT_TIMEOUT_S = 300
+
+    def __init__(
+        self,
+        db_manager,
+        submit=None,
+        max_workers=None,
+        timeout=None,
+        backend_pool=None,
+        max_skips=None,
+        result_cache=None,
+        validator=None,
+    ):
+        """
+        submit(workflow, valeurs, nom, timeout, on_queued=...) -> (issue, message, comfyui_prompt_id, chemins) ;
+        on_queued(comfyui_prompt_id) doit être appelé dès que ComfyUI a accepté la variante
+        max_workers: nombre maximal de variantes en cours simultanément
+        backend_pool: répartit les variantes entre plusieurs backends (submit reçoit alors l'adresse)
+        max_skips: borne de famine du regroupement par checkpoint (voir cy8_execution_scheduler)
+        result_cache: variantes déjà produites reprises sans passer par ComfyUI (cy8_result_cache)
+        validator(workflow patché) -> liste d'erreurs ; les variantes refusées ne sont pas soumises
+        """
+        self.db_manager = db_manager
+        self.submit = submit or submit_to_comfyui
+        self.backend_pool = backend_pool
+        self.max_skips = max_skips
+        self.result_cache = result_cache
+        self.validator = validator
+        backends = len(backend_pool.backends) if backend_pool is not None else 1
+        self.max_workers = max_workers or self.MAX_WORKERS * backends
+        self.timeout = timeout or self.VARIANT_TIMEOUT_S
+
+    def _submit(self, workflow, variant, name, checkpoint, on_queued):
+        """
+        Soumettre une variante: (issue, message, comfyui_prompt_id, chemins, adresse du backend).
+        on_queued(adresse du backend, comfyui_prompt_id) dès l'acceptation par ComfyUI
+        """
+        if self.backend_pool is None:
+            queued = functools.partial(on_queued, None)
+            return (*self.submit(workflow, variant, name, self.timeout, on_queued=queued), None)
+        # Priorité basse: une exécution isolée passe devant les variantes restantes
+        with self.backend_pool.lease(checkpoint, PRIORITY_LOW) as backend:
+            queued = functools.partial(on_queued, backend.address)
+            result = self.submit(workflow, variant, name, self.timeout, backend.address, on_queued=queued)
+            return (*result, backend.address)
+
+    def plan(self, workflow, values, grid):
+        """Variantes uniques [(paramètres, valeurs, hash, checkpoint, erreurs)] et nombre de doublons écartés"""
+        patch_plan = compile_patch_plan(values)
+        seen = set()
+        variants = []
+        duplicates = 0
+        for parameters, variant in expand_grid(values, grid):
+            patched, variant = apply_patch_plan(patch_plan, workflow, variant)
+            variant_hash = workflow_hash(patched)
+            if variant_hash in seen:
+                duplicates += 1
+                continue
+            seen.add(variant_hash)
+            checkpoint = self.db_manager.derive_model_from_workflow(patched)
+            errors = self.validator(patched) if self.validator else []
+            variants.append((parameters, variant, variant_hash, checkpoint, errors))
+        return variants, duplicates
+
+    def run(self, prompt_id, grid, progress_callback=None, cancel_event=None):
+        """
+        Exécuter un balayage pour un prompt.
+        progress_callback(terminées, total, résultat) après chaque variante ;
+        cancel_event (threading.Event) empêche le démarrage des variantes restantes.
+        Les variantes qui partagent un checkpoint sont enchaînées (moins de rechargements de modèle).
+        Les variantes refusées par le validateur sont enregistrées 'invalid' sans soumission.
+        Retourne un dict: sweep_id, variants, duplicates, cached, invalid, reloads (rapport du regroupement), results
+        """
+        prompt = self.db_manager.get_prompt_by_id(prompt_id)
+        if not prompt:
+            raise ValueError(f"Prompt {prompt_id} introuvable")
+        workflow = json.loads(prompt.workflow or "{}")
+        values = json.loads(prompt.prompt_values or "{}")
+
+        variants, duplicates = self.plan(workflow, values, grid)
+        invalid = {index for index, variant in enumerate(variants) if variant[4]}
+        cached = {}
+        if self.result_cache is not None:
+            for index, variant in enumerate(variants):
+                paths = self.result_cache.lookup(variant[2]) if index not in invalid else None
+                if paths is not None:
+                    cached[index] = paths
+        ordered, reloads = order_by_affinity(
+            [item for item in enumerate(variants) if item[0] not in cached and item[0] not in invalid],
+            lambda item: item[1][3],
+            self.max_skips,
+            self._loaded_checkpoint(),
+        )
+        sweep_id = f"sweep_{int(time.time() * 1000)}"
+
+        def run_variant(index, parameters, variant, variant_hash, checkpoint, errors):
+            execution_id = f"{sweep_id}_{index:04d}"
+            if cancel_event is not None and cancel_event.is_set():
+                return {"execution_id": execution_id, "parameters": parameters, "status": "cancelled", "outputs": []}
+
+            self.db_manager.start_execution_record(prompt_id, execution_id, parameters, variant_hash)
+            backend = None
+            if errors:
+                outcome, message, comfyui_prompt_id, output_paths = "invalid", "; ".join(errors), None, []
+            elif index in cached:
+                outcome, message, comfyui_prompt_id, output_paths = "success", "Résultat en cache", None, cached[index]
+            else:
+
+                def on_queued(address, comfyui_prompt_id):
+                    # ID ComfyUI noté avant l'attente: après un arrêt brutal, la réconciliation /history clôture
+                    self.db_manager.mark_execution_queued(execution_id, comfyui_prompt_id, address)
+
+                try:
+                    outcome, message, comfyui_prompt_id, output_paths, backend = self._submit(
+                        workflow, variant, f"{prompt.name}_{index:04d}", checkpoint or prompt.model, on_queued
+                    )
+                except Exception as e:
+                    outcome, message, comfyui_prompt_id, output_paths = "error", str(e), None, []
+            if outcome == "disconnected" and comfyui_prompt_id:
+                # Variante encore en file chez ComfyUI: clôturée plus tard par la réconciliation /history
+                self.db_manager.mark_execution_queued(execution_id, comfyui_prompt_id, backend)
+                return {
+                    "execution_id": execution_id,
+                    "parameters": parameters,
+                    "status": "running",
+                    "message": message,
+                    "outputs": [],
+                }
+            status = "ok" if outcome == "success" else outcome
+            self.db_manager.finish_execution_record(execution_id, status, message, comfyui_prompt_id, output_paths)
+            if status == "ok" and index not in cached and self.result_cache is not None:
+                self.result_cache.store(variant_hash, execution_id, output_paths)
+            return {
+                "execution_id": execution_id,
+                "parameters": parameters,
+                "status": status,
+                "message": message,
+                "outputs": output_paths,
+            }
+
+        results = []
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="cy8-sweep") as pool:
+            futures = [pool.submit(run_variant, index, *variants[index]) for index in sorted(invalid) + list(cached)]
+            futures += [pool.submit(run_variant, index, *variant) for index, variant in ordered]
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                if progress_callback:
+                    progress_callback(len(results), len(futures), result)
+
+        results.sort(key=lambda result: result["execution_id"])
+        return {
+            "sweep_id": sweep_id,
+            "variants": len(variants),
+            "duplicates": duplicates,
+            "cached": len(cached),
+            "invalid": len(invalid),
+            "reloads": reloads,
+            "results": results,
+        }
+
+    def _loaded_checkpoint(self):
+        """Checkpoint chargé sur le backend unique (inconnu avec plusieurs backends)"""
+        if self.backend_pool is not None and len(self.backend_pool.backends) == 1:
+            return self.backend_pool.backends[0].loaded_checkpoint
+        return None
@@ -6,11 +6,19 @@ import sqlite3
 import json
 import os
 import tempfile
+import threading
 from datetime import datetime
 
 # Imports des classes cy8
 try:
     from cy8_database_manager import cy8_database_manager
+    from cy8_archive_manager import cy8_archive_manager
+    from cy8_db_maintenance import cy8_database_maintenance
+    from cy8_db_backup import cy8_database_backup
+    from cy8_sweep_engine import cy8_sweep_engine, expand_grid
+    from cy8_result_cache import cy8_result_cache
+    from cy8_history_reconciler import cy8_history_reconciler
+    from cy8_job_queue import cy8_job_queue
     from cy8_popup_manager import cy8_popup_manager
     from cy8_editable_tables import cy8_editable_tables
     from cy8_prompts_manager_main import cy8_prompts_manager
@@ -135,6 +143,55 @@ class TestCy8DatabaseManager(unittest.TestCase):
             "Le modèle doit être dérivé correctement (sans extension)",
         )
 
+    def test_prompt_checkpoint_prefers_workflow(self):
+        """Le checkpoint d'affinité vient du workflow, la colonne model (saisie libre) n'est qu'un repli"""
+        self.db_manager.init_database()
+        workflow = json.dumps({"4": {"inputs": {"ckpt_name": "sdxl.safetensors"}, "class_type": "CheckpointLoaderSimple"}})
+        imported = self.db_manager.create_prompt("importé", "{}", workflow, "", "", "new", "")
+        edited = self.db_manager.create_prompt("édité", "{}", workflow, "", "autre", "new", "")
+        manual = self.db_manager.create_prompt("manuel", "{}", "{}", "", "flux", "new", "")
+
+        checkpoints = [
+            self.db_manager.prompt_checkpoint(self.db_manager.get_prompt_by_id(prompt_id))
+            for prompt_id in (imported, edited, manual)
+        ]
+        self.assertEqual(checkpoints, ["sdxl", "sdxl", "flux"])
+
+    def test_typed_records(self):
+        """Les lignes sont des enregistrements nommés compatibles avec l'ancien format tuple"""
+        self.db_manager.init_database()
+        prompt_id = self.db_manager.create_prompt("Record", "{}", "{}", "http://x", "m", "test", "c")
+
+        record = self.db_manager.get_prompt_by_id(prompt_id)
+        self.assertEqual(record.name, "Record")
+        self.assertEqual(record.status, "test")
+        self.assertEqual(record, ("Record", "{}", "{}", "http://x", "m", "c", "test"))
+        name, _, _, url, _, _, status = record
+        self.assertEqual((name, url, status), ("Record", "http://x", "test"))
+        self.assertFalse(hasattr(record, "__dict__"), "Les enregistrements doivent utiliser __slots__")
+        # Hachable comme le tuple équivalent (sets, clés de dict)
+        self.assertIn(("Record", "{}", "{}", "http://x", "m", "c", "test"), {record})
+        self.assertEqual(len({record, self.db_manager.get_prompt_by_id(prompt_id)}), 1)
+
+        summary = [p for p in self.db_manager.get_all_prompts() if p.id == prompt_id][0]
+        self.assertEqual(summary.comment, "c")
+        self.assertIsNone(self.db_manager.get_prompt_by_id(prompt_id + 1000))
+
+    def test_execution_node_timings(self):
+        """Les durées par node sont conservées avec l'historique de l'exécution"""
+        self.db_manager.init_database()
+        prompt_id = self.db_manager.create_prompt("Timings", "{}", "{}", "", "m", "new", "")
+        self.db_manager.start_execution_record(prompt_id, "exec_timed")
+        self.assertIsNone(self.db_manager.get_execution_node_timings("exec_timed"))
+
+        timings = {"total_s": 2.5, "nodes": [{"node": "3", "class_type": "KSampler", "duration_s": 2.0}]}
+        self.db_manager.set_execution_node_timings("exec_timed", timings)
+        self.db_manager.finish_execution_record("exec_timed", "ok", "1 images")
+
+        self.assertEqual(self.db_manager.get_execution_node_timings("exec_timed"), timings)
+        execution = self.db_manager.get_prompt_executions(prompt_id)[0]
+        self.assertEqual(json.loads(execution.node_timings), timings)
+
     def test_no_repair_on_missing_table(self):
         """Test que la réparation n'est pas tentée si la table prompts n'existe pas"""
         # Créer une base vide (sans table prompts)
@@ -228,6 +285,762 @@ class TestCy8DatabaseManager(unittest.TestCase):
                 pass
 
 
+class TestCy8ArchiveManager(unittest.TestCase):
+    """Tests de l'archivage des prompts"""
+
+    def setUp(self):
+        """Préparation d'une base avec des prompts de différents statuts"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, "prompts.db")
+        self.db_manager = cy8_database_manager(self.db_path)
+        self.db_manager.init_database()
+        self.archive_manager = cy8_archive_manager(self.db_manager)
+
+        self.old_nok = self.db_manager.create_prompt("old_nok", "{}", "{}", "", "", "nok", "échec")
+        self.old_ok = self.db_manager.create_prompt("old_ok", "{}", "{}", "", "", "ok", "")
+        self.recent_test = self.db_manager.create_prompt("recent_test", "{}", "{}", "", "", "test", "")
+
+        # Vieillir les deux premiers prompts
+        self.db_manager.cursor.execute(
+            "UPDATE prompts SET created_at='2000-01-01 00:00:00', updated_at='2000-01-01 00:00:00' WHERE id IN (?, ?)",
+            (self.old_nok, self.old_ok),
+        )
+        self.db_manager.conn.commit()
+
+    def tearDown(self):
+        """Nettoyage après tests"""
+        self.db_manager.close()
+        import shutil
+
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_policy_selects_only_old_failed_prompts(self):
+        """Seuls les prompts nok/test anciens sont candidats"""
+        self.assertEqual(self.archive_manager.find_candidates(), [self.old_nok])
+
+    def test_recent_execution_prevents_archiving(self):
+        """Une exécution récente exclut le prompt de la politique"""
+        self.db_manager.start_execution_record(self.old_nok, "exec_1")
+        self.assertEqual(self.archive_manager.find_candidates(), [])
+
+    def test_archive_moves_prompt_with_history(self):
+        """L'archivage déplace le prompt, ses exécutions et ses images"""
+        self.db_manager.start_execution_record(self.old_nok, "exec_1")
+        self.db_manager.finish_execution_record("exec_1", "error", "boom", "cf-1", ["a.png"])
+
+        count, _ = self.archive_manager.archive_prompts([self.old_nok], batch_size=1)
+
+        self.assertEqual(count, 1)
+        ids = [prompt[0] for prompt in self.db_manager.get_all_prompts()]
+        self.assertNotIn(self.old_nok, ids)
+        self.assertEqual(self.db_manager.get_prompt_executions(self.old_nok), [])
+        self.assertEqual(self.archive_manager.count_archived(), 1)
+
+        conn = sqlite3.connect(self.archive_manager.archive_path)
+        outputs = conn.execute("SELECT path FROM prompt_outputs WHERE prompt_id=?", (self.old_nok,)).fetchall()
+        conn.close()
+        self.assertEqual(outputs, [("a.png",)])
+
+    def test_search_and_restore(self):
+        """La recherche atteint l'archive à la demande et la restauration ramène le prompt"""
+        timings = {"total_s": 2.0, "nodes": [{"node": "3", "class_type": "KSampler", "duration_s": 2.0}]}
+        self.db_manager.start_execution_record(self.old_nok, "exec_1")
+        self.db_manager.set_execution_node_timings("exec_1", timings)
+        self.archive_manager.archive_prompts([self.old_nok])
+
+        self.assertEqual(self.archive_manager.search("old_nok", include_archived=False), [])
+        results = self.archive_manager.search("old_nok")
+        self.assertEqual([(r[0], r[5]) for r in results], [(self.old_nok, True)])
+
+        success, _ = self.archive_manager.restore_prompt(self.old_nok)
+        self.assertTrue(success)
+        self.assertIsNotNone(self.db_manager.get_prompt_by_id(self.old_nok))
+        self.assertEqual(self.archive_manager.count_archived(), 0)
+        self.assertEqual(self.db_manager.get_execution_node_timings("exec_1"), timings)
+
+    def test_restore_does_not_replace_prompt_reusing_the_id(self):
+        """Un ID réattribué dans la base principale bloque la restauration au lieu d'écraser le prompt vivant"""
+        self.archive_manager.archive_prompts([self.old_nok])
+        self.db_manager.cursor.execute(
+            "INSERT INTO prompts (id, name, prompt_values, workflow, status) VALUES (?, 'live', '{}', '{}', 'ok')",
+            (self.old_nok,),
+        )
+        self.db_manager.conn.commit()
+
+        success, message = self.archive_manager.restore_prompt(self.old_nok)
+
+        self.assertFalse(success)
+        self.assertIn("live", message)
+        name = self.db_manager.conn.execute("SELECT name FROM prompts WHERE id=?", (self.old_nok,)).fetchone()[0]
+        self.assertEqual(name, "live")
+        self.assertEqual(self.archive_manager.count_archived(), 1)
+
+    def test_existing_archive_gains_new_columns(self):
+        """Une archive créée avant l'ajout des colonnes backend/node_timings est complétée à l'ouverture"""
+        conn = sqlite3.connect(self.archive_manager.archive_path)
+        conn.execute(
+            "CREATE TABLE prompt_executions (id INTEGER PRIMARY KEY, prompt_id INTEGER NOT NULL, "
+            "execution_id TEXT NOT NULL, comfyui_prompt_id TEXT, status TEXT, message TEXT, "
+            "started_at TEXT, finished_at TEXT, parameters TEXT, workflow_hash TEXT)"
+        )
+        conn.commit()
+        conn.close()
+
+        self.db_manager.start_execution_record(self.old_nok, "exec_1")
+        self.db_manager.set_execution_node_timings("exec_1", {"total_s": 1.0, "nodes": []})
+        count, _ = self.archive_manager.archive_prompts([self.old_nok])
+
+        self.assertEqual(count, 1)
+        conn = sqlite3.connect(self.archive_manager.archive_path)
+        row = conn.execute("SELECT node_timings FROM prompt_executions WHERE execution_id='exec_1'").fetchone()
+        conn.close()
+        self.assertEqual(json.loads(row[0]), {"total_s": 1.0, "nodes": []})
+
+
+class TestCy8DatabaseMaintenance(unittest.TestCase):
+    """Tests de la maintenance automatique de la base"""
+
+    def setUp(self):
+        """Base avec des pages libres après suppression de prompts volumineux"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_manager = cy8_database_manager(os.path.join(self.temp_dir, "prompts.db"))
+        self.db_manager.init_database()
+        self.maintenance = cy8_database_maintenance(self.db_manager, free_page_threshold=0.2)
+
+        big_workflow = json.dumps({"1": {"inputs": {"text": "x" * 20000}, "class_type": "Note"}})
+        ids = [self.db_manager.create_prompt(f"p{i}", "{}", big_workflow, "", "", "nok", "") for i in range(30)]
+        for prompt_id in ids:
+            self.db_manager.delete_prompt(prompt_id)
+
+    def tearDown(self):
+        """Nettoyage après tests"""
+        self.db_manager.close()
+        import shutil
+
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_vacuum_when_free_ratio_exceeds_threshold(self):
+        """Une base créée par cy8 est compactée par étapes bornées, sans VACUUM complet"""
+        _, freelist_before, ratio = self.maintenance.page_stats()
+        self.assertGreater(ratio, 0.2)
+        self.assertEqual(self.db_manager.conn.execute("PRAGMA auto_vacuum").fetchone()[0], 2)
+        self.maintenance.VACUUM_STEP_PAGES = 10
+        statements = []
+        self.db_manager.conn.set_trace_callback(statements.append)
+        try:
+            result = self.maintenance.vacuum_if_needed()
+        finally:
+            self.db_manager.conn.set_trace_callback(None)
+
+        self.assertEqual(result, f"vacuum incrémental: {freelist_before} pages libérées")
+        self.assertEqual(self.maintenance.page_stats()[1], 0)
+        self.assertNotIn("VACUUM", statements)
+        self.assertGreater(statements.count("PRAGMA incremental_vacuum(10)"), 1)
+        self.assertIn("inutile", self.maintenance.vacuum_if_needed())
+
+    def test_existing_database_is_converted_once_outside_the_lock(self):
+        """Une base ancienne passe en incrémental par un VACUUM complet qui ne retient pas le verrou du gestionnaire"""
+        conn = self.db_manager.conn
+        conn.execute("PRAGMA auto_vacuum=NONE")
+        conn.execute("VACUUM")
+        ids = [self.db_manager.create_prompt(f"q{i}", "{}", "x" * 20000, "", "", "nok", "") for i in range(30)]
+        for prompt_id in ids:
+            self.db_manager.delete_prompt(prompt_id)
+        lock_free = []
+        messages = []
+
+        def try_lock():
+            acquired = self.db_manager._lock.acquire(timeout=1)
+            lock_free.append(acquired)
+            if acquired:
+                self.db_manager._lock.release()
+
+        def progress(message):
+            messages.append(message)
+            worker = threading.Thread(target=try_lock)
+            worker.start()
+            worker.join()
+
+        result = self.maintenance.vacuum_if_needed(progress_callback=progress)
+
+        self.assertIn("VACUUM complet", result)
+        self.assertEqual(lock_free, [True])
+        self.assertEqual(len(messages), 1)
+        self.assertFalse(self.maintenance.vacuum_in_progress)
+        self.assertEqual(self.maintenance.page_stats()[1], 0)
+        self.assertEqual(conn.execute("PRAGMA auto_vacuum").fetchone()[0], 2)
+
+    def test_run_scheduled_logs_tasks(self):
+        """Une passe planifiée journalise optimize et le contrôle d'intégrité"""
+        results = self.maintenance.run_scheduled()
+
+        self.assertEqual(results["integrity_check"], "ok")
+        self.assertEqual(results["optimize"], "ok")
+        self.assertFalse(self.maintenance.integrity_check_due())
+        self.assertNotIn("integrity_check", self.maintenance.run_scheduled())
+        self.assertIn("Intégrité: ok", self.maintenance.summary())
+
+    def test_rebuild_forces_analyze(self):
+        """Une reconstruction de table force ANALYZE et compactage"""
+        self.db_manager.needs_maintenance = True
+        results = self.maintenance.run_scheduled()
+
+        self.assertEqual(results["analyze"], "ok")
+        self.assertNotIn("inutile", results["vacuum"])
+        self.assertFalse(self.db_manager.needs_maintenance)
+
+    def test_log_table_is_created_once(self):
+        """La lecture du journal n'exécute plus de CREATE TABLE à chaque appel"""
+        statements = []
+        self.db_manager.conn.set_trace_callback(statements.append)
+        try:
+            for _ in range(3):
+                self.maintenance.last_run("vacuum")
+            self.maintenance.integrity_check()
+        finally:
+            self.db_manager.conn.set_trace_callback(None)
+
+        self.assertFalse([sql for sql in statements if "CREATE TABLE" in sql])
+
+
+class TestCy8DatabaseBackup(unittest.TestCase):
+    """Tests des sauvegardes en ligne de la base"""
+
+    def setUp(self):
+        """Base avec quelques prompts"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, "prompts.db")
+        self.db_manager = cy8_database_manager(self.db_path)
+        self.db_manager.init_database()
+        for i in range(5):
+            self.db_manager.create_prompt(f"p{i}", "{}", "{}", "", "", "new", "")
+
+    def tearDown(self):
+        """Nettoyage après tests"""
+        self.db_manager.close()
+        import shutil
+
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_snapshot_is_consistent_copy(self):
+        """L'instantané contient les prompts validés, copiés par pas de pages"""
+        steps = []
+        backup = cy8_database_backup(self.db_path, pages_per_step=1)
+        snapshot = backup.create_snapshot("test", progress_callback=lambda done, total: steps.append(done))
+
+        self.assertTrue(os.path.exists(snapshot))
+        self.assertGreater(len(steps), 1)
+        conn = sqlite3.connect(snapshot)
+        try:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM prompts").fetchone()[0], 6)
+        finally:
+            conn.close()
+
+    def test_rotation_keeps_latest_snapshots(self):
+        """Seuls les `keep` instantanés les plus récents sont conservés"""
+        backup = cy8_database_backup(self.db_path, keep=2)
+        paths = [backup.create_snapshot("test") for _ in range(4)]
+
+        self.assertEqual(sorted(backup.list_snapshots()), sorted(paths[-2:]))
+
+    def test_rotation_ignores_sibling_database_snapshots(self):
+        """Les instantanés de prompts_test partagent le dossier mais ne sont pas ceux de prompts"""
+        import shutil
+
+        sibling = cy8_database_backup(os.path.join(self.temp_dir, "prompts_test.db"), keep=1)
+        shutil.copy(self.db_path, sibling.db_path)
+        sibling_snapshot = sibling.create_snapshot("test")
+
+        backup = cy8_database_backup(self.db_path, keep=1)
+        paths = [backup.create_snapshot("test") for _ in range(3)]
+
+        self.assertEqual(backup.list_snapshots(), paths[-1:])
+        self.assertTrue(os.path.exists(sibling_snapshot))
+        self.assertEqual(sibling.list_snapshots(), [sibling_snapshot])
+
+    def test_destructive_init_takes_snapshot(self):
+        """Recréer la base existante passe d'abord par un instantané"""
+        self.db_manager.close()
+        self.db_manager = cy8_database_manager(self.db_path)
+        self.db_manager.init_database("init")
+
+        snapshots = self.db_manager.backup_manager.list_snapshots()
+        self.assertEqual(len(snapshots), 1)
+        self.assertIn("_init", snapshots[0])
+        self.assertEqual(len(self.db_manager.get_all_prompts()), 1)
+
+    def test_rebuild_streams_rows_by_name(self):
+        """La reconstruction copie les lignes par tranches, colonnes associées par nom"""
+        self.db_manager.close()
+        legacy_path = os.path.join(self.temp_dir, "legacy.db")
+        conn = sqlite3.connect(legacy_path)
+        conn.execute("CREATE TABLE prompts (id INTEGER, status TEXT, name TEXT, image BLOB, workflow JSON)")
+        conn.executemany(
+            "INSERT INTO prompts (id, status, name, image, workflow) VALUES (?, ?, ?, ?, ?)",
+            [(i, "ok" if i % 2 else "", f"legacy{i}", b"x" * 100, "{}") for i in range(1, 12)],
+        )
+        conn.commit()
+        conn.close()
+
+        self.db_manager = cy8_database_manager(legacy_path)
+        self.db_manager._connect()
+        progress = []
+        copied, skipped = self.db_manager._rebuild_prompts_table(lambda done, total: progress.append(done), chunk_size=4)
+
+        self.assertEqual((copied, skipped), (11, 0))
+        self.assertEqual(progress, [4, 8, 11])
+        self.assertTrue(self.db_manager.validate_database_structure()[0])
+        prompt = self.db_manager.get_prompt_by_id(3)
+        self.assertEqual((prompt.name, prompt.status), ("legacy3", "ok"))
+        self.assertEqual(self.db_manager.get_prompt_by_id(2).status, "new")
+        self.assertTrue(self.db_manager.needs_maintenance)
+
+    def test_rebuild_restores_foreign_keys_setting(self):
+        """La reconstruction rétablit le réglage foreign_keys de la connexion au lieu de l'activer"""
+        for setting in (0, 1):
+            self.db_manager.conn.execute(f"PRAGMA foreign_keys={setting}")
+            self.db_manager._rebuild_prompts_table()
+            self.assertEqual(self.db_manager.conn.execute("PRAGMA foreign_keys").fetchone()[0], setting)
+
+
+class TestCy8SweepEngine(unittest.TestCase):
+    """Tests du balayage de paramètres"""
+
+    WORKFLOW = {
+        "3": {"class_type": "KSampler", "inputs": {"seed": 1, "cfg": 7}},
+        "6": {"class_type": "CLIPTextEncode", "inputs": {"text": ""}},
+    }
+    VALUES = {
+        "1": {"id": "6", "type": "prompt", "value": "bottle"},
+        "2": {"id": "3", "type": "seed", "value": 42},
+        "3": {"id": "3", "type": "KSampler.cfg", "value": 7},
+    }
+
+    def setUp(self):
+        """Base avec un prompt à balayer"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_manager = cy8_database_manager(os.path.join(self.temp_dir, "prompts.db"))
+        self.db_manager.init_database()
+        self.prompt_id = self.db_manager.create_prompt(
+            "sweep", json.dumps(self.VALUES), json.dumps(self.WORKFLOW), "", "", "new", ""
+        )
+        self.submitted = []
+
+    def tearDown(self):
+        """Nettoyage après tests"""
+        self.db_manager.close()
+        import shutil
+
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def fake_submit(self, workflow, values, name, timeout, on_queued=None):
+        self.submitted.append(values)
+        if on_queued:
+            on_queued(f"cf_{name}")
+        seed = values["2"]["value"]
+        return "success", "Terminé", f"cf_{name}", [f"/out/{name}_{seed}.png"]
+
+    def test_expand_grid_fixes_seeds(self):
+        """Produit cartésien des axes, graines figées"""
+        variants = expand_grid(self.VALUES, {"2.value": [1, 2], "1": ["a", "b", "c"]})
+
+        self.assertEqual(len(variants), 6)
+        self.assertEqual(variants[0][0], {"2.value": 1, "1.value": "a"})
+        self.assertTrue(all(values["2"]["fixed"] for _, values in variants))
+
+    def test_run_dedupes_and_records_variants(self):
+        """Variantes identiques écartées, paramètres et images enregistrés par variante"""
+        engine = cy8_sweep_engine(self.db_manager, submit=self.fake_submit, max_workers=3)
+        summary = engine.run(self.prompt_id, {"2.value": [1, 2, 1], "3.value": [5, 7.5]})
+
+        self.assertEqual((summary["variants"], summary["duplicates"]), (4, 2))
+        self.assertEqual(sorted(values["2"]["value"] for values in self.submitted), [1, 1, 2, 2])
+
+        executions = self.db_manager.get_prompt_executions(self.prompt_id)
+        self.assertEqual(len(executions), 4)
+        self.assertEqual({execution.status for execution in executions}, {"ok"})
+        self.assertEqual(len({execution.workflow_hash for execution in executions}), 4)
+        parameters = sorted(json.loads(execution.parameters)["3.value"] for execution in executions)
+        self.assertEqual(parameters, [5, 5, 7.5, 7.5])
+        self.assertEqual(len(self.db_manager.get_execution_outputs(executions[0].execution_id)), 1)
+
+    def test_run_spreads_variants_over_backends(self):
+        """Avec un pool, chaque variante reçoit l'adresse d'un backend sain"""
+        from cy6_backend_pool import comfyui_backend_pool
+
+        pool = comfyui_backend_pool(["a:1", "b:2", "down:3"], probe=lambda address: 0 if address != "down:3" else 1 / 0)
+        addresses = []
+
+        def submit(workflow, values, name, timeout, server_address, on_queued):
+            addresses.append(server_address)
+            return self.fake_submit(workflow, values, name, timeout, on_queued)
+
+        engine = cy8_sweep_engine(self.db_manager, submit=submit, backend_pool=pool)
+        summary = engine.run(self.prompt_id, {"3.value": [1, 2, 3, 4]})
+
+        self.assertEqual(engine.max_workers, cy8_sweep_engine.MAX_WORKERS * 3)
+        self.assertEqual(len(summary["results"]), 4)
+        self.assertEqual(set(addresses) - {"a:1", "b:2"}, set())
+        self.assertEqual(sum(backend.in_flight for backend in pool.backends), 0)
+
+    def test_run_groups_variants_by_checkpoint(self):
+        """Les variantes d'un même checkpoint sont soumises à la suite, rechargements comptés"""
+        workflow = dict(self.WORKFLOW, **{"4": {"class_type": "CheckpointLoaderSimple", "inputs": {"ckpt_name": ""}}})
+        values = dict(self.VALUES, **{"4": {"id": "4", "type": "CheckpointLoaderSimple", "ckpt_name": "a.ckpt"}})
+        self.db_manager.update_prompt(self.prompt_id, "sweep", json.dumps(values), json.dumps(workflow), "", "", "", "new")
+
+        engine = cy8_sweep_engine(self.db_manager, submit=self.fake_submit, max_workers=1)
+        summary = engine.run(self.prompt_id, {"3.value": [1, 2, 3], "4.ckpt_name": ["a.ckpt", "b.ckpt"]})
+
+        self.assertEqual([values["4"]["ckpt_name"] for values in self.submitted], ["a.ckpt"] * 3 + ["b.ckpt"] * 3)
+        self.assertEqual(summary["reloads"], {"jobs": 6, "reloads": 2, "fifo_reloads": 6, "saved": 4})
+
+
+    def test_variant_is_recoverable_while_running(self):
+        """L'ID ComfyUI d'une variante est noté dès sa mise en file (clôture par réconciliation après un arrêt)"""
+        pending_during_run = []
+
+        def submit(workflow, values, name, timeout, on_queued):
+            on_queued(f"cf_{name}")
+            pending_during_run.extend(self.db_manager.get_pending_executions())
+            return "disconnected", "WebSocket perdue", f"cf_{name}", []
+
+        summary = cy8_sweep_engine(self.db_manager, submit=submit).run(self.prompt_id, {"3.value": [1]})
+
+        execution_id = summary["results"][0]["execution_id"]
+        self.assertEqual(pending_during_run, [(execution_id, self.prompt_id, "cf_sweep_0000", None)])
+        self.assertEqual([row[0] for row in self.db_manager.get_pending_executions()], [execution_id])
+
+    def test_invalid_variants_are_not_submitted(self):
+        """Les variantes refusées par le validateur sont enregistrées sans soumission"""
+        engine = cy8_sweep_engine(
+            self.db_manager,
+            submit=self.fake_submit,
+            validator=lambda workflow: ["cfg hors bornes"] if workflow["3"]["inputs"]["cfg"] > 10 else [],
+        )
+        summary = engine.run(self.prompt_id, {"3.value": [5, 50]})
+
+        self.assertEqual((summary["invalid"], len(self.submitted)), (1, 1))
+        statuses = {json.loads(e.parameters)["3.value"]: e.status for e in self.db_manager.get_prompt_executions(self.prompt_id)}
+        self.assertEqual(statuses, {5: "ok", 50: "invalid"})
+
+
+class TestCy8ResultCache(unittest.TestCase):
+    """Tests du cache de résultats par empreinte de workflow"""
+
+    def setUp(self):
+        """Base avec une exécution réussie et ses images sur le disque"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_manager = cy8_database_manager(os.path.join(self.temp_dir, "prompts.db"))
+        self.db_manager.init_database()
+        self.prompt_id = self.db_manager.create_prompt(
+            "cache", json.dumps(TestCy8SweepEngine.VALUES), json.dumps(TestCy8SweepEngine.WORKFLOW), "", "", "new", ""
+        )
+        self.images = [os.path.join(self.temp_dir, f"img_{index}.png") for index in range(2)]
+        for path in self.images:
+            with open(path, "wb") as f:
+                f.write(b"png")
+        self.db_manager.start_execution_record(self.prompt_id, "exec_1")
+        self.db_manager.finish_execution_record("exec_1", "ok", "2 images", "cf_1", self.images)
+        self.cache = cy8_result_cache(self.db_manager)
+
+    def tearDown(self):
+        """Nettoyage après tests"""
+        self.db_manager.close()
+        import shutil
+
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_hit_returns_existing_outputs(self):
+        """Une empreinte connue renvoie les images de l'exécution d'origine"""
+        self.assertIsNone(self.cache.lookup("abc"))
+        self.cache.store("abc", "exec_1", self.images)
+        self.assertEqual(self.cache.lookup("abc"), self.images)
+        self.assertEqual(self.cache.lookup("abc"), self.images)
+        hits = self.db_manager.conn.execute("SELECT hits FROM result_cache WHERE workflow_hash='abc'").fetchone()[0]
+        self.assertEqual(hits, 2)
+
+    def test_missing_file_evicts_entry(self):
+        """Une image supprimée du disque évince l'entrée"""
+        self.cache.store("abc", "exec_1", self.images)
+        os.remove(self.images[1])
+        self.assertIsNone(self.cache.lookup("abc"))
+        self.assertIsNone(self.db_manager.get_cached_result("abc"))
+
+    def test_sweep_rerun_uses_cache(self):
+        """Un balayage relancé reprend les variantes déjà produites sans soumission"""
+        submitted = []
+
+        def submit(workflow, values, name, timeout, on_queued):
+            submitted.append(name)
+            path = os.path.join(self.temp_dir, f"{name}.png")
+            with open(path, "wb") as f:
+                f.write(b"png")
+            return "success", "Terminé", f"cf_{name}", [path]
+
+        engine = cy8_sweep_engine(self.db_manager, submit=submit, result_cache=self.cache)
+        grid = {"3.value": [4, 5]}
+        self.assertEqual(engine.run(self.prompt_id, grid)["cached"], 0)
+        summary = engine.run(self.prompt_id, grid)
+
+        self.assertEqual(len(submitted), 2)
+        self.assertEqual(summary["cached"], 2)
+        self.assertEqual({result["status"] for result in summary["results"]}, {"ok"})
+        self.assertEqual(len(summary["results"][0]["outputs"]), 1)
+
+
+class TestCy8HistoryReconciler(unittest.TestCase):
+    """Tests de la réconciliation des exécutions en attente avec /history"""
+
+    def setUp(self):
+        """Base avec des exécutions en file sur deux backends"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_manager = cy8_database_manager(os.path.join(self.temp_dir, "prompts.db"))
+        self.db_manager.init_database()
+        self.prompt_id = self.db_manager.create_prompt("reconcile", "{}", "{}", "", "", "new", "")
+        for execution_id, comfyui_prompt_id, backend in [
+            ("exec_ok", "cf_ok", "a:1"),
+            ("exec_error", "cf_error", "a:1"),
+            ("exec_running", "cf_running", "a:1"),
+            ("exec_other", "cf_other", "b:2"),
+        ]:
+            self.db_manager.start_execution_record(self.prompt_id, execution_id)
+            self.db_manager.mark_execution_queued(execution_id, comfyui_prompt_id, backend)
+        # Exécution démarrée mais jamais mise en file: rien à réconcilier
+        self.db_manager.start_execution_record(self.prompt_id, "exec_not_queued")
+        self.listings = {
+            "a:1": {"cf_ok": {"outcome": "success"}, "cf_error": {"outcome": "error"}, "cf_unrelated": {}},
+            "b:2": {"cf_other": {"outcome": "success"}},
+        }
+        # Prompts en file ou en cours (/queue) et entrées hors de la fenêtre /history?max_items
+        self.queued = {"a:1": {"cf_running"}, "b:2": set()}
+        self.older_history = {}
+        self.calls = []
+
+    def tearDown(self):
+        """Nettoyage après tests"""
+        self.db_manager.close()
+        import shutil
+
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def make_reconciler(self):
+        def fetch_listing(max_items, address):
+            self.calls.append(address)
+            return self.listings[address]
+
+        return cy8_history_reconciler(
+            self.db_manager,
+            fetch_listing=fetch_listing,
+            fetch_outputs=lambda prompt_id, history, address: [f"/out/{prompt_id}.png"],
+            outcome=lambda history: (history["outcome"], "message"),
+            fetch_history=lambda prompt_id, address: self.older_history.get(prompt_id),
+            fetch_queued=lambda address: self.queued[address],
+        )
+
+    def test_one_request_per_backend_resolves_completed(self):
+        """Une requête /history par backend clôture toutes les exécutions terminées"""
+        resolved = self.make_reconciler().reconcile()
+
+        self.assertEqual(sorted(self.calls), ["a:1", "b:2"])
+        self.assertEqual(
+            sorted((result["execution_id"], result["status"]) for result in resolved),
+            [("exec_error", "error"), ("exec_ok", "ok"), ("exec_other", "ok")],
+        )
+        self.assertEqual(self.db_manager.get_execution_outputs("exec_ok"), ["/out/cf_ok.png"])
+        pending = [row[0] for row in self.db_manager.get_pending_executions()]
+        self.assertEqual(pending, ["exec_running"])
+
+    def test_finished_execution_is_not_closed_twice(self):
+        """Une exécution déjà clôturée par le suivi direct n'est pas reprise"""
+        self.assertTrue(self.db_manager.finish_execution_record("exec_ok", "ok", "direct", "cf_ok", ["/out/direct.png"]))
+        resolved = self.make_reconciler().reconcile()
+
+        self.assertNotIn("exec_ok", [result["execution_id"] for result in resolved])
+        self.assertFalse(self.db_manager.finish_execution_record("exec_ok", "ok", "encore", "cf_ok", ["/out/x.png"]))
+        self.assertEqual(self.db_manager.get_execution_outputs("exec_ok"), ["/out/direct.png"])
+
+    def test_unreachable_backend_is_skipped(self):
+        """Un backend injoignable n'empêche pas de réconcilier les autres"""
+        del self.listings["a:1"]
+        resolved = self.make_reconciler().reconcile()
+        self.assertEqual([result["execution_id"] for result in resolved], ["exec_other"])
+
+    def test_execution_outside_listing_window_is_resolved(self):
+        """Une exécution plus ancienne que la fenêtre /history est retrouvée par son propre /history"""
+        del self.listings["a:1"]["cf_ok"]
+        self.older_history["cf_ok"] = {"outcome": "success"}
+
+        resolved = {result["execution_id"]: result["status"] for result in self.make_reconciler().reconcile()}
+
+        self.assertEqual(resolved["exec_ok"], "ok")
+        self.assertEqual(self.db_manager.get_execution_outputs("exec_ok"), ["/out/cf_ok.png"])
+        self.assertNotIn("exec_running", resolved)
+
+    def test_prompt_lost_by_comfyui_fails(self):
+        """Un prompt absent de /history et de /queue (ComfyUI redémarré) fait échouer son exécution"""
+        self.queued["a:1"] = set()
+
+        resolved = {result["execution_id"]: result for result in self.make_reconciler().reconcile()}
+
+        self.assertEqual(resolved["exec_running"]["status"], "error")
+        self.assertIn("perdu", resolved["exec_running"]["message"])
+        self.assertEqual(self.db_manager.get_pending_executions(), [])
+
+
+class TestCy8JobQueue(unittest.TestCase):
+    """Tests de la file d'exécutions persistante"""
+
+    def setUp(self):
+        """Base temporaire et file vide"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, "prompts.db")
+        self.db_manager = cy8_database_manager(self.db_path)
+        self.db_manager.init_database()
+        self.prompt_id = self.db_manager.create_prompt("jobs", "{}", "{}", "", "", "new", "")
+        self.queue = cy8_job_queue(self.db_manager)
+
+    def tearDown(self):
+        """Nettoyage après tests"""
+        self.db_manager.close()
+        import shutil
+
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_claim_groups_by_checkpoint(self):
+        """Les travaux du checkpoint chargé passent devant, dans la limite de la borne de famine"""
+        queue = cy8_job_queue(self.db_manager, max_skips=1)
+        queue.enqueue(self.prompt_id, "exec_a1", "a.safetensors")
+        queue.enqueue(self.prompt_id, "exec_b1", "b.safetensors")
+        queue.enqueue(self.prompt_id, "exec_a2", "a.safetensors")
+        queue.enqueue(self.prompt_id, "exec_b2", "b.safetensors")
+
+        claimed = [queue.claim_next("b.safetensors")["execution_id"]]
+        # exec_a1 a été dépassé une fois: la borne (persistée) l'impose au choix suivant
+        claimed.append(queue.claim_next("b.safetensors")["execution_id"])
+        claimed.append(queue.claim_next("a.safetensors")["execution_id"])
+        claimed.append(queue.claim_next("a.safetensors")["execution_id"])
+        self.assertEqual(claimed, ["exec_b1", "exec_a1", "exec_a2", "exec_b2"])
+        self.assertIsNone(queue.claim_next())
+        self.assertEqual(queue.count_by_state(), {"submitted": 4})
+        self.assertEqual([job["execution_id"] for job in queue.list_jobs(limit=2)], ["exec_a1", "exec_b1"])
+        self.assertEqual(queue.get_job("exec_b1")["attempts"], 1)
+
+    def test_claim_reads_only_indexed_rows(self):
+        """Schéma créé une fois ; la prise d'un travail passe par les index, sans parcourir toute la file"""
+        for index in range(50):
+            self.queue.enqueue(self.prompt_id, f"exec_{index}", "a.safetensors" if index % 2 else "b.safetensors")
+        statements = []
+        self.db_manager.conn.set_trace_callback(statements.append)
+        try:
+            self.assertEqual(self.queue.claim_next("a.safetensors")["execution_id"], "exec_1")
+            self.assertFalse(self.queue.is_cancelled("exec_1"))
+        finally:
+            self.db_manager.conn.set_trace_callback(None)
+
+        self.assertFalse([sql for sql in statements if "CREATE" in sql or "PRAGMA" in sql])
+        selects = [sql for sql in statements if sql.startswith("SELECT") and "execution_jobs" in sql]
+        for sql in selects:
+            plan = " ".join(row[3] for row in self.db_manager.conn.execute("EXPLAIN QUERY PLAN " + sql))
+            self.assertNotIn("SCAN execution_jobs", plan, sql)
+
+    def test_priority_and_cancel(self):
+        """Un travail urgent passe devant ; un travail en attente peut être annulé ou reprioritisé"""
+        from cy6_backend_pool import PRIORITY_LOW, PRIORITY_URGENT
+
+        self.queue.enqueue(self.prompt_id, "exec_batch", priority=PRIORITY_LOW)
+        self.queue.enqueue(self.prompt_id, "exec_normal")
+        self.queue.enqueue(self.prompt_id, "exec_urgent", priority=PRIORITY_URGENT)
+        self.queue.enqueue(self.prompt_id, "exec_cancelled")
+
+        self.assertTrue(self.queue.cancel_pending("exec_cancelled"))
+        self.assertTrue(self.queue.is_cancelled("exec_cancelled"))
+        self.assertTrue(self.queue.set_priority("exec_batch", PRIORITY_URGENT))
+        claimed = [self.queue.claim_next()["execution_id"] for _ in range(3)]
+        self.assertEqual(claimed, ["exec_batch", "exec_urgent", "exec_normal"])
+        self.assertIsNone(self.queue.claim_next())
+        # Travail déjà pris: ni annulation locale ni changement de priorité
+        self.assertFalse(self.queue.cancel_pending("exec_normal"))
+        self.assertFalse(self.queue.set_priority("exec_normal", PRIORITY_LOW))
+
+        # Annulation d'un travail actif, puis exécution clôturée comme interrompue
+        self.db_manager.start_execution_record(self.prompt_id, "exec_urgent")
+        self.assertTrue(self.queue.mark_cancelled("exec_urgent"))
+        self.db_manager.finish_execution_record("exec_urgent", "interrupted", "Annulé")
+        self.db_manager.start_execution_record(self.prompt_id, "exec_normal")
+        self.db_manager.finish_execution_record("exec_normal", "interrupted", "Interrompu")
+        self.queue.sync_with_executions()
+        self.assertEqual(self.queue.get_job("exec_urgent")["state"], "cancelled")
+        self.assertEqual(self.queue.get_job("exec_normal")["state"], "cancelled")
+
+    def test_requeue_when_backends_are_unavailable(self):
+        """Un travail pris sans backend disponible retourne en attente, sans enregistrement orphelin"""
+        self.queue.enqueue(self.prompt_id, "exec_paused")
+        self.queue.claim_next()
+        self.db_manager.start_execution_record(self.prompt_id, "exec_paused")
+
+        self.assertTrue(self.queue.requeue("exec_paused"))
+        self.assertEqual(self.queue.get_job("exec_paused")["state"], "pending")
+        self.assertEqual(self.db_manager.conn.execute("SELECT COUNT(*) FROM prompt_executions").fetchone()[0], 0)
+        # Un travail accepté par ComfyUI n'est jamais remis en attente
+        self.queue.claim_next()
+        self.queue.mark_submitted("exec_paused", "cf_paused", "a:1")
+        self.assertFalse(self.queue.requeue("exec_paused"))
+
+    def test_cancel_during_submit_is_kept(self):
+        """Une annulation reçue pendant la soumission n'est pas écrasée par la confirmation de ComfyUI"""
+        self.queue.enqueue(self.prompt_id, "exec_racing")
+        self.queue.claim_next()
+        self.assertTrue(self.queue.mark_cancelled("exec_racing"))
+
+        self.assertFalse(self.queue.mark_submitted("exec_racing", "cf_racing", "a:1"))
+        self.assertTrue(self.queue.is_cancelled("exec_racing"))
+        self.assertIsNone(self.queue.get_job("exec_racing")["comfyui_prompt_id"])
+
+    def test_sync_closes_finished_jobs(self):
+        """Les travaux suivent la clôture de leur exécution"""
+        for execution_id in ("exec_ok", "exec_error", "exec_running"):
+            self.queue.enqueue(self.prompt_id, execution_id)
+            job = self.queue.claim_next()
+            self.db_manager.start_execution_record(self.prompt_id, job["execution_id"])
+            self.queue.mark_submitted(job["execution_id"], f"cf_{execution_id}", "a:1")
+        self.queue.mark_running("exec_running")
+        self.db_manager.finish_execution_record("exec_ok", "ok", "Succès")
+        self.db_manager.finish_execution_record("exec_error", "error", "Erreur")
+
+        self.assertEqual(self.queue.sync_with_executions(), 2)
+        self.assertEqual(self.queue.get_job("exec_ok")["state"], "done")
+        self.assertEqual(self.queue.get_job("exec_error")["state"], "failed")
+        self.assertEqual(self.queue.get_job("exec_error")["message"], "Erreur")
+        running = self.queue.get_job("exec_running")
+        self.assertEqual((running["state"], running["backend"]), ("running", "a:1"))
+
+    def test_recover_after_restart(self):
+        """Redémarrage: un travail jamais accepté par ComfyUI repart en attente, les autres restent suivis"""
+        self.queue.enqueue(self.prompt_id, "exec_lost")
+        self.queue.enqueue(self.prompt_id, "exec_tracked")
+        self.queue.enqueue(self.prompt_id, "exec_waiting")
+        for _ in range(2):
+            job = self.queue.claim_next()
+            self.db_manager.start_execution_record(self.prompt_id, job["execution_id"])
+        self.queue.mark_submitted("exec_tracked", "cf_tracked", "a:1")
+        self.db_manager.mark_execution_queued("exec_tracked", "cf_tracked", "a:1")
+        self.db_manager.close()
+
+        db_manager = cy8_database_manager(self.db_path)
+        db_manager.init_database(mode="dev")
+        self.db_manager = db_manager
+        queue = cy8_job_queue(db_manager)
+        self.assertEqual(queue.recover(), (1, 1))
+        self.assertEqual(
+            [job["execution_id"] for job in queue.list_jobs(["pending"])], ["exec_lost", "exec_waiting"]
+        )
+        # L'enregistrement orphelin de la tentative interrompue est supprimé, l'exécution suivie est conservée
+        execution_ids = [row[0] for row in db_manager.conn.execute("SELECT execution_id FROM prompt_executions")]
+        self.assertEqual(execution_ids, ["exec_tracked"])
+        self.assertEqual([job[0] for job in db_manager.get_pending_executions()], ["exec_tracked"])
+
+
 class TestCy8Integration(unittest.TestCase):
     """Tests d'intégration du système cy8"""
 
@@ -322,6 +1135,13 @@ def run_tests():
 
     # Ajouter les tests
     test_suite.addTests(loader.loadTestsFromTestCase(TestCy8DatabaseManager))
+    test_suite.addTests(loader.loadTestsFromTestCase(TestCy8ArchiveManager))
+    test_suite.addTests(loader.loadTestsFromTestCase(TestCy8DatabaseMaintenance))
+    test_suite.addTests(loader.loadTestsFromTestCase(TestCy8DatabaseBackup))
+    test_suite.addTests(loader.loadTestsFromTestCase(TestCy8SweepEngine))
+    test_suite.addTests(loader.loadTestsFromTestCase(TestCy8ResultCache))
+    test_suite.addTests(loader.loadTestsFromTestCase(TestCy8HistoryReconciler))
+    test_suite.addTests(loader.loadTestsFromTestCase(TestCy8JobQueue))
     test_suite.addTests(loader.loadTestsFromTestCase(TestCy8Integration))
     test_suite.addTests(loader.loadTestsFromTestCase(TestCy8DataStructures))
 
@@ -0,0 +1,687 @@
+#!/usr/bin/env python3
+"""
+Serveur ComfyUI factice pour les tests et les benchmarks (sans GPU ni ComfyUI installé)
+
+Implémente /prompt, /history, /view, /queue, /interrupt, /object_info, /system_stats
+et le flux d'événements /ws (WebSocket RFC 6455 écrite à la main, bibliothèque standard seulement).
+Les prompts sont exécutés un par un comme dans ComfyUI, avec une latence par node configurable,
+des erreurs injectées et des images PNG générées.
+
+Utilisation dans un test:
+    with fake_comfyui_server(node_latency=0.01) as server:
+        task.server_address = server.address
+
+En ligne de commande (remplace ComfyUI pour l'application ou les tests de connexion):
+    python tests/fake_comfyui_server.py --port 8188 --latency 0.2
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import zlib
+import base64
+import random
+import struct
+import socket
+import hashlib
+import argparse
+import threading
+import collections
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+# Schéma /object_info minimal des nodes courants: classe -> (entrées requises, sorties, node de sortie)
+DEFAULT_NODES = {
+    "CheckpointLoaderSimple": ({"ckpt_name": [["model.safetensors"]]}, ["MODEL", "CLIP", "VAE"], False),
+    "LoraLoader": (
+        {
+            "model": ["MODEL"],
+            "clip": ["CLIP"],
+            "lora_name": [["lora.safetensors"]],
+            "strength_model": ["FLOAT"],
+            "strength_clip": ["FLOAT"],
+        },
+        ["MODEL", "CLIP"],
+        False,
+    ),
+    "CLIPTextEncode": ({"text": ["STRING"], "clip": ["CLIP"]}, ["CONDITIONING"], False),
+    "EmptyLatentImage": ({"width": ["INT"], "height": ["INT"], "batch_size": ["INT"]}, ["LATENT"], False),
+    "KSampler": (
+        {
+            "model": ["MODEL"],
+            "seed": ["INT"],
+            "steps": ["INT"],
+            "cfg": ["FLOAT"],
+            "sampler_name": [["euler"]],
+            "scheduler": [["normal"]],
+            "positive": ["CONDITIONING"],
+            "negative": ["CONDITIONING"],
+            "latent_image": ["LATENT"],
+            "denoise": ["FLOAT"],
+        },
+        ["LATENT"],
+        False,
+    ),
+    "VAEDecode": ({"samples": ["LATENT"], "vae": ["VAE"]}, ["IMAGE"], False),
+    "SaveImage": ({"images": ["IMAGE"], "filename_prefix": ["STRING"]}, [], True),
+    "PreviewImage": ({"images": ["IMAGE"]}, [], True),
+}
+
+
+def default_object_info():
+    """Réponse /object_info au format ComfyUI pour DEFAULT_NODES"""
+    object_info = {}
+    for class_type, (required, outputs, output_node) in DEFAULT_NODES.items():
+        object_info[class_type] = {
+            "input": {"required": dict(required), "optional": {}},
+            "output": list(outputs),
+            "output_name": list(outputs),
+            "name": class_type,
+            "display_name": class_type,
+            "category": "fake",
+            "output_node": output_node,
+        }
+    return object_info
+
+
+def make_png(width, height, rgb):
+    """Image PNG unie (RGB 8 bits) sans dépendance externe"""
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+    row = b"\x00" + bytes(rgb) * width
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    pixels = zlib.compress(row * height)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", pixels) + chunk(b"IEND", b"")
+
+
+def basic_workflow(checkpoint="model.safetensors", steps=20):
+    """Workflow API text-to-image standard de ComfyUI (nodes 3 à 9)"""
+    return {
+        "3": {
+            "class_type": "KSampler",
+            "inputs": {
+                "seed": 1,
+                "steps": steps,
+                "cfg": 8.0,
+                "sampler_name": "euler",
+                "scheduler": "normal",
+                "denoise": 1.0,
+                "model": ["4", 0],
+                "positive": ["6", 0],
+                "negative": ["7", 0],
+                "latent_image": ["5", 0],
+            },
+        },
+        "4": {"class_type": "CheckpointLoaderSimple", "inputs": {"ckpt_name": checkpoint}},
+        "5": {"class_type": "EmptyLatentImage", "inputs": {"width": 512, "height": 512, "batch_size": 1}},
+        "6": {"class_type": "CLIPTextEncode", "inputs": {"text": "", "clip": ["4", 1]}},
+        "7": {"class_type": "CLIPTextEncode", "inputs": {"text": "", "clip": ["4", 1]}},
+        "8": {"class_type": "VAEDecode", "inputs": {"samples": ["3", 0], "vae": ["4", 2]}},
+        "9": {"class_type": "SaveImage", "inputs": {"filename_prefix": "ComfyUI", "images": ["8", 0]}},
+    }
+
+
+def basic_values(positive="glass bottle landscape", negative="text, watermark"):
+    """Valeurs d'un prompt pour basic_workflow (format values de la base, seed tiré à chaque patch)"""
+    return {
+        "1": {"id": "6", "type": "prompt", "value": positive},
+        "2": {"id": "7", "type": "prompt", "value": negative},
+        "3": {"id": "3", "type": "seed", "value": 0},
+    }
+
+
+def is_link(value):
+    return isinstance(value, list) and len(value) == 2 and isinstance(value[1], int) and not isinstance(value[1], bool)
+
+
+def execution_order(prompt):
+    """Ordre topologique des nodes (les sources d'un lien avant leurs destinations)"""
+    order, visiting, done = [], set(), set()
+
+    def visit(node_id):
+        if node_id in done or node_id in visiting or node_id not in prompt:
+            return
+        visiting.add(node_id)
+        for value in (prompt[node_id].get("inputs") or {}).values():
+            if is_link(value):
+                visit(str(value[0]))
+        visiting.discard(node_id)
+        done.add(node_id)
+        order.append(node_id)
+
+    for node_id in sorted(prompt, key=lambda key: (len(key), key)):
+        visit(node_id)
+    return order
+
+
+class fake_websocket:
+    """Connexion WebSocket côté serveur (trames texte non masquées vers le client)"""
+
+    def __init__(self, connection, rfile):
+        self.connection = connection
+        self.rfile = rfile
+        self.closed = False
+        self._send_lock = threading.Lock()
+
+    def send_text(self, text):
+        self._send_frame(0x1, text.encode("utf-8"))
+
+    def _send_frame(self, opcode, payload):
+        length = len(payload)
+        if length < 126:
+            header = struct.pack(">BB", 0x80 | opcode, length)
+        elif length < 65536:
+            header = struct.pack(">BBH", 0x80 | opcode, 126, length)
+        else:
+            header = struct.pack(">BBQ", 0x80 | opcode, 127, length)
+        with self._send_lock:
+            if self.closed:
+                return
+            try:
+                self.connection.sendall(header + payload)
+            except OSError:
+                self.closed = True
+
+    def read_frame(self):
+        """Trame suivante du client (opcode, données démasquées) ; None si la connexion est fermée"""
+        head = self.rfile.read(2)
+        if len(head) < 2:
+            return None
+        opcode, length = head[0] & 0x0F, head[1] & 0x7F
+        if length == 126:
+            length = struct.unpack(">H", self.rfile.read(2))[0]
+        elif length == 127:
+            length = struct.unpack(">Q", self.rfile.read(8))[0]
+        mask = self.rfile.read(4) if head[1] & 0x80 else b"\x00\x00\x00\x00"
+        data = self.rfile.read(length)
+        return opcode, bytes(byte ^ mask[index % 4] for index, byte in enumerate(data))
+
+    def serve(self):
+        """Lire les trames du client jusqu'à la fermeture (ping -> pong, close -> close)"""
+        while not self.closed:
+            try:
+                frame = self.read_frame()
+            except OSError:
+                break
+            if frame is None:
+                break
+            opcode, data = frame
+            if opcode == 0x8:
+                self._send_frame(0x8, data[:2])
+                break
+            if opcode == 0x9:
+                self._send_frame(0xA, data)
+        self.close()
+
+    def close(self):
+        with self._send_lock:
+            self.closed = True
+        try:
+            self.connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+class fake_comfyui_server:
+    """
+    ComfyUI factice dans un thread.
+    node_latency: secondes par node exécuté ; latencies: {class_type: secondes} (prioritaire)
+    fail_nodes: class_type ou node_id qui lèvent une erreur d'exécution
+    fail_rate / reject_rate: probabilité qu'un prompt échoue à l'exécution / soit refusé (HTTP 400)
+    progress_steps: nombre maximal de messages 'progress' par sampler
+    """
+
+    def __init__(
+        self,
+        host="127.0.0.1",
+        port=0,
+        node_latency=0.0,
+        latencies=None,
+        fail_nodes=(),
+        fail_rate=0.0,
+        reject_rate=0.0,
+        object_info=None,
+        version="0.3.fake",
+        image_size=(64, 64),
+        progress_steps=5,
+        seed=None,
+    ):
+        self.host = host
+        self.port = port
+        self.node_latency = node_latency
+        self.latencies = dict(latencies or {})
+        self.fail_nodes = set(fail_nodes)
+        self.fail_rate = fail_rate
+        self.reject_rate = reject_rate
+        self.object_info = object_info or default_object_info()
+        self.version = version
+        self.image_size = image_size
+        self.progress_steps = progress_steps
+        self.random = random.Random(seed)
+
+        self._lock = threading.Lock()
+        self._work = threading.Condition(self._lock)
+        self._pending = collections.OrderedDict()  # prompt_id -> (numéro, prompt, client_id)
+        self._running = None  # (numéro, prompt_id, prompt, client_id)
+        self._interrupt = False
+        self._number = 0
+        self.history = collections.OrderedDict()
+        self.completed_at = {}  # prompt_id -> time.monotonic() de la fin (mesure de latence de notification)
+        self.images = {}  # (type, sous-dossier, fichier) -> PNG
+        self._signatures = set()  # Nodes déjà exécutés (cache ComfyUI)
+        self._websockets = collections.defaultdict(list)  # client_id -> [fake_websocket]
+        self.requests = collections.Counter()  # (méthode, chemin) -> nombre d'appels
+        self._httpd = None
+        self._threads = []
+        self._stopped = threading.Event()
+
+    # === Cycle de vie ===
+
+    @property
+    def address(self):
+        return f"{self.host}:{self.port}"
+
+    def start(self):
+        server = self
+
+        class handler(fake_comfyui_handler):
+            fake = server
+
+        self._httpd = ThreadingHTTPServer((self.host, self.port), handler)
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+        self._stopped.clear()
+        for target, name in ((self._httpd.serve_forever, "http"), (self._execute_loop, "exec")):
+            thread = threading.Thread(target=target, daemon=True, name=f"fake-comfyui-{name}")
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        with self._work:
+            self._work.notify_all()
+        self.drop_websockets()
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+        for thread in self._threads:
+            thread.join(5)
+        self._threads = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    def drop_websockets(self):
+        """Couper toutes les connexions WebSocket (simulation d'une coupure réseau)"""
+        with self._lock:
+            connections = [ws for sockets in self._websockets.values() for ws in sockets]
+        for ws in connections:
+            ws.close()
+
+    def wait_idle(self, timeout=10):
+        """Attendre que la file soit vide et qu'aucun prompt ne s'exécute"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                if not self._pending and self._running is None:
+                    return True
+            time.sleep(0.01)
+        return False
+
+    # === API ===
+
+    def system_stats(self):
+        return {
+            "system": {"os": os.name, "python_version": sys.version.split()[0], "comfyui_version": self.version},
+            "devices": [{"name": "fake", "type": "cpu", "vram_total": 0, "vram_free": 0}],
+        }
+
+    def queue_prompt(self, payload):
+        """POST /prompt: (status HTTP, réponse)"""
+        prompt = payload.get("prompt")
+        if not isinstance(prompt, dict) or not prompt:
+            return 400, {"error": {"type": "invalid_prompt", "message": "Prompt vide"}, "node_errors": {}}
+        node_errors = {
+            node_id: {"errors": [{"type": "invalid_class", "message": f"classe {node.get('class_type')} inconnue"}]}
+            for node_id, node in prompt.items()
+            if node.get("class_type") not in self.object_info
+        }
+        if node_errors or self.random.random() < self.reject_rate:
+            error = {"type": "prompt_outputs_failed_validation", "message": "Prompt outputs failed validation"}
+            return 400, {"error": error, "node_errors": node_errors}
+        prompt_id = str(uuid.uuid4())
+        with self._work:
+            self._number += 1
+            number = self._number
+            self._pending[prompt_id] = (number, prompt, payload.get("client_id"))
+            self._work.notify_all()
+        return 200, {"prompt_id": prompt_id, "number": number, "node_errors": {}}
+
+    def queue(self):
+        with self._lock:
+            running = [list(self._running) + [[]]] if self._running else []
+            pending = [[number, prompt_id, prompt, {"client_id": client_id}, []]
+                       for prompt_id, (number, prompt, client_id) in self._pending.items()]
+        return {"queue_running": running, "queue_pending": pending}
+
+    def delete_queued(self, payload):
+        with self._lock:
+            if payload.get("clear"):
+                self._pending.clear()
+            for prompt_id in payload.get("delete") or []:
+                self._pending.pop(prompt_id, None)
+
+    def interrupt(self, payload):
+        with self._lock:
+            prompt_id = (payload or {}).get("prompt_id")
+            if self._running and (prompt_id is None or self._running[1] == prompt_id):
+                self._interrupt = True
+
+    def history_entries(self, prompt_id=None, max_items=None):
+        with self._lock:
+            if prompt_id is not None:
+                return {prompt_id: self.history[prompt_id]} if prompt_id in self.history else {}
+            items = list(self.history.items())
+        if max_items:
+            items = items[-max_items:]
+        return dict(items)
+
+    # === Événements ===
+
+    def register_websocket(self, client_id, ws):
+        with self._lock:
+            self._websockets[client_id].append(ws)
+            remaining = len(self._pending) + (1 if self._running else 0)
+        ws.send_text(json.dumps({"type": "status", "data": {"status": {"exec_info": {"queue_remaining": remaining}},
+                                                            "sid": client_id}}))
+
+    def unregister_websocket(self, client_id, ws):
+        with self._lock:
+            if ws in self._websockets.get(client_id, []):
+                self._websockets[client_id].remove(ws)
+
+    def send(self, client_id, message_type, data):
+        with self._lock:
+            connections = list(self._websockets.get(client_id, []))
+        text = json.dumps({"type": message_type, "data": data})
+        for ws in connections:
+            ws.send_text(text)
+
+    # === Exécution ===
+
+    def _latency(self, node):
+        return self.latencies.get(node.get("class_type"), self.node_latency)
+
+    def _signature(self, prompt, node_id, memo):
+        """Empreinte d'un node et de ses entrées (liens résolus): sert au cache des nodes"""
+        if node_id not in memo:
+            memo[node_id] = None  # Cycle: aucune mise en cache
+            node = prompt.get(node_id) or {}
+            inputs = {}
+            for name, value in sorted((node.get("inputs") or {}).items()):
+                inputs[name] = self._signature(prompt, str(value[0]), memo) if is_link(value) else value
+            memo[node_id] = hashlib.sha1(
+                json.dumps([node.get("class_type"), inputs], sort_keys=True, default=str).encode("utf-8")
+            ).hexdigest()
+        return memo[node_id]
+
+    def _execute_loop(self):
+        while not self._stopped.is_set():
+            with self._work:
+                while not self._pending and not self._stopped.is_set():
+                    self._work.wait(0.5)
+                if self._stopped.is_set():
+                    return
+                prompt_id, (number, prompt, client_id) = self._pending.popitem(last=False)
+                self._running = (number, prompt_id, prompt, client_id)
+                self._interrupt = False
+            try:
+                self._execute(number, prompt_id, prompt, client_id)
+            finally:
+                with self._lock:
+                    self._running = None
+
+    def _execute(self, number, prompt_id, prompt, client_id):
+        messages = []
+
+        def emit(message_type, data, record=False):
+            data = dict(data, prompt_id=prompt_id)
+            if record:
+                messages.append([message_type, dict(data, timestamp=int(time.time() * 1000))])
+            self.send(client_id, message_type, data)
+
+        emit("execution_start", {"timestamp": int(time.time() * 1000)}, record=True)
+        order = execution_order(prompt)
+        memo = {}
+        output_nodes = {
+            node_id for node_id in order
+            if (self.object_info.get(prompt[node_id].get("class_type")) or {}).get("output_node")
+        }
+        cached = [
+            node_id for node_id in order
+            if node_id not in output_nodes and self._signature(prompt, node_id, memo) in self._signatures
+        ]
+        emit("execution_cached", {"nodes": cached, "timestamp": int(time.time() * 1000)}, record=True)
+
+        doomed = None
+        if self.fail_rate and self.random.random() < self.fail_rate:
+            doomed = self.random.choice(order)
+        outputs = {}
+        executed = list(cached)
+        status = "success"
+        for node_id in order:
+            if node_id in cached:
+                continue
+            node = prompt[node_id]
+            class_type = node.get("class_type")
+            emit("executing", {"node": node_id, "display_node": node_id})
+            self._run_node(node_id, node, emit)
+            if self._interrupt:
+                status = "interrupted"
+                interrupted = {"node_id": node_id, "node_type": class_type, "executed": list(executed)}
+                emit("execution_interrupted", interrupted, record=True)
+                break
+            if node_id == doomed or node_id in self.fail_nodes or class_type in self.fail_nodes:
+                status = "error"
+                error = {
+                    "node_id": node_id,
+                    "node_type": class_type,
+                    "executed": list(executed),
+                    "exception_message": f"Erreur simulée dans {class_type}",
+                    "exception_type": "RuntimeError",
+                    "traceback": [],
+                }
+                emit("execution_error", error, record=True)
+                break
+            if node_id in output_nodes:
+                outputs[node_id] = {"images": self._render_images(prompt_id, node_id, node)}
+                emit("executed", {"node": node_id, "display_node": node_id, "output": outputs[node_id]})
+            self._signatures.add(self._signature(prompt, node_id, memo))
+            executed.append(node_id)
+
+        if status == "success":
+            messages.append(["execution_success", {"prompt_id": prompt_id, "timestamp": int(time.time() * 1000)}])
+        with self._lock:
+            self.history[prompt_id] = {
+                "prompt": [number, prompt_id, prompt, {"client_id": client_id}, sorted(output_nodes)],
+                "outputs": outputs,
+                "status": {"status_str": status, "completed": status == "success", "messages": messages},
+                "meta": {},
+            }
+            self.completed_at[prompt_id] = time.monotonic()
+        # Fin signalée après l'écriture de /history (le client lit l'historique à la réception)
+        if status == "success":
+            self.send(client_id, "execution_success", messages[-1][1])
+        self.send(client_id, "executing", {"node": None, "prompt_id": prompt_id})
+
+    def _run_node(self, node_id, node, emit):
+        """Latence simulée d'un node ; un sampler (entrée steps) signale sa progression et peut être interrompu"""
+        latency = self._latency(node)
+        steps = (node.get("inputs") or {}).get("steps")
+        if not isinstance(steps, int) or isinstance(steps, bool) or steps <= 0:
+            time.sleep(latency)
+            return
+        ticks = min(steps, self.progress_steps) or 1
+        for tick in range(1, ticks + 1):
+            time.sleep(latency / ticks)
+            if self._interrupt:
+                return
+            emit("progress", {"value": tick * steps // ticks, "max": steps, "node": node_id})
+
+    def _render_images(self, prompt_id, node_id, node):
+        prefix = str((node.get("inputs") or {}).get("filename_prefix") or "ComfyUI")
+        folder_type = "output" if node.get("class_type") == "SaveImage" else "temp"
+        with self._lock:
+            index = len(self.images) + 1
+        filename = f"{os.path.basename(prefix)}_{index:05d}_.png"
+        seed = int(hashlib.sha1(f"{prompt_id}:{node_id}".encode()).hexdigest()[:6], 16)
+        rgb = ((seed >> 16) & 0xFF, (seed >> 8) & 0xFF, seed & 0xFF)
+        with self._lock:
+            self.images[(folder_type, "", filename)] = make_png(self.image_size[0], self.image_size[1], rgb)
+        return [{"filename": filename, "subfolder": "", "type": folder_type}]
+
+
+class fake_comfyui_handler(BaseHTTPRequestHandler):
+    """Routes HTTP et WebSocket du serveur factice"""
+
+    fake = None
+    protocol_version = "HTTP/1.1"
+    # En-têtes et corps sont écrits séparément: sans TCP_NODELAY, Nagle et l'ACK retardé ajoutent ~40 ms
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass  # Silencieux (tests et benchmarks)
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_empty(self, status=200):
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length))
+        except ValueError:
+            return None
+
+    def _route(self, method):
+        url = urllib.parse.urlsplit(self.path)
+        self.fake.requests[(method, url.path)] += 1
+        return url.path, urllib.parse.parse_qs(url.query)
+
+    def do_GET(self):
+        path, query = self._route("GET")
+        if path == "/ws":
+            return self._websocket(query.get("clientId", [""])[0])
+        if path == "/system_stats":
+            return self._send_json(self.fake.system_stats())
+        if path == "/object_info":
+            return self._send_json(self.fake.object_info)
+        if path == "/queue":
+            return self._send_json(self.fake.queue())
+        if path == "/history":
+            max_items = int(query.get("max_items", ["0"])[0] or 0)
+            return self._send_json(self.fake.history_entries(max_items=max_items))
+        if path.startswith("/history/"):
+            return self._send_json(self.fake.history_entries(urllib.parse.unquote(path[len("/history/"):])))
+        if path == "/view":
+            return self._view(query)
+        self._send_json({"error": "not found"}, 404)
+
+    def do_HEAD(self):
+        path, query = self._route("HEAD")
+        if path == "/view":
+            return self._view(query, head=True)
+        self._send_empty(404)
+
+    def do_POST(self):
+        path, _ = self._route("POST")
+        payload = self._read_json()
+        if payload is None:
+            return self._send_json({"error": "invalid json"}, 400)
+        if path == "/prompt":
+            status, response = self.fake.queue_prompt(payload)
+            return self._send_json(response, status)
+        if path == "/queue":
+            self.fake.delete_queued(payload)
+            return self._send_empty()
+        if path == "/interrupt":
+            self.fake.interrupt(payload)
+            return self._send_empty()
+        self._send_json({"error": "not found"}, 404)
+
+    def _view(self, query, head=False):
+        key = (query.get("type", ["output"])[0], query.get("subfolder", [""])[0], query.get("filename", [""])[0])
+        with self.fake._lock:
+            data = self.fake.images.get(key)
+        if data is None:
+            return self._send_empty(404)
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        if not head:
+            self.wfile.write(data)
+
+    def _websocket(self, client_id):
+        key = self.headers.get("Sec-WebSocket-Key")
+        if not key or self.headers.get("Upgrade", "").lower() != "websocket":
+            return self._send_json({"error": "websocket upgrade attendu"}, 400)
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode("ascii")).digest()).decode("ascii")
+        self.send_response(101, "Switching Protocols")
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Accept", accept)
+        self.end_headers()
+        self.wfile.flush()
+
+        ws = fake_websocket(self.connection, self.rfile)
+        self.fake.register_websocket(client_id, ws)
+        try:
+            ws.serve()
+        finally:
+            self.fake.unregister_websocket(client_id, ws)
+            self.close_connection = True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serveur ComfyUI factice")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8188)
+    parser.add_argument("--latency", type=float, default=0.1, help="secondes par node")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="probabilité d'échec d'un prompt")
+    args = parser.parse_args()
+
+    server = fake_comfyui_server(args.host, args.port, node_latency=args.latency, fail_rate=args.fail_rate).start()
+    print(f"ComfyUI factice sur http://{server.address} (Ctrl+C pour arrêter)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
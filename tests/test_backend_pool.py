@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Test du pool de backends ComfyUI (santé, file la plus courte, affinité de checkpoint)
+"""
+
+import sys
+import os
+import threading
+
+import pytest
+
+# Ajouter le répertoire src au path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from cy6_backend_pool import (
+    comfyui_backend_pool,
+    addresses_from_env,
+    max_concurrency_from_env,
+    PRIORITY_LOW,
+    PRIORITY_URGENT,
+)
+from cy6_resilience import comfyui_circuit_breaker
+
+
+def make_pool(depths, max_concurrency=None, clock=None):
+    """Pool dont la sonde retourne depths[address] (une exception si la valeur en est une)"""
+
+    def probe(address):
+        depth = depths[address]
+        if isinstance(depth, Exception):
+            raise depth
+        return depth
+
+    clock = clock or (lambda: 0.0)
+    return comfyui_backend_pool(
+        list(depths),
+        probe=probe,
+        health_interval=0,
+        max_concurrency=max_concurrency,
+        # Disjoncteurs propres au test (le registre partagé survivrait d'un test à l'autre)
+        circuit_breaker=lambda address: comfyui_circuit_breaker(address, reset_timeout=30, clock=clock),
+    )
+
+
+def test_shortest_queue_wins():
+    pool = make_pool({"a:1": 3, "b:2": 0, "c:3": 1})
+    assert pool.acquire().address == "b:2"
+    # Les exécutions attribuées comptent dans la charge jusqu'au release
+    assert pool.acquire().address in ("b:2", "c:3")
+
+
+def test_unhealthy_backend_is_skipped():
+    pool = make_pool({"a:1": ConnectionRefusedError("refusé"), "b:2": 5})
+    assert pool.acquire().address == "b:2"
+    assert [backend.address for backend in pool.healthy_backends()] == ["b:2"]
+
+
+def test_no_backend_raises():
+    pool = make_pool({"a:1": ConnectionRefusedError("refusé")})
+    try:
+        pool.acquire()
+        assert False, "RuntimeError attendue"
+    except RuntimeError:
+        pass
+
+
+def test_checkpoint_affinity_within_slack():
+    depths = {"a:1": 0, "b:2": 0}
+    pool = make_pool(depths)
+    backend = pool.acquire("sdxl")
+    pool.release(backend)
+    other = "b:2" if backend.address == "a:1" else "a:1"
+
+    # Le backend qui a déjà chargé le checkpoint reste préféré malgré une file un peu plus longue
+    depths[backend.address] = pool.AFFINITY_SLACK
+    assert pool.select("sdxl").address == backend.address
+    assert pool.select("sd15").address == other
+
+    # Au-delà de la marge, la file la plus courte l'emporte
+    depths[backend.address] = pool.AFFINITY_SLACK + 1
+    assert pool.select("sdxl").address == other
+
+
+def test_lease_marks_backend_down_on_connection_error():
+    pool = make_pool({"a:1": 0, "b:2": 1})
+    try:
+        with pool.lease() as backend:
+            assert backend.address == "a:1"
+            raise ConnectionResetError("coupé")
+    except ConnectionResetError:
+        pass
+    assert pool.backends[0].healthy is False
+    assert pool.backends[0].in_flight == 0
+
+
+def test_addresses_from_env(monkeypatch):
+    monkeypatch.setenv("COMFYUI_SERVERS", " a:1, b:2 ,")
+    assert addresses_from_env() == ["a:1", "b:2"]
+    monkeypatch.delenv("COMFYUI_SERVERS")
+    monkeypatch.setenv("COMFYUI_SERVER", "c:3")
+    assert addresses_from_env() == ["c:3"]
+
+
+def test_concurrency_limit_per_backend():
+    pool = make_pool({"a:1": 0, "b:2": 5}, max_concurrency=1)
+    assert pool.capacity() == 2
+    first = pool.acquire()
+    # a:1 est plein: b:2 reçoit la suivante malgré sa file plus longue
+    assert pool.acquire().address == "b:2"
+    assert pool.has_capacity() is False
+    assert pool.select() is None
+    try:
+        pool.acquire(timeout=0)
+        assert False, "RuntimeError attendue"
+    except RuntimeError as e:
+        assert "occupés" in str(e)
+    pool.release(first)
+    assert pool.has_capacity() is True
+
+
+def test_acquire_waits_for_release():
+    pool = make_pool({"a:1": 0}, max_concurrency=1)
+    held = pool.acquire()
+    acquired = []
+    waiter = threading.Thread(target=lambda: acquired.append(pool.acquire(timeout=5)))
+    waiter.start()
+    waiter.join(0.2)
+    assert acquired == []
+    pool.release(held)
+    waiter.join(5)
+    assert [backend.address for backend in acquired] == ["a:1"]
+
+
+def test_urgent_request_takes_the_next_free_slot():
+    pool = make_pool({"a:1": 0}, max_concurrency=1)
+    held = pool.acquire()
+    order = []
+
+    def request(priority):
+        backend = pool.acquire(timeout=5, priority=priority)
+        order.append(priority)
+        pool.release(backend)
+
+    low = threading.Thread(target=request, args=(PRIORITY_LOW,))
+    low.start()
+    low.join(0.2)
+    urgent = threading.Thread(target=request, args=(PRIORITY_URGENT,))
+    urgent.start()
+    urgent.join(0.2)
+    # La demande urgente, arrivée après, passe devant la demande basse
+    pool.release(held)
+    urgent.join(5)
+    low.join(5)
+    assert order == [PRIORITY_URGENT, PRIORITY_LOW]
+
+
+def test_open_circuit_suspends_dispatch():
+    now = [0.0]
+    depths = {"a:1": ConnectionRefusedError("redémarrage"), "b:2": 0}
+    pool = make_pool(depths, clock=lambda: now[0])
+    probes = []
+    probe = pool.probe
+    pool.probe = lambda address: probes.append(address) or probe(address)
+
+    for _ in range(comfyui_circuit_breaker.FAILURE_THRESHOLD):
+        pool.refresh()
+    assert pool.breakers["a:1"].is_open()
+    # Backend suspendu: plus sondé, hors capacité, même revenu
+    depths["a:1"] = 0
+    probes.clear()
+    pool.refresh()
+    assert probes == ["b:2"]
+    assert pool.capacity() == pool.max_concurrency
+    assert "suspendu" in pool.describe()
+
+    # Le dernier backend tombe à son tour: la répartition est suspendue
+    pool.release(pool.acquire(), failed=True)
+    depths["b:2"] = ConnectionRefusedError("redémarrage")
+    for _ in range(comfyui_circuit_breaker.FAILURE_THRESHOLD - 1):
+        pool.refresh()
+    assert pool.breakers["b:2"].is_open()
+    assert pool.capacity() == 0
+    with pytest.raises(RuntimeError):
+        pool.acquire()
+
+    # Réarmement: le sondage d'essai referme les disjoncteurs
+    now[0] = 30
+    depths["b:2"] = 0
+    pool.refresh()
+    assert pool.capacity() == 2 * pool.max_concurrency
+
+
+def test_max_concurrency_from_env(monkeypatch):
+    monkeypatch.setenv("COMFYUI_MAX_CONCURRENCY", "3")
+    assert max_concurrency_from_env() == 3
+    monkeypatch.setenv("COMFYUI_MAX_CONCURRENCY", "x")
+    assert max_concurrency_from_env() == comfyui_backend_pool.MAX_CONCURRENCY
@@ -11,12 +11,12 @@ import urllib.request
 # Ajouter le répertoire src au path Python
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
 
-from cy6_wkf001_Basic import comfyui_basic_task
 from cy6_websocket_api_client import server_address
+from fake_comfyui_server import fake_comfyui_server
 
 
-def test_comfyui_connection():
-    """Teste la connexion à ComfyUI"""
+def check_comfyui_connection(server_address=server_address):
+    """Vérifie que ComfyUI répond sur server_address"""
     print("🔍 Test de connexion ComfyUI...")
 
     try:
@@ -44,6 +44,14 @@ def test_comfyui_connection():
         return False
 
 
+def test_comfyui_connection():
+    """Teste la connexion contre le serveur ComfyUI factice (aucun ComfyUI réel requis)"""
+    with fake_comfyui_server(version="0.3.test") as server:
+        assert check_comfyui_connection(server.address)
+    # Serveur arrêté: la connexion échoue proprement
+    assert not check_comfyui_connection(server.address)
+
+
 # SUPPRIMÉ : Test d'exécution de workflow
 # Le test d'exécution de workflow a été retiré conformément aux nouvelles spécifications.
 # Les tests d'exécution doivent maintenant être effectués uniquement via l'onglet "ComfyUI"
@@ -73,8 +81,8 @@ def main():
     print("🧪 Test de la connexion ComfyUI pour cy8_prompts_manager")
     print("=" * 60)
 
-    # Test unique: Connexion de base seulement
-    if test_comfyui_connection():
+    # Test unique: Connexion de base seulement (ComfyUI réel sur COMFYUI_SERVER)
+    if check_comfyui_connection():
         print(f"\n✅ Test de connexion réussi ! ComfyUI est accessible.")
         print("\n💡 Pour tester l'exécution de workflows :")
         print("   1. Lancez l'application : python src/cy8_prompts_manager_main.py")
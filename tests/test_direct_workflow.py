@@ -1,51 +1,53 @@
 #!/usr/bin/env python3
 """
 Test direct du workflow ComfyUI pour diagnostiquer l'erreur 400
+Exécuté contre le serveur ComfyUI factice: workflow et valeurs en mémoire, aucun ComfyUI réel requis
 """
 import sys
 import os
+import tempfile
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
 
+import cy6_object_info
+from cy6_object_info import comfyui_object_info_cache
 from cy6_wkf001_Basic import comfyui_basic_task
+from fake_comfyui_server import fake_comfyui_server, basic_workflow, basic_values
 
-def test_direct_workflow():
-    """Test direct d'exécution de workflow"""
-    workflow_file = "data/Workflows/test_workflow.json"
-    values_file = "data/Workflows/test_values.json"
-
-    print(f"Test avec:")
-    print(f"  Workflow: {workflow_file}")
-    print(f"  Values: {values_file}")
 
-    if not os.path.exists(workflow_file):
-        print(f"❌ Fichier workflow introuvable: {workflow_file}")
-        return
+def run_direct_workflow(server_address, workflow, values):
+    """Exécution directe d'un workflow: retourne les images récupérées"""
+    print("🔄 Création de la tâche ComfyUI...")
+    task = comfyui_basic_task()
+    task.server_address = server_address
 
-    if not os.path.exists(values_file):
-        print(f"❌ Fichier values introuvable: {values_file}")
-        return
+    print("🔄 Envoi à la queue ComfyUI...")
+    prompt_id = task.addToQueue(workflow, values)
+    print(f"✅ Prompt envoyé avec ID: {prompt_id}")
 
-    try:
-        print("🔄 Création de la tâche ComfyUI...")
-        task = comfyui_basic_task()
+    print("🔄 Récupération des images...")
+    images = task.GetImages(prompt_id)
+    if images:
+        print(f"✅ {len(images)} images récupérées")
+    else:
+        print("⚠️  Aucune image récupérée")
+    return images
 
-        print("🔄 Envoi à la queue ComfyUI...")
-        prompt_id = task.addToQueue(workflow_file, values_file)
 
-        print(f"✅ Prompt envoyé avec ID: {prompt_id}")
+def test_direct_workflow(tmp_path, monkeypatch):
+    """Test direct d'exécution de workflow"""
+    monkeypatch.setenv("IMAGES_COLLECTE", str(tmp_path / "output"))
+    monkeypatch.setattr(cy6_object_info, "_cache", comfyui_object_info_cache(cache_dir=str(tmp_path)))
 
-        print("🔄 Récupération des images...")
-        images = task.GetImages(prompt_id)
+    with fake_comfyui_server() as server:
+        images = run_direct_workflow(server.address, basic_workflow(), basic_values())
 
-        if images:
-            print(f"✅ {len(images)} images récupérées")
-        else:
-            print("⚠️  Aucune image récupérée")
+    assert len(images) == 1
+    assert os.path.exists(images[0])
 
-    except Exception as e:
-        print(f"❌ Erreur: {e}")
-        import traceback
-        traceback.print_exc()
 
 if __name__ == "__main__":
-    test_direct_workflow()
+    with tempfile.TemporaryDirectory() as images_dir:
+        os.environ["IMAGES_COLLECTE"] = images_dir
+        cy6_object_info._cache = comfyui_object_info_cache(cache_dir=images_dir)
+        with fake_comfyui_server() as server:
+            run_direct_workflow(server.address, basic_workflow(), basic_values())
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Test du hub d'événements WebSocket ComfyUI (routage par prompt_id)
+"""
+
+import sys
+import os
+import json
+import time
+import threading
+
+import pytest
+
+# Ajouter le répertoire src au path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import websocket
+from cy6_event_hub import comfyui_event_hub
+
+
+def executing(prompt_id, node):
+    return {"type": "executing", "data": {"node": node, "prompt_id": prompt_id}}
+
+
+def test_messages_routed_to_their_prompt():
+    """Chaque abonné ne reçoit que les messages de son prompt"""
+    hub = comfyui_event_hub("127.0.0.1:0", "client")
+    received = {f"p{i}": [] for i in range(300)}
+    for prompt_id, messages in received.items():
+        hub.subscribe(prompt_id, messages.append)
+
+    for prompt_id in received:
+        hub.dispatch(executing(prompt_id, "3"))
+    hub.dispatch({"type": "status", "data": {"status": {"exec_info": {"queue_remaining": 0}}}})
+
+    assert all(messages == [executing(prompt_id, "3")] for prompt_id, messages in received.items())
+
+
+def test_messages_before_subscribe_are_replayed_in_order():
+    """Les événements arrivés avant l'abonnement ne sont pas perdus"""
+    hub = comfyui_event_hub("127.0.0.1:0", "client")
+    hub.dispatch(executing("p1", "3"))
+    hub.dispatch(executing("p1", None))
+
+    received = []
+    hub.subscribe("p1", received.append)
+    hub.dispatch({"type": "execution_success", "data": {"prompt_id": "p1"}})
+
+    assert [m["data"].get("node", "end") for m in received] == ["3", None, "end"]
+
+
+def test_channel_behaves_like_a_websocket():
+    """Le canal d'un prompt expose recv/settimeout comme websocket.WebSocket"""
+    hub = comfyui_event_hub("127.0.0.1:0", "client")
+    channel = hub.channel("p1")
+    hub.dispatch(executing("p2", "5"))
+    hub.dispatch(executing("p1", None))
+
+    assert json.loads(channel.recv()) == executing("p1", None)
+    channel.settimeout(0.05)
+    with pytest.raises(websocket.WebSocketTimeoutException):
+        channel.recv()
+
+    channel.close()
+    assert hub.subscriber_count() == 0
+
+
+def test_tracker_outcomes():
+    """Le suivi distingue succès, erreur, interruption et timeout"""
+    hub = comfyui_event_hub("127.0.0.1:0", "client")
+    ok, failed, interrupted, silent = (hub.track(f"p{i}") for i in range(4))
+
+    hub.dispatch(executing("p0", None))
+    hub.dispatch({"type": "execution_error", "data": {"prompt_id": "p1", "node_type": "KSampler", "exception_message": "OOM"}})
+    hub.dispatch(executing("p1", None))
+    hub.dispatch({"type": "execution_interrupted", "data": {"prompt_id": "p2"}})
+
+    assert ok.wait(0) == ("success", "Terminé")
+    assert failed.wait(0) == ("error", "KSampler: OOM")
+    assert interrupted.wait(0)[0] == "interrupted"
+    assert silent.wait(0.05)[0] == "timeout"
+
+
+def test_tracker_signals_completion_immediately():
+    """La fin est signalée dès la réception de l'événement, sans attente"""
+    hub = comfyui_event_hub("127.0.0.1:0", "client")
+    finished = []
+    tracker = hub.track("p1")
+    tracker.add_done_callback(lambda outcome, message: finished.append(outcome))
+
+    hub.dispatch({"type": "execution_success", "data": {"prompt_id": "p1"}})
+
+    assert finished == ["success"]
+    tracker.close()
+    assert hub.subscriber_count() == 0
+
+
+def test_callbacks_run_outside_the_hub_lock():
+    """Un abonné lent ne bloque pas les autres threads qui s'abonnent ou se désabonnent"""
+    hub = comfyui_event_hub("127.0.0.1:0", "client")
+    other_thread = []
+
+    def slow_subscriber(message):
+        worker = threading.Thread(target=lambda: other_thread.append(hub.subscribe("p2", lambda message: None)))
+        worker.start()
+        worker.join(1)
+        other_thread.append(worker.is_alive())
+
+    hub.subscribe("p1", slow_subscriber)
+    hub.dispatch(executing("p1", "3"))
+
+    assert other_thread == [None, False]
+    assert hub.subscriber_count() == 2
+
+
+class scripted_socket:
+    """WebSocket factice: rend ses messages puis lève l'erreur donnée (ou attend indéfiniment)"""
+
+    def __init__(self, messages=(), error=None):
+        self.messages = [json.dumps(message) for message in messages]
+        self.error = error
+
+    def recv(self):
+        if self.messages:
+            return self.messages.pop(0)
+        if self.error is not None:
+            raise self.error
+        time.sleep(0.01)
+        raise websocket.WebSocketTimeoutException("rien")
+
+    def close(self):
+        pass
+
+
+def test_reconnect_resyncs_prompts_finished_during_outage():
+    """Connexion perdue: la hub se reconnecte et rejoue la fin lue dans /history"""
+    sockets = [
+        scripted_socket([executing("p1", "3")], ConnectionResetError("coupé")),
+        scripted_socket(),
+    ]
+    attempts = []
+
+    def connect():
+        attempts.append(len(attempts))
+        if len(attempts) == 2:
+            raise ConnectionRefusedError("redémarrage")  # Premier essai pendant le redémarrage
+        return sockets.pop(0)
+
+    histories = {"p1": {"status": {"messages": [["execution_start", {}], ["execution_success", {}]]}}}
+    hub = comfyui_event_hub(
+        "127.0.0.1:0", "client", connect=connect, fetch_history=histories.get, sleep=lambda delay: None
+    )
+    tracker = hub.track("p1")
+    pending = hub.track("p2")
+    hub.start()
+    try:
+        assert tracker.wait(5) == ("success", "Terminé")
+        assert len(attempts) == 3
+        assert hub.is_running() and not pending.done()
+    finally:
+        hub.close()
+
+
+def test_connection_lost_after_reconnect_attempts():
+    """Backend toujours absent: les prompts suivis reçoivent 'disconnected'"""
+
+    def connect():
+        if not hasattr(connect, "done"):
+            connect.done = True
+            return scripted_socket(error=ConnectionResetError("coupé"))
+        raise ConnectionRefusedError("arrêté")
+
+    hub = comfyui_event_hub("127.0.0.1:0", "client", connect=connect, sleep=lambda delay: None)
+    tracker = hub.track("p1")
+    hub.start()
+    assert tracker.wait(5)[0] == "disconnected"
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Test de la progression calculée depuis les événements ComfyUI
+"""
+
+import sys
+import os
+
+# Ajouter le répertoire src au path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from cy6_execution_progress import comfyui_execution_progress
+
+WORKFLOW = {
+    "3": {"class_type": "KSampler"},
+    "4": {"class_type": "CheckpointLoaderSimple"},
+    "6": {"class_type": "CLIPTextEncode"},
+    "7": {"class_type": "CLIPTextEncode"},
+    "8": {"class_type": "VAEDecode"},
+    "9": {"class_type": "SaveImage"},
+}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def event(message_type, **data):
+    data["prompt_id"] = "p1"
+    return {"type": message_type, "data": data}
+
+
+def test_progress_follows_nodes_cache_and_sampler_steps():
+    """Nodes en cache exclus, pas du sampler comptés dans le node courant"""
+    reports = []
+    progress = comfyui_execution_progress(WORKFLOW, lambda *r: reports.append(r), start=0, end=100, min_interval=0)
+
+    progress.on_event(event("execution_start"))
+    progress.on_event(event("execution_cached", nodes=["4", "6", "7"]))
+    progress.on_event(event("executing", node="3"))
+    progress.on_event(event("progress", node="3", value=10, max=20))
+
+    # 3 nodes à exécuter, le sampler est à moitié: 0.5 / 3
+    assert reports[-1] == (16, "Génération: 0/3 nodes (3 en cache) - KSampler #3 10/20 pas")
+
+    progress.on_event(event("executing", node="8"))
+    progress.on_event(event("executing", node="9"))
+    progress.on_event(event("executed", node="9", output={}))
+    assert reports[-1][0] == 100
+
+
+def test_reports_are_throttled_and_stall_is_signalled():
+    """Au plus un rapport par intervalle, exécution bloquée signalée par tick()"""
+    clock = FakeClock()
+    reports = []
+    progress = comfyui_execution_progress(WORKFLOW, lambda *r: reports.append(r), min_interval=1.0, clock=clock)
+
+    progress.on_event(event("executing", node="3"))
+    for step in range(1, 21):
+        progress.on_event(event("progress", node="3", value=step, max=20))
+    assert len(reports) == 1
+
+    clock.now = 45.0
+    progress.tick()
+    assert reports[-1][1].endswith("aucun événement depuis 45s")
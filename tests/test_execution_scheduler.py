@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Test de l'ordonnancement par checkpoint (regroupement et borne de famine)
+"""
+
+import sys
+import os
+
+# Ajouter le répertoire src au path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from cy8_execution_scheduler import cy8_execution_scheduler, order_by_affinity, count_reloads
+
+
+def test_jobs_sharing_a_checkpoint_run_back_to_back():
+    jobs = ["sdxl", "sd15", "sdxl", "sd15", "sdxl", "sd15"]
+    ordered, report = order_by_affinity(jobs, lambda job: job, max_skips=10)
+    assert ordered == ["sdxl"] * 3 + ["sd15"] * 3
+    assert report == {"jobs": 6, "reloads": 2, "fifo_reloads": 6, "saved": 4}
+    assert count_reloads(ordered) == report["reloads"]
+
+
+def test_starvation_bound():
+    """Un travail n'est pas dépassé plus de max_skips fois"""
+    jobs = [("a", 0), ("b", 1)] + [("a", index) for index in range(2, 10)]
+    ordered, _ = order_by_affinity(jobs, lambda job: job[0], max_skips=2)
+    assert ordered.index(("b", 1)) == 3
+
+
+def test_loaded_checkpoint_is_served_first():
+    scheduler = cy8_execution_scheduler(loaded="sd15")
+    for job, checkpoint in [(1, "sdxl"), (2, "sd15"), (3, None)]:
+        scheduler.push(job, checkpoint)
+    assert scheduler.pop() == 2
+    # Un travail sans checkpoint connu ne coûte pas de rechargement
+    assert scheduler.pop() == 1
+    assert scheduler.pop() == 3
+    assert scheduler.pop() is None
+    assert scheduler.report()["reloads"] == 1
+
+
+def test_pop_with_backend_loaded_checkpoint():
+    scheduler = cy8_execution_scheduler()
+    scheduler.push("x", "sd15")
+    scheduler.push("y", "sdxl")
+    assert scheduler.pop(loaded="sdxl") == "y"
+    assert len(scheduler) == 1
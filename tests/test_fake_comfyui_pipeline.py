@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Test de bout en bout du client ComfyUI contre le serveur factice (tests/fake_comfyui_server.py):
+soumission, événements WebSocket, /history, téléchargement des images, erreurs et annulation
+"""
+
+import sys
+import os
+import time
+import urllib.error
+
+import pytest
+
+# Ajouter le répertoire src au path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import cy6_object_info
+from cy6_object_info import comfyui_object_info_cache, comfyui_validation_error
+from cy6_task_comfyui import comfyui_task
+from cy6_http_client import close_clients
+from cy6_event_hub import close_event_hubs
+from cy6_websocket_api_client import (
+    cancel_prompt,
+    get_history,
+    get_history_listing,
+    get_queue,
+    history_outcome,
+    queue_state,
+    socket_queue_prompt,
+)
+from fake_comfyui_server import fake_comfyui_server, basic_workflow, basic_values
+
+TIMEOUT = 10
+
+
+@pytest.fixture
+def comfyui(tmp_path, monkeypatch):
+    """start(**options) -> serveur factice démarré ; images et schémas /object_info dans tmp_path"""
+    monkeypatch.setenv("IMAGES_COLLECTE", str(tmp_path / "output"))
+    monkeypatch.setattr(cy6_object_info, "_cache", comfyui_object_info_cache(cache_dir=str(tmp_path / "object_info")))
+    servers = []
+
+    def start(**options):
+        server = fake_comfyui_server(**options).start()
+        servers.append(server)
+        return server
+
+    yield start
+    close_event_hubs()
+    close_clients()
+    for server in servers:
+        server.stop()
+
+
+def submit(server, workflow=None, values=None, events=None):
+    task = comfyui_task()
+    task.server_address = server.address
+    prompt_id = task.addToQueue(
+        workflow or basic_workflow(), values or basic_values(), on_event=events.append if events is not None else None
+    )
+    return task, prompt_id
+
+
+def wait_running(server, prompt_id):
+    deadline = time.monotonic() + TIMEOUT
+    while time.monotonic() < deadline:
+        if queue_state(get_queue(server.address), prompt_id) == "running":
+            return
+        time.sleep(0.01)
+    raise AssertionError(f"{prompt_id} jamais démarré")
+
+
+def test_workflow_runs_and_images_are_downloaded(comfyui, tmp_path):
+    server = comfyui(node_latency=0.001)
+    events = []
+    task, prompt_id = submit(server, values=basic_values(positive="purple galaxy bottle"), events=events)
+
+    assert task.wait_for_completion(TIMEOUT) == ("success", "Terminé")
+    images = task.GetImages(prompt_id)
+
+    assert len(images) == 1
+    assert images[0].startswith(str(tmp_path / "output"))
+    with open(images[0], "rb") as f:
+        assert f.read(8) == b"\x89PNG\r\n\x1a\n"
+    # Le workflow reçu par ComfyUI porte les valeurs du prompt
+    prompt = server.history[prompt_id]["prompt"][2]
+    assert prompt["6"]["inputs"]["text"] == "purple galaxy bottle"
+    types = [event["type"] for event in events]
+    assert types[0] == "execution_start"
+    assert "progress" in types and "executed" in types
+    assert server.requests[("POST", "/prompt")] == 1
+
+
+def test_unchanged_nodes_are_reported_cached(comfyui):
+    server = comfyui()
+    first_events, second_events = [], []
+    for events in (first_events, second_events):
+        task, _ = submit(server, events=events)
+        assert task.wait_for_completion(TIMEOUT)[0] == "success"
+        task.close()
+
+    def cached(events):
+        return next(event["data"]["nodes"] for event in events if event["type"] == "execution_cached")
+
+    assert cached(first_events) == []
+    # Le seed est retiré à chaque soumission: seuls les nodes en amont du sampler sont repris du cache
+    assert sorted(cached(second_events)) == ["4", "5", "6", "7"]
+    # Le node de sortie est toujours exécuté
+    assert any(event["type"] == "executed" for event in second_events)
+
+
+def test_injected_node_failure_is_reported(comfyui):
+    server = comfyui(fail_nodes={"VAEDecode"})
+    task, prompt_id = submit(server)
+
+    outcome, message = task.wait_for_completion(TIMEOUT)
+
+    assert outcome == "error"
+    assert message == "VAEDecode: Erreur simulée dans VAEDecode"
+    assert history_outcome(get_history(prompt_id, server.address)[prompt_id]) == (outcome, message)
+    assert task.GetImages(prompt_id) == []
+
+
+def test_unknown_node_is_rejected(comfyui):
+    server = comfyui()
+    workflow = basic_workflow()
+    workflow["8"]["class_type"] = "UnknownDecoder"
+
+    # Refusé localement d'après /object_info, puis par le serveur s'il est soumis tel quel
+    with pytest.raises(comfyui_validation_error):
+        submit(server, workflow=workflow)
+    with pytest.raises(urllib.error.HTTPError) as error:
+        socket_queue_prompt(workflow, server.address)
+    assert error.value.code == 400
+    assert server.requests[("POST", "/prompt")] == 1
+
+
+def test_cancel_deletes_pending_and_interrupts_running(comfyui):
+    server = comfyui(latencies={"KSampler": 2.0}, progress_steps=20)
+    running_task, running_id = submit(server)
+    pending_task, pending_id = submit(server)
+    wait_running(server, running_id)
+
+    assert cancel_prompt(pending_id, server.address) == "deleted"
+    assert cancel_prompt(running_id, server.address) == "interrupted"
+
+    assert running_task.wait_for_completion(TIMEOUT)[0] == "interrupted"
+    assert server.wait_idle(TIMEOUT)
+    assert pending_id not in get_history_listing(10, server.address)
+    assert cancel_prompt(running_id, server.address) is None
+    pending_task.close()
+
+
+def test_history_listing_returns_finished_prompts(comfyui):
+    server = comfyui()
+    prompt_ids = []
+    for _ in range(3):
+        task, prompt_id = submit(server)
+        assert task.wait_for_completion(TIMEOUT)[0] == "success"
+        task.close()
+        prompt_ids.append(prompt_id)
+
+    assert list(get_history_listing(2, server.address)) == prompt_ids[1:]
+    assert set(get_history_listing(10, server.address)) == set(prompt_ids)
+
+
+def test_completion_survives_websocket_drop(comfyui):
+    server = comfyui(latencies={"KSampler": 0.5})
+    task, prompt_id = submit(server)
+    wait_running(server, prompt_id)
+
+    server.drop_websockets()
+
+    assert task.wait_for_completion(TIMEOUT) == ("success", "Terminé")
+    assert len(task.GetImages(prompt_id)) == 1
+
+
+def test_node_timings_show_the_dominant_node(comfyui):
+    server = comfyui(node_latency=0.005, latencies={"KSampler": 0.2, "VAEDecode": 0.05})
+    task, prompt_id = submit(server)
+    assert task.wait_for_completion(TIMEOUT)[0] == "success"
+    task.close()
+
+    timings = task.node_timings()
+
+    nodes = {node["node"]: node for node in timings["nodes"]}
+    assert sorted(nodes) == ["3", "4", "5", "6", "7", "8", "9"]
+    slowest = max(timings["nodes"], key=lambda node: node["duration_s"])
+    assert slowest["class_type"] == "KSampler"
+    assert nodes["3"]["steps"] == 20 and nodes["3"]["steps_per_s"] > 0
+    assert nodes["8"]["duration_s"] >= 0.04
+    assert timings["total_s"] >= sum(node["duration_s"] for node in timings["nodes"]) * 0.9
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Test de la lecture de l'issue d'une entrée /history ComfyUI
+"""
+
+import sys
+import os
+
+# Ajouter le répertoire src au path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from cy6_websocket_api_client import history_outcome
+
+
+def test_success():
+    entry = {"outputs": {}, "status": {"status_str": "success", "completed": True, "messages": []}}
+    assert history_outcome(entry) == ("success", "Terminé")
+
+
+def test_error_message_from_status():
+    entry = {
+        "status": {
+            "status_str": "error",
+            "completed": False,
+            "messages": [
+                ["execution_start", {"prompt_id": "p"}],
+                ["execution_error", {"node_type": "KSampler", "exception_message": "CUDA out of memory"}],
+            ],
+        }
+    }
+    assert history_outcome(entry) == ("error", "KSampler: CUDA out of memory")
+
+
+def test_interrupted():
+    entry = {"status": {"status_str": "error", "completed": False, "messages": [["execution_interrupted", {}]]}}
+    assert history_outcome(entry)[0] == "interrupted"
+
+
+def test_entry_without_status():
+    assert history_outcome({"outputs": {}})[0] == "success"
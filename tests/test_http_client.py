@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Test du client HTTP ComfyUI (connexions keep-alive réutilisées)
+"""
+
+import sys
+import os
+import json
+import threading
+import http.client
+import urllib.error
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Ajouter le répertoire src au path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from cy6_http_client import comfyui_http_client
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    client_ports = set()
+    # Requêtes reçues puis coupées sans réponse (comme un serveur qui ferme une connexion keep-alive)
+    dropped = []
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _drop(self):
+        self.dropped.append((self.command, self.path))
+        self.close_connection = True
+
+    def do_GET(self):
+        self.client_ports.add(self.client_address[1])
+        if self.path == "/flaky" and not self.dropped:
+            self._drop()
+        elif self.path == "/flaky":
+            self._send(200, {"ok": True})
+        elif self.path.startswith("/history/"):
+            prompt_id = self.path.rsplit("/", 1)[1]
+            self._send(200, {prompt_id: {"outputs": {}}})
+        else:
+            self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        self.client_ports.add(self.client_address[1])
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length))
+        if self.path == "/drop":
+            self._drop()
+        elif not payload.get("prompt"):
+            self._send(400, {"error": "empty prompt"})
+        else:
+            self._send(200, {"prompt_id": "abc", "number": 1})
+
+
+def start_server():
+    KeepAliveHandler.client_ports = set()
+    KeepAliveHandler.dropped = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def test_connection_is_reused():
+    """Plusieurs appels séquentiels passent par une seule connexion TCP"""
+    server = start_server()
+    client = comfyui_http_client(f"127.0.0.1:{server.server_address[1]}")
+    try:
+        assert client.queue_prompt({"1": {}}, "client")["prompt_id"] == "abc"
+        for i in range(5):
+            assert client.get_history(f"p{i}") == {f"p{i}": {"outputs": {}}}
+        assert len(KeepAliveHandler.client_ports) == 1
+    finally:
+        client.close()
+        server.shutdown()
+        server.server_close()
+
+
+def test_http_error_keeps_urllib_contract():
+    """Une erreur HTTP lève urllib.error.HTTPError avec le corps lisible"""
+    server = start_server()
+    client = comfyui_http_client(f"127.0.0.1:{server.server_address[1]}")
+    try:
+        try:
+            client.queue_prompt({}, "client")
+            assert False, "HTTPError attendue"
+        except urllib.error.HTTPError as e:
+            assert e.code == 400
+            assert json.loads(e.read())["error"] == "empty prompt"
+        # La connexion reste utilisable après une erreur applicative
+        assert client.get_history("p1") == {"p1": {"outputs": {}}}
+    finally:
+        client.close()
+        server.shutdown()
+        server.server_close()
+
+
+def test_reconnects_after_server_closed_idle_connection():
+    """Une connexion fermée par le serveur est remplacée sans erreur"""
+    server = start_server()
+    address = f"127.0.0.1:{server.server_address[1]}"
+    client = comfyui_http_client(address)
+    try:
+        client.get_history("p1")
+        # Simuler la fermeture côté serveur de la connexion inactive
+        for conn in client._idle:
+            conn.sock.shutdown(2)
+        assert client.get_history("p2") == {"p2": {"outputs": {}}}
+    finally:
+        client.close()
+        server.shutdown()
+        server.server_close()
+
+
+def test_get_is_retried_when_reused_connection_drops():
+    """Une requête GET coupée sans réponse sur une connexion réutilisée est rejouée"""
+    server = start_server()
+    client = comfyui_http_client(f"127.0.0.1:{server.server_address[1]}")
+    try:
+        client.get_history("p1")
+        assert client.get_json("/flaky") == {"ok": True}
+        assert KeepAliveHandler.dropped == [("GET", "/flaky")]
+    finally:
+        client.close()
+        server.shutdown()
+        server.server_close()
+
+
+def test_post_is_not_replayed_after_being_sent():
+    """Un POST reçu par le serveur n'est jamais renvoyé (pas de prompt en double)"""
+    server = start_server()
+    client = comfyui_http_client(f"127.0.0.1:{server.server_address[1]}")
+    try:
+        client.get_history("p1")
+        try:
+            client.post("/drop")
+            assert False, "RemoteDisconnected attendue"
+        except http.client.RemoteDisconnected:
+            pass
+        assert KeepAliveHandler.dropped == [("POST", "/drop")]
+        # Le client reste utilisable
+        assert client.queue_prompt({"1": {}}, "client")["prompt_id"] == "abc"
+    finally:
+        client.close()
+        server.shutdown()
+        server.server_close()
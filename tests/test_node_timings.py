@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Test des durées par node relevées depuis les événements WebSocket ComfyUI
+"""
+
+import sys
+import os
+
+# Ajouter le répertoire src au path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from cy6_event_hub import comfyui_event_hub
+from cy6_node_timings import comfyui_node_timings, format_node_timings
+
+WORKFLOW = {
+    "3": {"class_type": "KSampler"},
+    "4": {"class_type": "CheckpointLoaderSimple"},
+    "8": {"class_type": "VAEDecode"},
+    "9": {"class_type": "SaveImage"},
+}
+
+
+def message(message_type, **data):
+    return {"type": message_type, "data": dict(data, prompt_id="p1")}
+
+
+def run_events(timings, events):
+    for at, event in events:
+        timings.on_event(event, at)
+
+
+def test_nodes_are_timed_between_transitions():
+    """Un node finit quand le suivant commence ; les pas du sampler donnent sa vitesse"""
+    timings = comfyui_node_timings()
+    run_events(
+        timings,
+        [
+            (10.0, message("execution_start")),
+            (10.0, message("execution_cached", nodes=["4"])),
+            (10.1, message("executing", node="3")),
+            (10.6, message("progress", node="3", value=1, max=20)),
+            (12.5, message("progress", node="3", value=20, max=20)),
+            (12.6, message("executing", node="8")),
+            (13.4, message("executing", node="9")),
+            (13.5, message("executed", node="9", output={})),
+            (13.5, message("executing", node=None)),
+            (13.5, message("execution_success")),
+        ],
+    )
+
+    report = timings.report(WORKFLOW)
+
+    assert report["total_s"] == 3.5
+    nodes = {node["node"]: node for node in report["nodes"]}
+    assert [node["node"] for node in report["nodes"]] == ["4", "3", "8", "9"]
+    assert nodes["4"]["status"] == "cached" and nodes["4"]["duration_s"] is None
+    assert round(nodes["3"]["duration_s"], 3) == 2.5
+    assert round(nodes["3"]["steps_per_s"], 3) == 10.0  # 19 pas entre le premier et le dernier en 1.9 s
+    assert nodes["3"]["class_type"] == "KSampler"
+    assert round(nodes["8"]["duration_s"], 3) == 0.8
+    assert round(nodes["9"]["duration_s"], 3) == 0.1
+    assert nodes["9"]["steps_per_s"] is None
+
+
+def test_failed_node_is_marked():
+    timings = comfyui_node_timings()
+    run_events(
+        timings,
+        [
+            (0.0, message("execution_start")),
+            (0.0, message("executing", node="3")),
+            (1.0, message("executing", node="8")),
+            (1.5, message("execution_error", node_id="8", node_type="VAEDecode", exception_message="OOM")),
+        ],
+    )
+
+    nodes = {node["node"]: node for node in timings.report(WORKFLOW)["nodes"]}
+
+    assert nodes["3"]["status"] == "ok"
+    assert (nodes["8"]["status"], nodes["8"]["duration_s"]) == ("error", 0.5)
+
+
+def test_table_lists_slowest_node_first():
+    def node(node_id, class_type, status, duration_s, steps_per_s=None):
+        return {
+            "node": node_id,
+            "class_type": class_type,
+            "status": status,
+            "duration_s": duration_s,
+            "steps": 20 if steps_per_s else 0,
+            "steps_per_s": steps_per_s,
+        }
+
+    report = {
+        "total_s": 4.0,
+        "nodes": [
+            node("4", "CheckpointLoaderSimple", "cached", None),
+            node("3", "KSampler", "ok", 3.0, 8.0),
+            node("8", "VAEDecode", "ok", 1.0),
+        ],
+    }
+
+    lines = format_node_timings(report)
+
+    assert [line.split()[0] for line in lines[1:4]] == ["3", "8", "4"]
+    assert "75%" in lines[1] and "8.00" in lines[1]
+    assert lines[-1] == "Total: 4.00s"
+    assert format_node_timings(None) == []
+
+
+def test_hub_timestamps_messages_received_before_subscription():
+    """Le hub horodate à la réception: les messages rejoués à l'abonnement gardent leur instant"""
+    now = [100.0]
+    hub = comfyui_event_hub("127.0.0.1:0", "client", clock=lambda: now[0])
+    hub.dispatch(message("execution_start"))
+    hub.dispatch(message("executing", node="3"))
+    now[0] = 102.0
+    hub.dispatch(message("executing", node=None))
+
+    now[0] = 500.0
+    tracker = hub.track("p1")
+
+    assert tracker.wait(0)[0] == "success"
+    report = tracker.timings.report(WORKFLOW)
+    assert report["total_s"] == 2.0
+    assert report["nodes"][0]["duration_s"] == 2.0
+    tracker.close()
+
+
+def test_hub_keeps_timings_of_followed_and_active_prompts():
+    """Au-delà de BUFFER_PROMPTS, le hub écarte les prompts inactifs, jamais un prompt suivi ni récemment actif"""
+    hub = comfyui_event_hub("127.0.0.1:0", "client")
+    hub.BUFFER_PROMPTS = 3
+    tracker = hub.track("followed")
+    hub.dispatch({"type": "execution_start", "data": {"prompt_id": "running"}})
+    hub.dispatch({"type": "execution_start", "data": {"prompt_id": "idle"}})
+    hub.dispatch({"type": "executing", "data": {"prompt_id": "running", "node": "3"}})
+
+    for index in range(10):
+        hub.dispatch({"type": "execution_start", "data": {"prompt_id": f"other{index}"}})
+        hub.dispatch({"type": "executing", "data": {"prompt_id": "running", "node": "3"}})
+
+    assert hub.node_timings("followed") is tracker.timings
+    assert "running" in hub._timings and "running" in hub._buffers
+    assert "idle" not in hub._timings and "idle" not in hub._buffers
+    tracker.close()
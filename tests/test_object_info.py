@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Test de la validation locale des workflows (schéma /object_info en cache)
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+
+# Ajouter le répertoire src au path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from cy6_object_info import comfyui_object_info_cache, comfyui_validation_error, validate_workflow
+
+OBJECT_INFO = {
+    "CheckpointLoaderSimple": {
+        "input": {"required": {"ckpt_name": [["a.ckpt"]]}},
+        "output": ["MODEL", "CLIP", "VAE"],
+    },
+    "CLIPTextEncode": {
+        "input": {"required": {"text": ["STRING", {}], "clip": ["CLIP"]}},
+        "output": ["CONDITIONING"],
+    },
+}
+
+WORKFLOW = {
+    "4": {"class_type": "CheckpointLoaderSimple", "inputs": {"ckpt_name": "a.ckpt"}},
+    "6": {"class_type": "CLIPTextEncode", "inputs": {"text": "bottle", "clip": ["4", 1]}},
+}
+
+
+def test_valid_workflow():
+    assert validate_workflow(WORKFLOW, OBJECT_INFO) == []
+
+
+def test_errors_are_reported():
+    workflow = {
+        "4": {"class_type": "CheckpointLoaderSimple", "inputs": {}},
+        "6": {"class_type": "CLIPTextEncode", "inputs": {"text": "x", "clip": ["4", 7]}},
+        "7": {"class_type": "CLIPTextEncode", "inputs": {"text": "x", "clip": ["99", 0]}},
+        "8": {"class_type": "MissingNode", "inputs": {}},
+    }
+    errors = validate_workflow(workflow, OBJECT_INFO)
+    assert len(errors) == 4
+    assert "'ckpt_name' absente" in errors[0]
+    assert "sortie 7" in errors[1]
+    assert "node 99 absent" in errors[2]
+    assert "MissingNode inconnue" in errors[3]
+
+
+def test_schema_cached_on_disk_per_version():
+    cache_dir = tempfile.mkdtemp()
+    fetched = []
+
+    def fetch(address):
+        fetched.append(address)
+        return OBJECT_INFO
+
+    try:
+        comfyui_object_info_cache(cache_dir, fetch, lambda address: "0.3.1").get("h:1")
+        # Nouvelle session, même version: lecture disque
+        cache = comfyui_object_info_cache(cache_dir, fetch, lambda address: "0.3.1")
+        assert cache.get("h:1") == OBJECT_INFO
+        assert fetched == ["h:1"]
+        # Version différente: nouveau téléchargement
+        comfyui_object_info_cache(cache_dir, fetch, lambda address: "0.3.2").get("h:1")
+        assert fetched == ["h:1", "h:1"]
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def test_stale_disk_schema_is_refreshed_before_rejecting():
+    cache_dir = tempfile.mkdtemp()
+    schemas = [{"CheckpointLoaderSimple": OBJECT_INFO["CheckpointLoaderSimple"]}, OBJECT_INFO]
+    try:
+        comfyui_object_info_cache(cache_dir, lambda address: schemas[0], lambda address: "1").get("h:1")
+        cache = comfyui_object_info_cache(cache_dir, lambda address: schemas[1], lambda address: "1")
+        assert cache.validate(WORKFLOW, "h:1") == []
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def test_check_raises_and_unreachable_server_does_not_block():
+    cache = comfyui_object_info_cache(tempfile.gettempdir(), lambda address: OBJECT_INFO, lambda address: None)
+    try:
+        cache.check({"1": {"class_type": "MissingNode", "inputs": {}}}, "h:1")
+        assert False, "comfyui_validation_error attendue"
+    except comfyui_validation_error as e:
+        assert len(e.errors) == 1
+
+    def unreachable(address):
+        raise ConnectionRefusedError("refusé")
+
+    assert comfyui_object_info_cache(tempfile.gettempdir(), unreachable, unreachable).validate(WORKFLOW, "h:2") == []
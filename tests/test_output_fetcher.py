@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Test de la récupération des images ComfyUI (déduplication, écriture par blocs, fichiers déjà présents)
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+import threading
+import urllib.parse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Ajouter le répertoire src au path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from cy6_output_fetcher import comfyui_output_fetcher, unique_images
+
+IMAGES = {name: os.urandom(size) for name, size in [("a.png", 200000), ("b.png", 1000), ("c.png", 5)]}
+
+
+class ViewHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    downloads = []
+
+    def log_message(self, format, *args):
+        pass
+
+    def _image(self):
+        query = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+        return IMAGES.get(query["filename"][0])
+
+    def do_HEAD(self):
+        data = self._image()
+        self.send_response(200 if data is not None else 404)
+        self.send_header("Content-Length", str(len(data or b"")))
+        self.end_headers()
+
+    def do_GET(self):
+        data = self._image()
+        if data is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.downloads.append(self.path)
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def image(filename, subfolder=""):
+    return {"filename": filename, "subfolder": subfolder, "type": "output"}
+
+
+OUTPUTS = {
+    "9": {"images": [image("a.png"), image("b.png"), image("c.png")]},
+    # Même image exposée par un second node de sortie
+    "12": {"images": [image("a.png")]},
+    "15": {"images": [image("missing.png")]},
+}
+
+
+def run_fetch(root):
+    ViewHandler.downloads = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ViewHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        fetcher = comfyui_output_fetcher(
+            f"127.0.0.1:{server.server_address[1]}",
+            lambda info: os.path.join(root, info["subfolder"], info["filename"]),
+            chunk_size=4096,
+        )
+        return fetcher.fetch(OUTPUTS)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_unique_images():
+    assert [info["filename"] for info in unique_images(OUTPUTS)] == ["a.png", "b.png", "c.png", "missing.png"]
+
+
+def test_fetch_downloads_each_image_once_then_skips():
+    root = tempfile.mkdtemp()
+    try:
+        results = run_fetch(root)
+        assert [state for _, state in results] == ["downloaded", "downloaded", "downloaded", "error"]
+        assert len(ViewHandler.downloads) == 3
+        for name, data in IMAGES.items():
+            with open(os.path.join(root, name), "rb") as f:
+                assert f.read() == data
+        assert not [name for name in os.listdir(root) if name.endswith(".part")]
+
+        # Second passage: fichiers présents avec la bonne taille, sauf un fichier tronqué
+        with open(os.path.join(root, "b.png"), "wb") as f:
+            f.write(b"x")
+        results = run_fetch(root)
+        assert [state for _, state in results][:3] == ["skipped", "downloaded", "skipped"]
+        assert len(ViewHandler.downloads) == 1
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def test_relative_path_is_not_downloaded():
+    fetcher = comfyui_output_fetcher("127.0.0.1:9", lambda info: info["filename"])
+    assert fetcher.fetch({"9": {"images": [image("a.png")]}}) == [("a.png", "local")]
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Test du contrôle de la file ComfyUI (retrait d'un prompt en attente, interruption)
+"""
+
+import sys
+import os
+
+# Ajouter le répertoire src au path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import cy6_websocket_api_client
+from cy6_websocket_api_client import queue_state, cancel_prompt
+
+QUEUE = {
+    "queue_running": [[7, "running_id", {}, {}, []]],
+    "queue_pending": [[8, "pending_id", {}, {}, []], [9, "other_id", {}, {}, []]],
+}
+
+
+class fake_client:
+    def __init__(self):
+        self.calls = []
+
+    def get_queue(self):
+        return QUEUE
+
+    def delete_queued(self, prompt_ids):
+        self.calls.append(("delete", prompt_ids))
+
+    def interrupt(self, prompt_id=None):
+        self.calls.append(("interrupt", prompt_id))
+
+
+def test_queue_state():
+    assert queue_state(QUEUE, "running_id") == "running"
+    assert queue_state(QUEUE, "other_id") == "pending"
+    assert queue_state(QUEUE, "done_id") is None
+    assert queue_state({}, "running_id") is None
+
+
+def test_cancel_prompt(monkeypatch):
+    client = fake_client()
+    monkeypatch.setattr(cy6_websocket_api_client, "get_client", lambda address: client)
+
+    assert cancel_prompt("pending_id", "a:1") == "deleted"
+    assert cancel_prompt("running_id", "a:1") == "interrupted"
+    assert cancel_prompt("done_id", "a:1") is None
+    assert client.calls == [("delete", ["pending_id"]), ("interrupt", "running_id")]
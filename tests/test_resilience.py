@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Test de la résilience des appels ComfyUI (nouvelles tentatives, disjoncteur)
+"""
+
+import sys
+import os
+import io
+import urllib.error
+
+import pytest
+
+# Ajouter le répertoire src au path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from cy6_resilience import retry_call, is_refused, comfyui_circuit_breaker, comfyui_circuit_open
+
+
+def flaky(errors, result="ok"):
+    """Fonction qui lève successivement les erreurs données, puis retourne result"""
+    calls = []
+
+    def function():
+        calls.append(len(calls))
+        if errors:
+            raise errors.pop(0)
+        return result
+
+    return function, calls
+
+
+def test_retry_until_success_with_growing_delays():
+    function, calls = flaky([ConnectionResetError("coupé"), ConnectionRefusedError("refusé")])
+    delays = []
+    assert retry_call(function, sleep=delays.append) == "ok"
+    assert len(calls) == 3
+    assert len(delays) == 2 and delays[0] <= 0.5 < delays[1] * 2
+
+
+def test_retry_gives_up_and_keeps_http_errors():
+    function, calls = flaky([ConnectionResetError(str(i)) for i in range(10)])
+    with pytest.raises(ConnectionResetError):
+        retry_call(function, attempts=3, sleep=lambda delay: None)
+    assert len(calls) == 3
+
+    http_error = urllib.error.HTTPError("http://x/prompt", 400, "Bad Request", {}, io.BytesIO(b""))
+    function, calls = flaky([http_error])
+    with pytest.raises(urllib.error.HTTPError):
+        retry_call(function, sleep=lambda delay: None)
+    assert len(calls) == 1
+
+    # Appel non idempotent: une connexion coupée n'est pas renvoyée
+    function, calls = flaky([ConnectionResetError("coupé")])
+    with pytest.raises(ConnectionResetError):
+        retry_call(function, retry_on=is_refused, sleep=lambda delay: None)
+    assert len(calls) == 1
+
+
+def test_circuit_breaker_opens_then_half_opens():
+    now = [0.0]
+    breaker = comfyui_circuit_breaker("a:1", failure_threshold=2, reset_timeout=30, clock=lambda: now[0])
+    down, _ = flaky([ConnectionRefusedError("refusé")] * 5)
+
+    for _ in range(2):
+        with pytest.raises(ConnectionRefusedError):
+            breaker.call(down)
+    assert breaker.state == breaker.OPEN
+    with pytest.raises(comfyui_circuit_open):
+        breaker.call(lambda: "jamais appelé")
+
+    # Réarmement: un essai raté rouvre, un essai réussi referme
+    now[0] = 30
+    assert breaker.state == breaker.HALF_OPEN
+    with pytest.raises(ConnectionRefusedError):
+        breaker.call(down)
+    assert breaker.is_open()
+    now[0] = 60
+    assert breaker.call(lambda: "ok") == "ok"
+    assert breaker.state == breaker.CLOSED and breaker.failures == 0
+
+
+def test_http_error_does_not_trip_the_breaker():
+    breaker = comfyui_circuit_breaker("a:1", failure_threshold=1)
+    http_error = urllib.error.HTTPError("http://x/prompt", 400, "Bad Request", {}, io.BytesIO(b""))
+    function, _ = flaky([http_error])
+    with pytest.raises(urllib.error.HTTPError):
+        breaker.call(function)
+    assert breaker.state == breaker.CLOSED
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Test de update_workflow avec des workflows en mémoire
+"""
+
+import sys
+import os
+import json
+import tempfile
+
+# Ajouter le répertoire src au path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import cy6_workflow_patcher
+from cy6_websocket_api_client import update_workflow
+from cy6_file import dump_workflow
+from cy6_workflow_patcher import compile_patch_plan, apply_patch_plan, register_patch_handler, entry_field
+
+import pytest
+
+WORKFLOW = {
+    "3": {"class_type": "KSampler", "inputs": {"seed": 1, "steps": 20}},
+    "6": {"class_type": "CLIPTextEncode", "inputs": {"text": ""}},
+}
+VALUES = {
+    "1": {"id": "6", "type": "prompt", "value": "a  glass\nbottle"},
+    "2": {"id": "3", "type": "seed", "value": 0},
+}
+
+
+def test_update_workflow_accepts_dicts_without_mutating_them():
+    """Les dicts sont patchés sur une copie"""
+    workflow, values = update_workflow(VALUES, WORKFLOW)
+
+    assert workflow["6"]["inputs"]["text"] == "a glass bottle"
+    assert workflow["3"]["inputs"]["seed"] == values["2"]["value"]
+    assert WORKFLOW["6"]["inputs"]["text"] == ""
+    assert VALUES["2"]["value"] == 0
+
+
+def test_update_workflow_still_accepts_files_and_dump_sink():
+    """Les chemins de fichiers restent acceptés, le sink de debug écrit le résultat"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        workflow_path = os.path.join(temp_dir, "workflow.json")
+        values_path = os.path.join(temp_dir, "values.json")
+        with open(workflow_path, "w", encoding="utf-8") as f:
+            json.dump(WORKFLOW, f)
+        with open(values_path, "w", encoding="utf-8") as f:
+            json.dump(VALUES, f)
+
+        workflow, values = update_workflow(values_path, workflow_path)
+        assert workflow["6"]["inputs"]["text"] == "a glass bottle"
+
+        paths = dump_workflow(os.path.join(temp_dir, "dump"), "basic", workflow, values)
+        with open(paths[0], encoding="utf-8") as f:
+            assert json.load(f) == workflow
+
+
+def test_patch_plan_is_cached_per_schema_and_copy_on_write():
+    """Même schéma = même plan ; les nodes non patchés restent partagés"""
+    workflow = dict(WORKFLOW, **{"9": {"class_type": "SaveImage", "inputs": {"filename_prefix": "x"}}})
+    other_values = {key: dict(entry, value="autre") for key, entry in VALUES.items()}
+
+    plan = compile_patch_plan(VALUES)
+    assert compile_patch_plan(other_values) is plan
+
+    patched, _ = apply_patch_plan(plan, workflow, other_values)
+    assert patched["6"]["inputs"]["text"] == "autre"
+    assert patched["9"] is workflow["9"]
+    assert patched["6"] is not workflow["6"]
+
+
+@pytest.fixture
+def patch_handlers(monkeypatch):
+    """Registre des gestionnaires isolé: les types enregistrés par le test ne fuient pas vers les autres"""
+    monkeypatch.setattr(cy6_workflow_patcher, "PATCH_HANDLERS", dict(cy6_workflow_patcher.PATCH_HANDLERS))
+    cy6_workflow_patcher._compile_schema.cache_clear()
+    yield cy6_workflow_patcher.PATCH_HANDLERS
+    cy6_workflow_patcher._compile_schema.cache_clear()
+
+
+def test_unknown_type_fails_and_handlers_are_registrable(patch_handlers):
+    """Un type inconnu lève ValueError jusqu'à l'enregistrement de son gestionnaire"""
+    values = {"1": {"id": "3", "type": "CFG", "cfg": 6.5}}
+    with pytest.raises(ValueError):
+        update_workflow(values, WORKFLOW)
+
+    register_patch_handler("CFG", [("cfg", entry_field("cfg"))])
+    workflow, _ = update_workflow(values, WORKFLOW)
+    assert workflow["3"]["inputs"] == {"seed": 1, "steps": 20, "cfg": 6.5}
+    assert "CFG" in patch_handlers